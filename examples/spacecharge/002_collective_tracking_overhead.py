@@ -0,0 +1,53 @@
+# copyright ############################### #
+# This file is part of the Xtrack Package.  #
+# Copyright (c) CERN, 2024.                 #
+# ######################################### #
+
+import json
+import time
+import numpy as np
+
+import xtrack as xt
+import xfields as xf
+
+# Measures the time spent per tracker part (non-collective sections and
+# space-charge kicks) when tracking a small bunch in the SPS with 540
+# frozen space-charge interactions, which is dominated by the Python
+# overhead of the collective tracking loop.
+
+num_turns = 20
+num_particles = 100
+num_spacecharge_interactions = 540
+
+fname_line = ('../../test_data/sps_w_spacecharge/'
+              'line_no_spacecharge_and_particle.json')
+
+with open(fname_line, 'r') as fid:
+    input_data = json.load(fid)
+line = xt.Line.from_dict(input_data['line'])
+line.particle_ref = xt.Particles.from_dict(input_data['particle'])
+
+lprofile = xf.LongitudinalProfileQGaussian(
+    number_of_particles=1e11, sigma_z=22.5e-2, z0=0., q_parameter=1.)
+xf.install_spacecharge_frozen(
+    line=line, longitudinal_profile=lprofile,
+    nemitt_x=2.5e-6, nemitt_y=2.5e-6, sigma_z=22.5e-2,
+    num_spacecharge_interactions=num_spacecharge_interactions)
+line.build_tracker()
+
+num_parts = len(line.tracker._parts)
+print(f'Number of parts: {num_parts}')
+
+particles = line.build_particles(
+    x_norm=np.random.normal(size=num_particles),
+    y_norm=np.random.normal(size=num_particles),
+    nemitt_x=2.5e-6, nemitt_y=2.5e-6)
+
+line.track(particles.copy(), num_turns=1) # compile kernels
+
+t0 = time.perf_counter()
+line.track(particles, num_turns=num_turns)
+t1 = time.perf_counter()
+
+print(f'Time per turn: {(t1 - t0) / num_turns * 1e3:.2f} ms')
+print(f'Time per part: {(t1 - t0) / num_turns / num_parts * 1e6:.1f} us')
@@ -0,0 +1,162 @@
+# copyright ############################### #
+# This file is part of the Xtrack Package.  #
+# Copyright (c) CERN, 2024.                 #
+# ######################################### #
+import numpy as np
+
+import xobjects as xo
+import xtrack as xt
+
+
+def _make_line():
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 0.1]),
+                             xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, -0.1])])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    return line
+
+
+def test_kernel_cache_reuse(tmp_path, mocker):
+    line = _make_line()
+    line.build_tracker(kernel_cache=tmp_path, use_prebuilt_kernels=False)
+
+    cache = line.tracker.kernel_cache
+    assert isinstance(cache, xt.KernelCache)
+    assert len(cache.entries()) == 1
+
+    p_ref = line.build_particles(x=[1e-3, -2e-3], px=[1e-5, 0])
+    line.track(p_ref, num_turns=10)
+
+    # A new tracker must load the kernel instead of compiling it
+    spy = mocker.spy(xo.ContextCpu, 'compile_kernel')
+    line2 = _make_line()
+    line2.build_tracker(kernel_cache=xt.KernelCache(tmp_path),
+                        use_prebuilt_kernels=False)
+    assert spy.call_count == 0
+
+    p = line2.build_particles(x=[1e-3, -2e-3], px=[1e-5, 0])
+    line2.track(p, num_turns=10)
+    xo.assert_allclose(p.x, p_ref.x, rtol=0, atol=1e-15)
+    xo.assert_allclose(p.px, p_ref.px, rtol=0, atol=1e-15)
+
+    # A different config results in a new entry
+    line2.config.XTRACK_GLOBAL_XY_LIMIT = 2.
+    line2.track(p, num_turns=1)
+    assert spy.call_count == 1
+    assert len(cache.entries()) == 2
+
+
+def test_kernel_cache_env_var_and_eviction(tmp_path, monkeypatch):
+    monkeypatch.setenv('XTRACK_KERNEL_CACHE_DIR', str(tmp_path))
+    line = _make_line()
+    line.build_tracker(use_prebuilt_kernels=False)
+    cache = line.tracker.kernel_cache
+    assert cache.path == tmp_path
+
+    (so_file, size), = cache.entries()
+    assert so_file.name.startswith('xtk_')
+    assert not list(tmp_path.glob('.staging_*'))
+
+    # Build a second kernel with a cache too small for both
+    cache.max_size = int(1.5 * size)
+    line.config.XTRACK_GLOBAL_XY_LIMIT = 2.
+    line.tracker.get_track_kernel_and_data_for_present_config()
+    entries = cache.entries()
+    assert len(entries) == 1
+    assert entries[0][0] != so_file
+
+    cache.clear()
+    assert cache.size == 0
+
+
+def test_precompile(tmp_path, mocker):
+    line = _make_line()
+    line.build_tracker(
+        use_prebuilt_kernels=False,
+        kernel_cache=tmp_path,
+        precompile=['backtrack', {'XTRACK_GLOBAL_XY_LIMIT': 2.}])
+
+    assert len(line.tracker.track_kernel) == 3
+    assert len(line.tracker.kernel_cache.entries()) == 3
+
+    spy = mocker.spy(xo.ContextCpu, 'compile_kernel')
+
+    p0 = line.build_particles(x=[1e-3, -2e-3], px=[1e-5, 0])
+    p = p0.copy()
+    line.track(p, num_turns=3)
+    line.track(p, num_turns=3, backtrack=True)
+    xo.assert_allclose(p.x, p0.x, rtol=0, atol=1e-14)
+    xo.assert_allclose(p.px, p0.px, rtol=0, atol=1e-14)
+
+    line.config.XTRACK_GLOBAL_XY_LIMIT = 2.
+    line.track(p, num_turns=3)
+
+    assert spy.call_count == 0
+
+    # Already available configs are not compiled again
+    line.config.XTRACK_GLOBAL_XY_LIMIT = 1.
+    hash_configs = line.tracker.precompile([{}, 'backtrack'])
+    assert spy.call_count == 0
+    assert hash_configs[0] == line.tracker._hashable_config()
+    assert dict(hash_configs[1])['XSUITE_BACKTRACK'] is True
+
+
+def test_kernel_cache_key_depends_on_struct_and_sources(tmp_path):
+    cache = xt.KernelCache(tmp_path)
+
+    source = tmp_path / 'my_element.h'
+    source.write_text('/* version 1 */')
+
+    def _make_element_class(xofields):
+        class MyElement(xt.BeamElement):
+            _xofields = xofields
+            _extra_c_sources = [source]
+        return MyElement
+
+    def _key(element_class):
+        return cache.get_key(config_headers=[],
+                             kernel_element_classes=[element_class._XoStruct])
+
+    key = _key(_make_element_class({'a': xo.Float64}))
+    assert _key(_make_element_class({'a': xo.Float64})) == key
+
+    # Different struct
+    assert _key(_make_element_class({'a': xo.Float64, 'b': xo.Float64})) != key
+    assert _key(_make_element_class({'a': xo.Int64})) != key
+
+    # Different contents of the same source file
+    source.write_text('/* version 2 */')
+    assert _key(_make_element_class({'a': xo.Float64})) != key
+
+
+def test_kernel_cache_key_file_like_and_included_sources(tmp_path):
+    cache = xt.KernelCache(tmp_path)
+
+    header = tmp_path / 'my_header.h'
+    header.write_text('/* header version 1 */')
+    source = tmp_path / 'my_element.h'
+    source.write_text('#include "my_header.h"\n/* source */')
+
+    def _key(**kwargs):
+        return cache.get_key(config_headers=[],
+                             kernel_element_classes=[xt.Drift._XoStruct],
+                             **kwargs)
+
+    # File-like sources are not consumed by the computation of the key
+    with open(source, 'r') as fid:
+        key = _key(extra_sources=[fid])
+        assert fid.read() == source.read_text()
+
+    # The key depends on the contents of the included files
+    header.write_text('/* header version 2 */')
+    with open(source, 'r') as fid:
+        assert _key(extra_sources=[fid]) != key
+    assert _key(extra_sources=[source]) != key
+
+    included_header = tmp_path / 'my_include_file.h'
+    included_header.write_text('/* version 1 */')
+    source.write_text('//include_file my_include_file.h for_context cpu_serial')
+    key = _key(extra_sources=[source])
+    included_header.write_text('/* version 2 */')
+    assert _key(extra_sources=[source]) != key
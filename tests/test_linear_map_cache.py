@@ -0,0 +1,93 @@
+import pathlib
+
+import numpy as np
+import pytest
+
+import xobjects as xo
+import xtrack as xt
+
+test_data_folder = pathlib.Path(
+    __file__).parent.joinpath('../test_data').absolute()
+
+
+def _psb_line_with_knob():
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    line.vars['kqd'] = line['br.qde2'].knl[1]
+    line.element_refs['br.qde2'].knl[1] = line.vars['kqd']
+    line.element_refs['br.qde3'].knl[1] = line.vars['kqd']
+
+    return line
+
+
+def test_linear_map_cache_one_turn_matrix():
+
+    line = _psb_line_with_knob()
+    p_co = line.find_closed_orbit()
+
+    line.enable_linear_map_cache = True
+    line.compute_one_turn_matrix_finite_differences(p_co)
+    cache = list(line.tracker._tracker_data_base.cache['linear_maps'].values())[0]
+    assert cache.num_full_builds == 1
+
+    # Nothing changed, the maps are reused
+    line.compute_one_turn_matrix_finite_differences(p_co)
+    assert cache.num_reused == 1
+    assert cache.num_element_updates == 0
+
+    # Change the strengths through a knob and directly on an element
+    line.vars['kqd'] *= 1.02
+    line['br.qfo11'].knl[1] *= 0.99
+
+    RR_cached = line.compute_one_turn_matrix_finite_differences(
+        p_co, element_by_element=True)
+    assert cache.num_full_builds == 1
+    assert cache.num_element_updates == 3
+
+    line.enable_linear_map_cache = False
+    RR = line.compute_one_turn_matrix_finite_differences(
+        p_co, element_by_element=True)
+
+    assert RR_cached['R_matrix_ebe'].shape == RR['R_matrix_ebe'].shape
+    # The longitudinal terms differ by the finite-difference errors of the
+    # one-turn tracking
+    xo.assert_allclose(RR_cached['R_matrix'][:4, :4], RR['R_matrix'][:4, :4],
+                       rtol=0, atol=1e-9)
+    xo.assert_allclose(RR_cached['R_matrix'], RR['R_matrix'],
+                       rtol=0, atol=1e-6)
+    xo.assert_allclose(RR_cached['R_matrix_ebe'][:, :4, :4],
+                       RR['R_matrix_ebe'][:, :4, :4], rtol=0, atol=1e-8)
+    xo.assert_allclose(RR_cached['R_matrix_ebe'], RR['R_matrix_ebe'],
+                       rtol=0, atol=1e-6)
+
+
+@pytest.mark.parametrize('method', ['4d', '6d'])
+def test_linear_map_cache_twiss(method):
+
+    line = _psb_line_with_knob()
+
+    line.enable_linear_map_cache = True
+    line.twiss(method=method)
+
+    line.vars['kqd'] *= 1.02
+    line['br.qfo11'].knl[1] *= 0.99
+    tw_cached = line.twiss(method=method)
+
+    caches = line.tracker._tracker_data_base.cache['linear_maps']
+    assert sum(cc.num_full_builds for cc in caches.values()) == 1
+    assert sum(cc.num_element_updates for cc in caches.values()) == 3
+
+    line.enable_linear_map_cache = False
+    tw = line.twiss(method=method)
+
+    xo.assert_allclose(tw_cached.qx, tw.qx, rtol=0, atol=1e-10)
+    xo.assert_allclose(tw_cached.qy, tw.qy, rtol=0, atol=1e-10)
+    xo.assert_allclose(tw_cached.dqx, tw.dqx, rtol=0, atol=1e-6)
+    xo.assert_allclose(tw_cached.dqy, tw.dqy, rtol=0, atol=1e-6)
+    xo.assert_allclose(tw_cached.betx, tw.betx, rtol=1e-9, atol=0)
+    xo.assert_allclose(tw_cached.bety, tw.bety, rtol=1e-9, atol=0)
+    xo.assert_allclose(tw_cached.dx, tw.dx, rtol=0, atol=1e-8)
+    if method == '6d':
+        xo.assert_allclose(tw_cached.qs, tw.qs, rtol=0, atol=1e-10)
@@ -2,6 +2,7 @@ import json
 import pathlib
 
 import numpy as np
+import pytest
 
 import xobjects as xo
 import xtrack as xt
@@ -257,6 +258,167 @@ def test_match_orbit_bump_with_weights():
         assert targets[3].weight == 1000
 
 
+def test_match_orbit_bump_parallel_jacobian():
+
+    with open(test_data_folder /
+              'hllhc14_no_errors_with_coupling_knobs/line_b1.json', 'r') as fid:
+        dct = json.load(fid)
+    line = xt.Line.from_dict(dct)
+
+    line.build_tracker()
+
+    tw0 = line.twiss()
+
+    opts = {}
+    for n_workers in [None, 3]:
+        opts[n_workers] = line.match(
+            solve=False,
+            n_workers=n_workers,
+            start='mq.33l8.b1',
+            end='mq.23l8.b1',
+            init=tw0,
+            vary=[
+                xt.Vary(name='acbv30.l8b1', step=1e-10),
+                xt.Vary(name='acbv28.l8b1', step=1e-10),
+                xt.Vary(name='acbv26.l8b1', step=1e-10),
+                xt.Vary(name='acbv24.l8b1', step=1e-10),
+            ],
+            targets=[
+                xt.Target('y', at='mb.b28l8.b1', value=3e-3, tol=1e-4, scale=1),
+                xt.Target('py', at='mb.b28l8.b1', value=0, tol=1e-6, scale=1000),
+                xt.Target('y', at='mq.23l8.b1', value=tw0, tol=1e-6, scale=1),
+                xt.Target('py', at='mq.23l8.b1', value=tw0, tol=1e-7, scale=1000),
+            ]
+        )
+
+    opt_serial = opts[None]
+    opt = opts[3]
+
+    x0 = opt._err._get_x()
+    jac_serial = opt_serial._err.get_jacobian(x0)
+    opt_serial._err._set_x(x0)
+    n_calls = opt._err.call_counter
+    jac = opt._err.get_jacobian(x0)
+    assert opt._err.call_counter == n_calls + 5
+    xo.assert_allclose(jac, jac_serial, rtol=1e-6, atol=1e-6)
+
+    # The knobs are not left at the last step
+    xo.assert_allclose(opt._err._get_x(), x0, rtol=0, atol=0)
+
+    opt.solve()
+
+    tw = line.twiss()
+    xo.assert_allclose(tw['y', 'mb.b28l8.b1'], 3e-3, atol=1e-4)
+    xo.assert_allclose(tw['py', 'mb.b28l8.b1'], 0, atol=1e-6)
+    xo.assert_allclose(tw['y', 'mq.23l8.b1'], tw0['y', 'mq.23l8.b1'], atol=1e-6)
+    xo.assert_allclose(tw['py', 'mq.23l8.b1'], tw0['py', 'mq.23l8.b1'], atol=1e-7)
+
+
+def test_match_parallel_jacobian_rejects_openmp_context():
+
+    line = xt.Line(
+        elements=[xt.Drift(length=1), xt.Quadrupole(length=0.5, k1=0.5),
+                  xt.Drift(length=1), xt.Quadrupole(length=0.5, k1=-0.5)],
+        element_names=['d1', 'qf', 'd2', 'qd'])
+    line.particle_ref = xt.Particles(p0c=1e9)
+    line.vars['kqf'] = 0.5
+    line.element_refs['qf'].k1 = line.vars['kqf']
+
+    line.build_tracker(_context=xo.ContextCpu(omp_num_threads=2))
+
+    with pytest.raises(NotImplementedError, match='serial CPU'):
+        line.match(solve=False, n_workers=2, method='4d',
+                   vary=xt.Vary('kqf', step=1e-6),
+                   targets=xt.Target('qx', 0.06))
+
+
+def test_match_orbit_bump_action_cache():
+
+    with open(test_data_folder /
+              'hllhc14_no_errors_with_coupling_knobs/line_b1.json', 'r') as fid:
+        dct = json.load(fid)
+    line = xt.Line.from_dict(dct)
+
+    line.build_tracker()
+
+    tw0 = line.twiss()
+
+    opt = line.match(
+        solve=False,
+        start='mq.33l8.b1',
+        end='mq.23l8.b1',
+        init=tw0,
+        vary=[
+            xt.Vary(name='acbv30.l8b1', step=1e-10),
+            xt.Vary(name='acbv28.l8b1', step=1e-10),
+            xt.Vary(name='acbv26.l8b1', step=1e-10),
+            xt.Vary(name='acbv24.l8b1', step=1e-10),
+        ],
+        targets=[
+            xt.Target('y', at='mb.b28l8.b1', value=3e-3, tol=1e-4, scale=1),
+            xt.Target('py', at='mb.b28l8.b1', value=0, tol=1e-6, scale=1000),
+            xt.Target('y', at='mq.23l8.b1', value=tw0, tol=1e-6, scale=1),
+            xt.Target('py', at='mq.23l8.b1', value=tw0, tol=1e-7, scale=1000),
+        ]
+    )
+    action = opt.actions[0]
+    assert isinstance(action, xt.match.ActionTwiss)
+    assert action.vary is not None
+
+    # The first point of the log is computed when building the optimizer
+    log = opt.log()
+    assert log.cache_misses[-1] == 1
+    assert log.cache_hits[-1] == 1
+
+    opt.solve()
+    log = opt.log()
+    assert len(log.cache_hits) == len(log.penalty)
+    assert np.all(np.diff(log.cache_hits) >= 0)
+    assert np.all(np.diff(log.cache_misses) >= 0)
+    assert log.cache_hits[-1] == action.cache.num_hits
+    assert log.cache_misses[-1] == action.cache.num_misses
+    assert len(action.cache._results) <= xt.match.DEFAULT_ACTION_CACHE_SIZE
+
+    # The same knob values are not twissed again
+    tw_last = action.run()
+    num_misses = action.cache.num_misses
+    opt.tag('matched')
+    assert action.cache.num_misses == num_misses
+    assert opt.log().cache_hits[-1] == action.cache.num_hits
+    assert action.run() is tw_last
+
+    # A different knob value is a cache miss
+    line.vars['acbv30.l8b1'] += 1e-6
+    tw = action.run()
+    assert action.cache.num_misses == num_misses + 1
+    assert tw is not tw_last
+    assert np.abs(tw['y', 'mb.b28l8.b1'] - tw_last['y', 'mb.b28l8.b1']) > 1e-6
+
+    # Changing a knob that is not varied is also a cache miss
+    line.vars['acbh27.l8b1'] = 1e-6
+    tw_knob = action.run()
+    assert action.cache.num_misses == num_misses + 2
+    assert np.abs(tw_knob['x', 'mq.23l8.b1'] - tw['x', 'mq.23l8.b1']) > 1e-7
+
+    # Back to the previous state, the stored result is reused
+    line.vars['acbh27.l8b1'] = 0
+    assert action.run() is tw
+
+    # Also when the knob is set through the variables cache
+    line.vars.cache_active = True
+    line.vars['acbh27.l8b1'] = 1e-6
+    line.vars.cache_active = False
+    assert action.run() is tw_knob
+    line.vars['acbh27.l8b1'] = 0
+    assert action.run() is tw
+
+    # Changing an element attribute directly is a cache miss
+    line['mcbh.27l8.b1'].knl[0] = 1e-6
+    tw_ele = action.run()
+    assert action.cache.num_misses == num_misses + 3
+    assert np.abs(tw_ele['x', 'mq.23l8.b1'] - tw['x', 'mq.23l8.b1']) > 1e-7
+
+
 @for_all_test_contexts
 def test_match_orbit_bump_within_multiline(test_context):
 
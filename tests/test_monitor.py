@@ -559,3 +559,77 @@ def test_bunch_monitor(test_context):
 
     # TODO: test zeta_mean, delta_mean, zeta2_sum, delta2_sum, zeta_std, delta_std, zeta_var, delta_var
 
+
+
+def test_memmap_particles_monitor(tmp_path):
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 0.7]),
+                             xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, -0.7])])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    line.build_tracker()
+
+    num_particles = 5
+    num_turns = 53
+    p0 = line.build_particles(x=np.linspace(-1e-3, 1e-3, num_particles),
+                              py=1e-5)
+
+    p_ref = p0.copy()
+    line.track(p_ref, num_turns=num_turns, turn_by_turn_monitor=True)
+    mon_ref = line.record_last_track
+
+    mon = xt.MemmapParticlesMonitor(tmp_path / 'mon',
+                                    start_at_turn=0, stop_at_turn=num_turns,
+                                    num_particles=num_particles,
+                                    chunk_turns=10,
+                                    variables=['x', 'px', 'y', 'at_turn'])
+    p = p0.copy()
+    line.track(p, num_turns=num_turns, turn_by_turn_monitor=mon)
+    assert line.record_last_track is mon
+    assert mon._chunk_monitor.n_records == 11 * num_particles
+
+    assert_equal(p.x, p_ref.x)
+    assert mon.x.shape == (num_particles, num_turns)
+    for nn in ['x', 'px', 'y', 'at_turn']:
+        assert_equal(getattr(mon, nn), getattr(mon_ref, nn))
+    with pytest.raises(AttributeError):
+        mon.py
+
+    # Reopen from disk
+    mon2 = xt.MemmapParticlesMonitor(tmp_path / 'mon', mode='r')
+    assert_equal(mon2.x, mon_ref.x)
+    assert_equal(mon2.at_turn[0], np.arange(num_turns))
+
+
+def test_sparse_ebe_monitor():
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 0.7]),
+                             xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, -0.7]),
+                             xt.Drift(length=1.)])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    line.build_tracker()
+
+    num_particles = 3
+    p0 = line.build_particles(x=np.linspace(-1e-3, 1e-3, num_particles),
+                              py=1e-5)
+
+    p_ref = p0.copy()
+    line.track(p_ref, turn_by_turn_monitor='ONE_TURN_EBE')
+    mon_ref = line.record_last_track
+
+    # Records only at the given elements (sorted), the end of the line has
+    # index len(line.elements)
+    at_elements = [5, 1, 3]
+    mon = xt.ParticlesMonitor(at_elements=at_elements,
+                              num_particles=num_particles)
+    assert mon.ebe_mode == 2
+    p = p0.copy()
+    line.track(p, turn_by_turn_monitor=mon)
+    assert line.record_last_track is mon
+
+    assert_equal(p.x, p_ref.x)
+    assert mon.x.shape == (num_particles, 3)
+    assert_equal(mon.at_element[0], [1, 3, 5])
+    for nn in ['x', 'px', 'y', 'py', 's']:
+        assert_equal(getattr(mon, nn), getattr(mon_ref, nn)[:, [1, 3, 5]])
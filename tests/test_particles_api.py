@@ -133,3 +133,54 @@ def test_check_is_active_sorting_cpu_default(test_context):
     assert np.all(particles.state == ([1] * 8) + ([0] * 10))
     assert set(particles.particle_id[:8]) == {0, 2, 4, 11, 13, 14, 15, 16}
     assert set(particles.particle_id[8:]) == {1, 3, 5, 6, 7, 8, 9, 10, 12, 17}
+
+
+def test_particles_float32():
+    p = xt.Particles(p0c=7e12, x=[1e-3, 2e-3], delta=[0, 1e-4],
+                     dtype=np.float32)
+    assert isinstance(p, xt.ParticlesFloat32)
+    assert p.x.dtype == np.float32
+    assert p.delta.dtype == np.float32
+    assert p.zeta.dtype == np.float64
+    assert p.p0c.dtype == np.float64
+    assert isinstance(p.copy(), xt.ParticlesFloat32)
+
+    line = xt.Line(
+        elements=[xt.Drift(length=1.), xt.Multipole(knl=[0, 0.5]),
+                  xt.LimitRect(min_x=-0.03, max_x=0.03,
+                               min_y=-0.03, max_y=0.03),
+                  xt.Drift(length=1.), xt.Multipole(knl=[0, -0.45])] * 4)
+    line.build_tracker()
+    config_before = dict(line.config)
+
+    p0 = xt.Particles(p0c=6.5e12, x=np.linspace(-0.04, 0.04, 51), px=1e-4,
+                      y=1e-3, delta=np.linspace(-1e-3, 1e-3, 51))
+    p64 = p0.copy()
+    p32 = xt.ParticlesFloat32.from_dict(p0.to_dict())
+
+    line.track(p64, num_turns=10, turn_by_turn_monitor=True)
+    mon64 = line.record_last_track
+    line.track(p32, num_turns=10, turn_by_turn_monitor=True)
+    mon32 = line.record_last_track
+
+    assert dict(line.config) == config_before
+    assert p32.x.dtype == np.float32
+    assert mon32.x.dtype == np.float64
+
+    p64.sort(interleave_lost_particles=True)
+    p32.sort(interleave_lost_particles=True)
+    assert np.any(p64.state <= 0)
+    assert np.all(p32.state == p64.state)
+    assert np.all(p32.at_element == p64.at_element)
+    alive = p64.state > 0
+    xo.assert_allclose(p32.x[alive], p64.x[alive], rtol=0, atol=1e-7)
+    xo.assert_allclose(p32.px[alive], p64.px[alive], rtol=0, atol=1e-7)
+    xo.assert_allclose(mon32.x, mon64.x, rtol=0, atol=1e-7)
+    assert np.any(p32.x[alive] != p64.x[alive])
+
+    drift = line.check_float32_tracking(p0, num_turns=10)
+    assert list(drift.name) == ['x', 'px', 'y', 'py', 'zeta', 'delta']
+    assert np.all(drift.max_abs_diff > 0)
+    assert np.all(drift.max_abs_diff < 1e-7)
+    assert np.all(drift.rms_diff <= drift.max_abs_diff)
+    assert drift.num_state_mismatch == 0
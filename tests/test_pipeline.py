@@ -1,4 +1,5 @@
 import numpy as np
+import pytest
 import pandas as pd
 
 import xtrack as xt
@@ -130,3 +131,214 @@ def test_multitracker(test_context):
     assert np.all(log_df['branch'] == np.array(4*[0, 1] + 4*[1]))
     assert np.all(log_df[log_df['branch']==0]['held_by_element'] == 'pipelnd_el1')
     assert np.all(log_df[log_df['branch']==1]['held_by_element'] == 'pipelnd_el2')
+
+
+
+@pytest.mark.parametrize('backend', [None, 'threads'])
+def test_multitracker_readiness(backend):
+
+    class Producer:
+        # Sends the turn number, after holding the tracking n_hold times
+        iscollective = True
+
+        def __init__(self, manager, n_hold):
+            self.manager = manager
+            self.n_hold = n_hold
+            self.i_hold = 0
+            self.turn = 0
+
+        def track(self, particles):
+            self.i_hold += 1
+            if self.i_hold < self.n_hold:
+                return PipelineStatus(on_hold=True, info='producer')
+            self.i_hold = 0
+            self.manager.send_message(np.array([float(self.turn)]),
+                element_name='el', sender_name='producer',
+                reciever_name='consumer', turn=self.turn)
+            self.turn += 1
+
+    class Consumer:
+        # Kicks the particles proportionally to the number received from the
+        # producer
+        iscollective = True
+
+        def __init__(self, manager):
+            self.manager = manager
+            self.n_hold = 0
+
+        def track(self, particles):
+            kwargs = dict(element_name='el', sender_name='producer',
+                          reciever_name='consumer')
+            if not self.manager.is_ready_to_recieve(**kwargs):
+                self.n_hold += 1
+                return self.manager.hold_until_recieved(info='consumer',
+                                                        **kwargs)
+            buf = np.zeros(1)
+            self.manager.recieve_message(buf, **kwargs)
+            particles.px += 1e-6 * buf[0]
+
+    manager = xt.PipelineManager()
+    manager.add_particles('producer', 0)
+    manager.add_particles('consumer', 0)
+    manager.add_element('el')
+
+    line_producer = xt.Line(
+        elements=[xt.Drift(length=1.), Producer(manager, n_hold=4)],
+        element_names=['d1', 'el'])
+    line_consumer = xt.Line(
+        elements=[xt.Drift(length=1.), Consumer(manager)],
+        element_names=['d1', 'el'])
+    for line in [line_producer, line_consumer]:
+        line.build_tracker()
+
+    p_producer = xt.Particles(p0c=1e9, x=[1e-3])
+    p_consumer = xt.Particles(p0c=1e9, x=[1e-3])
+
+    multitracker = xt.PipelineMultiTracker(
+        branches=[xt.PipelineBranch(line=line_producer, particles=p_producer),
+                  xt.PipelineBranch(line=line_consumer, particles=p_consumer)],
+        enable_debug_log=True, backend=backend)
+    multitracker.track(num_turns=5)
+
+    assert p_producer.at_turn[0] == 5
+    assert p_consumer.at_turn[0] == 5
+    xo.assert_allclose(p_consumer.px[0], 1e-6 * (0 + 1 + 2 + 3 + 4),
+                       rtol=1e-14, atol=0)
+
+    log_df = pd.DataFrame(multitracker.debug_log)
+    # The producer is resumed n_hold - 1 times per turn, the consumer is
+    # resumed only when the message has arrived, i.e. it is never put on hold
+    # again when resumed
+    assert np.sum(log_df['info'] == 'producer') == 5 * 3
+    n_resume_consumer = np.sum(log_df['info'] == 'consumer')
+    assert n_resume_consumer > 0
+    assert n_resume_consumer == line_consumer['el'].n_hold
+
+
+def test_shared_memory_communicator():
+
+    class Exchanger:
+        # At each turn, sends the mean x of the particles to the partner
+        # branch and kicks px by the mean x received from it
+        iscollective = True
+
+        def __init__(self, manager, own_name, partner_name):
+            self.manager = manager
+            self.own_name = own_name
+            self.partner_name = partner_name
+            self.turn = 0
+            self.sent = False
+
+        def track(self, particles):
+            kwargs = dict(element_name='exchanger')
+            if not self.sent:
+                if not self.manager.is_ready_to_send(
+                        sender_name=self.own_name,
+                        reciever_name=self.partner_name,
+                        turn=self.turn, **kwargs):
+                    return PipelineStatus(on_hold=True)
+                self.manager.send_message(
+                    np.array([np.mean(particles.x)]),
+                    sender_name=self.own_name, reciever_name=self.partner_name,
+                    turn=self.turn, **kwargs)
+                self.sent = True
+            if not self.manager.is_ready_to_recieve(
+                    sender_name=self.partner_name,
+                    reciever_name=self.own_name, **kwargs):
+                return self.manager.hold_until_recieved(
+                    sender_name=self.partner_name,
+                    reciever_name=self.own_name, **kwargs)
+            buf = np.zeros(1)
+            self.manager.recieve_message(
+                buf, sender_name=self.partner_name,
+                reciever_name=self.own_name, **kwargs)
+            particles.px += 1e-3 * buf[0]
+            self.sent = False
+            self.turn += 1
+
+    def make_manager(communicator, ranks):
+        manager = xt.PipelineManager(communicator=communicator)
+        manager.add_particles('b0', ranks[0])
+        manager.add_particles('b1', ranks[1])
+        manager.add_element('exchanger')
+        return manager
+
+    lines = []
+    for own, partner in [('b0', 'b1'), ('b1', 'b0')]:
+        line = xt.Line(elements=[xt.Drift(length=1.),
+                                 xt.Multipole(knl=[0, 0.1]),
+                                 Exchanger(None, own, partner),
+                                 xt.Drift(length=1.)],
+                       element_names=['d1', 'm1', 'exchanger', 'd2'])
+        line.build_tracker()
+        lines.append(line)
+
+    def make_particles():
+        return [xt.Particles(p0c=1e9, x=[1e-3, 2e-3]),
+                xt.Particles(p0c=1e9, x=[-3e-3, 5e-3])]
+
+    # Reference in a single process
+    manager = make_manager(communicator=None, ranks=[0, 0])
+    for line in lines:
+        line['exchanger'].manager = manager
+    p_ref = make_particles()
+    multitracker = xt.PipelineMultiTracker(
+        branches=[xt.PipelineBranch(line=ll, particles=pp)
+                  for ll, pp in zip(lines, p_ref)])
+    multitracker.track(num_turns=5)
+    assert all(ll['exchanger'].turn == 5 for ll in lines)
+
+    # One process per branch
+    with xt.SharedMemoryCommunicator(num_ranks=2, capacity=256) as comm:
+        manager = make_manager(communicator=comm, ranks=[0, 1])
+        for line in lines:
+            line['exchanger'].manager = manager
+            line['exchanger'].turn = 0
+        p_proc = make_particles()
+        branches = [xt.PipelineBranch(line=ll, particles=pp)
+                    for ll, pp in zip(lines, p_proc)]
+        xt.track_branches_in_processes(branches, communicator=comm,
+                                    timeout=600, num_turns=5)
+
+    for pp, pr in zip(p_proc, p_ref):
+        assert np.all(pp.at_turn == 5)
+        xo.assert_allclose(pp.x, pr.x, rtol=0, atol=0)
+        xo.assert_allclose(pp.px, pr.px, rtol=0, atol=0)
+    # The particles of the two branches interacted
+    assert np.all(p_proc[0].px != 0)
+
+
+def test_shared_memory_communicator_messages():
+
+    with xt.SharedMemoryCommunicator(num_ranks=2, capacity=64) as comm:
+        comm.rank = 0
+        requests = [comm.Issend(np.array([1., 2.]), dest=1, tag=7),
+                    comm.Issend(np.array([3], dtype=np.int64), dest=1, tag=3)]
+        assert not requests[0].Test()
+
+        # Same buffers, seen from rank 1
+        comm.rank = 1
+        assert not comm.Iprobe(source=1, tag=7)
+        assert comm.Iprobe(source=0, tag=3)
+        assert comm.Iprobe(source=0, tag=7)
+        assert all(rr.Test() for rr in requests)
+
+        buf = np.zeros(2)
+        comm.Recv(buf, source=0, tag=7)
+        assert np.all(buf == [1., 2.])
+        buf = np.zeros(1, dtype=np.int64)
+        comm.Recv(buf, source=0, tag=3)
+        assert buf[0] == 3
+        assert not comm.Iprobe(source=0, tag=3)
+
+        # The ring buffer wraps around
+        for ii in range(10):
+            comm.rank = 0
+            comm.Issend(np.array([float(ii)] * 3), dest=1, tag=1)
+            comm.rank = 1
+            buf = np.zeros(3)
+            comm.Recv(buf, source=0, tag=1)
+            assert np.all(buf == ii)
+
+        with pytest.raises(ValueError):
+            comm.Issend(np.zeros(10), dest=0, tag=0)
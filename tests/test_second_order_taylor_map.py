@@ -4,6 +4,7 @@
 # ######################################### #
 
 import pathlib
+import pytest
 
 import numpy as np
 from cpymad.madx import Madx
@@ -193,3 +194,156 @@ def test_second_order_maps_against_madx(test_context):
                     xo.assert_allclose(scaled_tt, scaled_tt_mad, atol=5e-4, rtol=0)
 
 
+
+
+def test_t_matrix_batched():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    line['br.qfo11'].knl[0] = 1e-4
+
+    start, end = 'br.qfo12', 'br.qde4'
+    tw = line.twiss(method='4d')
+    p_co = tw.get_twiss_init(start).particle_on_co
+
+    TT = line.compute_T_matrix(start=start, end=end, particle_on_co=p_co)
+
+    # Reference from the R matrices of the displaced particles
+    steps = xt.twiss._complete_steps_r_matrix_with_default(None)
+    TT_ref = np.zeros((6, 6, 6))
+    for jj, kk in enumerate(['x', 'px', 'y', 'py', 'zeta', 'delta']):
+        RR = {}
+        pzeta = {}
+        for sign in [1, -1]:
+            pp = p_co.copy()
+            setattr(pp, kk, getattr(p_co, kk) + sign * steps['d' + kk])
+            RR[sign] = line.compute_one_turn_matrix_finite_differences(
+                start=start, end=end, particle_on_co=pp)['R_matrix']
+            pzeta[sign] = (pp.ptau[0] / pp.beta0[0] if kk == 'delta'
+                           else getattr(pp, kk)[0])
+        TT_ref[:, :, jj] = 0.5 * (RR[1] - RR[-1]) / (pzeta[1] - pzeta[-1])
+
+    assert np.abs(TT_ref).max() > 1
+    xo.assert_allclose(TT, TT_ref, rtol=0, atol=1e-12 * np.abs(TT_ref).max())
+
+    smap = xt.SecondOrderTaylorMap.from_line(line, start=start, end=end,
+                                             twiss_table=tw)
+    xo.assert_allclose(smap.T, TT, rtol=0, atol=1e-12 * np.abs(TT).max())
+
+
+def test_t_matrix_checks():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    tw = line.twiss(method='4d')
+    p_co = tw.get_twiss_init('br.qfo12').particle_on_co
+
+    with pytest.raises(ValueError, match='start > end'):
+        line.compute_T_matrix(start='br.qde4', end='br.qfo12',
+                              particle_on_co=p_co)
+
+    with pytest.raises(ValueError, match='`end` must be given'):
+        line.compute_T_matrix(start='br.qfo12', particle_on_co=p_co)
+
+    line.enable_time_dependent_vars = True
+    with pytest.raises(RuntimeError, match='Time-dependent vars'):
+        line.compute_T_matrix(start='br.qfo12', end='br.qde4',
+                              particle_on_co=p_co)
+
+
+def test_taylor_map_from_line():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    line['br.qfo11'].knl[0] = 1e-4
+    tw = line.twiss(method='4d')
+
+    # Linear part against the finite-difference R matrix
+    start, end = 'br.qfo12', 'br.qde4'
+    tmap = xt.TaylorMap.from_line(line, start=start, end=end, order=3,
+                                  twiss_table=tw)
+    RR = line.compute_one_turn_matrix_finite_differences(
+        start=start, end=end,
+        particle_on_co=tw.get_twiss_init(start).particle_on_co)['R_matrix']
+    xo.assert_allclose(tmap.jacobian(tmap.z_in), RR, rtol=0, atol=1e-5)
+
+    # One-turn map of order 4
+    tmap = xt.TaylorMap.from_line(line, order=4, twiss_table=tw)
+    assert tmap.order == 4
+    assert tmap.num_terms == 210
+    xo.assert_allclose(tmap.length, tw.circumference, rtol=0, atol=1e-10)
+
+    tmap = xt.TaylorMap.from_dict(tmap.to_dict())
+    line_map = xt.Line(elements=[tmap])
+    line_map.particle_ref = line.particle_ref.copy()
+    line_map.build_tracker()
+
+    p = line.build_particles(x=tw.x[0] + np.linspace(-3e-3, 3e-3, 5),
+                             px=tw.px[0], y=1e-3,
+                             delta=np.linspace(-1e-3, 1e-3, 5))
+    p_map = p.copy()
+    line.track(p)
+    line_map.track(p_map)
+    xo.assert_allclose(p_map.x, p.x, rtol=0, atol=1e-9)
+    xo.assert_allclose(p_map.px, p.px, rtol=0, atol=1e-10)
+    xo.assert_allclose(p_map.y, p.y, rtol=0, atol=1e-9)
+    xo.assert_allclose(p_map.zeta, p.zeta, rtol=0, atol=1e-9)
+    xo.assert_allclose(p_map.delta, p.delta, rtol=0, atol=1e-10)
+
+    z_out = tmap.evaluate(np.array([p_map.x, p_map.px, p_map.y, p_map.py,
+                                    p_map.zeta, p_map.pzeta]))
+    line_map.track(p_map)
+    xo.assert_allclose(z_out[0], p_map.x, rtol=0, atol=1e-15)
+    xo.assert_allclose(z_out[5], p_map.pzeta, rtol=0, atol=1e-15)
+
+    # Tunes and chromaticities from the map only
+    qx, qy = tmap.get_tunes_4d()
+    xo.assert_allclose(qx, np.mod(tw.qx, 1), rtol=0, atol=1e-7)
+    xo.assert_allclose(qy, np.mod(tw.qy, 1), rtol=0, atol=1e-7)
+
+    dd = 1e-4
+    qx_plus, qy_plus = tmap.get_tunes_4d(pzeta=dd)
+    qx_minus, qy_minus = tmap.get_tunes_4d(pzeta=-dd)
+    xo.assert_allclose((qx_plus - qx_minus) / (2 * dd), tw.dqx,
+                       rtol=0, atol=5e-3)
+    xo.assert_allclose((qy_plus - qy_minus) / (2 * dd), tw.dqy,
+                       rtol=0, atol=5e-3)
+
+
+def test_taylor_map_coefficients_converge_with_box_size():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    line['br.qfo11'].knl[0] = 1e-4
+    tw = line.twiss(method='4d')
+
+    # The fitted coefficients are deterministic
+    tmap = xt.TaylorMap.from_line(line, order=3, twiss_table=tw)
+    tmap2 = xt.TaylorMap.from_line(line, order=3, twiss_table=tw)
+    assert np.all(tmap.get_coefficients() == tmap2.get_coefficients())
+
+    coefficients = []
+    for scale in [1, 0.5, 0.25]:
+        amplitudes = {kk: scale * vv for kk, vv
+                      in xt.twiss.DEFAULT_TAYLOR_MAP_AMPLITUDES.items()}
+        tmap = xt.TaylorMap.from_line(line, order=3, twiss_table=tw,
+                                      amplitudes=amplitudes)
+        coefficients.append(tmap.get_coefficients())
+    degree = tmap.get_exponents().sum(axis=1)
+
+    # With the symmetric grid the error of the second order terms is driven
+    # by the fourth order and decreases quadratically with the box size
+    mask = degree == 2
+    diff = [np.abs(coefficients[ii + 1][:, mask]
+                   - coefficients[ii][:, mask]).max() for ii in range(2)]
+    assert diff[1] < 0.3 * diff[0]
+    assert diff[1] < 1e-4 * np.abs(coefficients[-1][:, mask]).max()
+
+    mask = degree == 1
+    xo.assert_allclose(coefficients[-1][:, mask], coefficients[0][:, mask],
+                       rtol=0,
+                       atol=1e-9 * np.abs(coefficients[0][:, mask]).max())
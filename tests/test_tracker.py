@@ -810,3 +810,341 @@ def test_init_io_buffer(test_context):
     line.tracker._init_io_buffer()
 
     assert line.tracker.io_buffer is not None
+
+
+def test_checkpoint_and_resume_track(tmp_path, mocker):
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 0.7], ksl=[0, 0.1]),
+                             xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, -0.7, 3.]),
+                             xt.Cavity(frequency=400e6, voltage=1e6,
+                                       lag=180)])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    line.build_tracker()
+
+    p0 = line.build_particles(x=[1e-3, -2e-3, 3e-3], px=[1e-5, 0, 2e-5],
+                              zeta=1e-2, delta=[1e-4, 0, -1e-4])
+    p0._init_random_number_generator()
+
+    p_ref = p0.copy()
+    line.track(p_ref, num_turns=20, turn_by_turn_monitor=True)
+    mon_ref = line.record_last_track
+
+    checkpoint_path = tmp_path / 'checkpoint.pkl'
+
+    class Preempted(Exception):
+        pass
+
+    save_checkpoint = xt.tracker._save_checkpoint
+    def save_and_preempt(path, checkpoint):
+        save_checkpoint(path, checkpoint)
+        if checkpoint['num_turns_done'] == 14:
+            raise Preempted()
+
+    mocker.patch('xtrack.tracker._save_checkpoint', save_and_preempt)
+
+    p = p0.copy()
+    with pytest.raises(Preempted):
+        line.track(p, num_turns=20, turn_by_turn_monitor=True,
+                   checkpoint_every=7, checkpoint_path=checkpoint_path)
+    assert np.all(p.at_turn == 14)
+    assert not (tmp_path / 'checkpoint.pkl.tmp').exists()
+
+    p_resumed = line.resume_track(checkpoint_path)
+    mon = line.record_last_track
+
+    assert np.all(p_resumed.at_turn == 20)
+    for nn in ['x', 'px', 'y', 'py', 'zeta', 'delta', '_rng_s1', '_rng_s4']:
+        assert np.all(getattr(p_resumed, nn) == getattr(p_ref, nn))
+        assert np.all(getattr(mon, nn) == getattr(mon_ref, nn))
+
+    # Resuming a completed session does not track further
+    p_again = line.resume_track(checkpoint_path)
+    assert np.all(p_again.x == p_ref.x)
+    assert np.all(p_again.at_turn == 20)
+
+
+def test_track_n_workers():
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 0.7], ksl=[0, 0.1]),
+                             xt.LimitRect(min_x=-5e-3, max_x=5e-3,
+                                          min_y=-5e-3, max_y=5e-3),
+                             xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, -0.7, 50.])])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    line.build_tracker()
+
+    num_particles = 11
+    p0 = line.build_particles(x=np.linspace(-4e-3, 4e-3, num_particles),
+                              y=1e-4)
+
+    p_ref = p0.copy()
+    line.track(p_ref, num_turns=30, turn_by_turn_monitor=True)
+    mon_ref = line.record_last_track
+    assert 0 < p_ref._num_lost_particles < num_particles
+
+    p = p0.copy()
+    line.track(p, num_turns=30, turn_by_turn_monitor=True, n_workers=3)
+    mon = line.record_last_track
+
+    assert p._num_active_particles == p_ref._num_active_particles
+    assert p._num_lost_particles == p_ref._num_lost_particles
+
+    # Active and lost particles are sorted by particle_id
+    n_active = p._num_active_particles
+    assert np.all(np.diff(p.particle_id[:n_active]) > 0)
+    assert np.all(np.diff(p.particle_id[n_active:]) > 0)
+
+    p.sort(interleave_lost_particles=True)
+    p_ref.sort(interleave_lost_particles=True)
+    for nn in ['x', 'px', 'y', 'py', 'state', 'at_turn', 'at_element']:
+        assert np.all(getattr(p, nn) == getattr(p_ref, nn))
+        assert np.all(getattr(mon, nn) == getattr(mon_ref, nn))
+
+
+def test_track_early_termination():
+    line = xt.Line(elements=[xt.Drift(length=1.),
+                             xt.Multipole(knl=[0, 5.]),
+                             xt.LimitRect(min_x=-1e-2, max_x=1e-2,
+                                          min_y=-1e-2, max_y=1e-2)])
+    line.particle_ref = xt.Particles(p0c=6.5e12)
+    line.build_tracker()
+
+    # Unstable optics, all particles are lost within a few turns
+    p = line.build_particles(x=[1e-4, 2e-4, -1e-4])
+    status = line.track(p, num_turns=1_000_000, stop_when_all_lost=True)
+    assert not status.completed
+    assert status.stop_reason == 'all_lost'
+    assert status.num_active_particles == 0
+    assert np.all(p.state <= 0)
+    assert status.num_turns_done < 1000
+    assert status.num_turns_done >= p.at_turn.max()
+
+    # Completed tracking
+    p = line.build_particles(x=[1e-10, 2e-4, -1e-4])
+    p.state[1:] = 0
+    p.reorganize()
+    status = line.track(p, num_turns=10, stop_when_all_lost=True)
+    assert status.completed
+    assert status.stop_reason == 'completed'
+    assert status.num_turns_done == 10
+    assert np.all(p.at_turn[p.state > 0] == 10)
+
+    # Time budget
+    line = xt.Line(elements=[xt.Drift(length=1.) for _ in range(100)])
+    line.build_tracker()
+    p = xt.Particles(p0c=6.5e12, x=np.zeros(1000))
+    status = line.track(p, num_turns=100_000_000, max_time_s=0.5)
+    assert status.stop_reason == 'max_time'
+    assert not status.completed
+    assert 0 < status.num_turns_done < 100_000_000
+    assert np.all(p.at_turn == status.num_turns_done)
+
+
+def test_tracking_profile():
+    line = xt.Line(
+        elements=[xt.Drift(length=1.), xt.Multipole(knl=[0, 0.1])] * 5)
+    line.build_tracker()
+
+    p = xt.Particles(p0c=6.5e12, x=np.linspace(-1e-3, 1e-3, 20))
+
+    # Nothing recorded without the config flag
+    line.track(p.copy(), num_turns=3)
+    prof = line.get_tracking_profile()
+    assert np.all(prof.calls == 0)
+
+    line.config.XTRACK_PROFILE_ELEMENTS = True
+    line.track(p.copy(), num_turns=3)
+    line.track(p.copy(), num_turns=2)
+
+    prof = line.get_tracking_profile()
+    assert len(prof) == len(line.element_names) + 1
+    assert np.all(prof.name == line.get_table().name)
+    # One call per element per turn (cpu serial tracks all particles at once)
+    assert np.all(prof.calls[:-1] == 5)
+    assert prof.calls[-1] == 0
+    assert np.all(prof.cycles[:-1] > 0)
+    assert np.isclose(np.sum(prof.fraction), 1.)
+
+    prof_type = line.get_tracking_profile(by_element_type=True, reset=True)
+    assert set(prof_type.name) == {'Drift', 'Multipole'}
+    assert np.all(prof_type.num_elements == 5)
+    assert np.all(prof_type.calls == 25)
+    assert np.isclose(np.sum(prof_type.cycles), np.sum(prof.cycles))
+
+    assert np.all(line.get_tracking_profile().calls == 0)
+
+
+def test_compiled_time_dependent_vars():
+    line = xt.Line(
+        elements=[xt.Drift(length=10.), xt.Multipole(knl=[0, 0.05]),
+                  xt.Drift(length=10.), xt.Multipole(knl=[0, -0.05]),
+                  xt.Cavity(voltage=1e6, frequency=1e7, lag=170)] * 3)
+    line.particle_ref = xt.Particles(mass0=xt.PROTON_MASS_EV, p0c=1e9)
+    line.build_tracker()
+
+    line.vars['t_turn_s'] = 0.
+    line.functions['fun_kf'] = xt.FunctionPieceWiseLinear(
+        x=[0, 1e-5], y=[0.05, 0.06])
+    line.vars['kf'] = line.functions['fun_kf'](line.vars['t_turn_s'])
+    for nn in line.element_names[1::5]:
+        line.element_refs[nn].knl[1] = line.vars['kf']
+    line.energy_program = xt.EnergyProgram(
+        t_s=[0, 1e-4], kinetic_energy0=[0.5e9, 0.6e9])
+    line.enable_time_dependent_vars = True
+
+    p0 = line.build_particles(x=np.linspace(-1e-3, 1e-3, 10),
+                              delta=np.linspace(-1e-4, 1e-4, 10))
+    num_turns = 60
+
+    p_ref = p0.copy()
+    line.track(p_ref, num_turns=num_turns, turn_by_turn_monitor=True)
+    mon_ref = line.record_last_track
+    kf_ref = line.vv['kf']
+    p0c_ref = line.particle_ref.p0c[0]
+
+    line.vars['t_turn_s'] = 0.
+    line.compile_time_dependent_vars(num_turns=num_turns)
+    schedule = line.tracker._time_dependent_schedule
+    assert len(schedule.turn_to_update) == num_turns
+    assert len(schedule.target_offsets) == 3
+
+    p_comp = p0.copy()
+    line.track(p_comp, num_turns=num_turns, turn_by_turn_monitor=True)
+    mon_comp = line.record_last_track
+
+    for nn in ['x', 'px', 'zeta', 'delta', 'p0c']:
+        xo.assert_allclose(getattr(p_comp, nn), getattr(p_ref, nn),
+                           rtol=1e-12, atol=1e-15)
+    xo.assert_allclose(mon_comp.p0c, mon_ref.p0c, rtol=1e-14, atol=0)
+    xo.assert_allclose(mon_comp.x, mon_ref.x, rtol=1e-12, atol=1e-15)
+    assert line.vv['kf'] == kf_ref
+    assert line.particle_ref.p0c[0] == p0c_ref
+
+    # Turns not covered by the tables
+    with pytest.raises(ValueError):
+        line.track(p_comp, num_turns=10)
+
+    line.discard_time_dependent_schedule()
+    assert line.tracker._time_dependent_schedule is None
+
+
+def test_collective_track_plan():
+
+    class CollectiveMarker:
+        iscollective = True
+
+        def __init__(self):
+            self.num_calls = 0
+
+        def track(self, particles):
+            self.num_calls += 1
+
+    elements = [xt.Drift(length=1.), xt.Multipole(knl=[0, 0.3]),
+                xt.LimitRect(min_x=-0.02, max_x=0.02),
+                xt.Drift(length=1.), xt.Multipole(knl=[0, -0.3])] * 4
+    line_ref = xt.Line(elements=[ee.copy() for ee in elements])
+    line_ref.build_tracker()
+
+    markers = [CollectiveMarker() for _ in range(3)]
+    line = xt.Line(elements=elements[:5] + [markers[0]] + elements[5:12]
+                   + [markers[1], markers[2]] + elements[12:])
+    line.build_tracker()
+
+    p0 = xt.Particles(p0c=1e9, x=np.linspace(-0.03, 0.03, 21))
+
+    p_ref = p0.copy()
+    line_ref.track(p_ref, num_turns=4)
+    p = p0.copy()
+    line.track(p, num_turns=4)
+
+    assert len(line.tracker._collective_track_plans) == 1
+    assert all(mm.num_calls == 4 for mm in markers)
+    assert 0 < np.sum(p.state <= 0) < len(p.state)
+
+    p.sort(interleave_lost_particles=True)
+    p_ref.sort(interleave_lost_particles=True)
+    for nn in ['x', 'px', 'zeta', 'state', 'at_turn']:
+        xo.assert_allclose(getattr(p, nn), getattr(p_ref, nn), rtol=0, atol=0)
+
+    # Same as without the plan
+    line.tracker._get_collective_track_plan = lambda particles: None
+    p_no_plan = p0.copy()
+    line.track(p_no_plan, num_turns=4)
+    p_no_plan.sort(interleave_lost_particles=True)
+    for nn in ['x', 'px', 'zeta', 's', 'state', 'at_turn', 'at_element']:
+        xo.assert_allclose(getattr(p, nn), getattr(p_no_plan, nn),
+                           rtol=0, atol=0)
+
+
+def test_collective_track_plan_io_buffer_growth():
+
+    class TestElementRecord(xo.HybridClass):
+        _xofields = {
+            '_index': xt.RecordIndex,
+            'at_element': xo.Int64[:],
+            'at_turn': xo.Int64[:],
+            }
+
+    class TestElement(xt.BeamElement):
+        _xofields = {'dummy': xo.Int64}
+
+        _internal_record_class = TestElementRecord
+
+        _extra_c_sources = [r'''
+            /*gpufun*/
+            void TestElement_track_local_particle(TestElementData el,
+                                                  LocalParticle* part0){
+                TestElementRecordData record =
+                    TestElementData_getp_internal_record(el, part0);
+                RecordIndex record_index = NULL;
+                if (record){
+                    record_index = TestElementRecordData_getp__index(record);
+                }
+                //start_per_particle_block (part0->part)
+                    if (record){
+                        int64_t i_slot = RecordIndex_get_slot(record_index);
+                        if (i_slot>=0){
+                            TestElementRecordData_set_at_element(record, i_slot,
+                                        LocalParticle_get_at_element(part));
+                            TestElementRecordData_set_at_turn(record, i_slot,
+                                        LocalParticle_get_at_turn(part));
+                        }
+                    }
+                //end_per_particle_block
+            }
+            ''']
+
+    class CollectiveMarker:
+        iscollective = True
+
+        def track(self, particles):
+            pass
+
+    line = xt.Line(elements=[TestElement(), xt.Drift(length=1.),
+                             CollectiveMarker(), TestElement()])
+    line.build_tracker()
+
+    record = line.start_internal_logging_for_elements_of_type(
+                                                    TestElement, capacity=100)
+    p = xt.Particles(p0c=1e9, x=[1e-3, 2e-3, 3e-3])
+    line.track(p, num_turns=2)
+    assert len(line.tracker._collective_track_plans) == 1
+    assert record._index.num_recorded == 3 * 2 * 2
+
+    # The io_buffer is reallocated to make room for the larger record
+    io_buffer_before = line.tracker.io_buffer.buffer
+    record = line.start_internal_logging_for_elements_of_type(
+                                            TestElement, capacity=2_000_000)
+    assert line.tracker.io_buffer.buffer is not io_buffer_before
+
+    p = xt.Particles(p0c=1e9, x=[1e-3, 2e-3, 3e-3])
+    line.track(p, num_turns=3)
+    assert len(line.tracker._collective_track_plans) == 1
+
+    num_recorded = record._index.num_recorded
+    assert num_recorded == 3 * 3 * 2
+    assert np.sum(record.at_element[:num_recorded] == 0) == 3 * 3
+    assert np.sum(record.at_element[:num_recorded] == 3) == 3 * 3
+    for i_turn in range(3):
+        assert np.sum(record.at_turn[:num_recorded] == i_turn) == 3 * 2
@@ -1735,3 +1735,357 @@ def test_twiss_range_start_end(test_context, line_name, reverse, section, collid
             continue
 
         xo.assert_allclose(tw_test._data[kk], tw_ref._data[kk], rtol=0, atol=5e-13)
+
+
+@pytest.mark.parametrize('method', ['6d', '4d'])
+def test_non_linear_chromaticity_batched(method):
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    delta0 = np.linspace(-1e-3, 1e-3, 5)
+    twiss_ref = [line.twiss(delta0=dd, method=method) for dd in delta0]
+
+    # All momentum offsets are twissed together
+    nlchr = line.get_non_linear_chromaticity(delta0_range=(-1e-3, 1e-3),
+                                             num_delta=5, method=method)
+
+    xo.assert_allclose(nlchr.delta0, delta0, rtol=0, atol=1e-15)
+    assert len(nlchr.twiss) == 5
+    for tw, tw_ref in zip(nlchr.twiss, twiss_ref):
+        assert np.all(tw.name == tw_ref.name)
+        xo.assert_allclose(tw.delta, tw_ref.delta, rtol=0, atol=1e-14)
+        xo.assert_allclose(tw.x, tw_ref.x, rtol=0, atol=1e-10)
+        xo.assert_allclose(tw.betx, tw_ref.betx, rtol=1e-8, atol=0)
+        xo.assert_allclose(tw.bety, tw_ref.bety, rtol=1e-8, atol=0)
+        xo.assert_allclose(tw.dx, tw_ref.dx, rtol=0, atol=1e-7)
+        xo.assert_allclose(tw.qx, tw_ref.qx, rtol=0, atol=1e-10)
+        xo.assert_allclose(tw.qy, tw_ref.qy, rtol=0, atol=1e-10)
+        xo.assert_allclose(tw.dqx, tw_ref.dqx, rtol=1e-5, atol=0)
+        xo.assert_allclose(tw.dqy, tw_ref.dqy, rtol=1e-5, atol=0)
+        xo.assert_allclose(tw.momentum_compaction_factor,
+                           tw_ref.momentum_compaction_factor, rtol=1e-7, atol=0)
+        xo.assert_allclose(tw.bx_chrom, tw_ref.bx_chrom, rtol=0, atol=1e-4)
+
+
+def test_twiss_incremental():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    tw = line.twiss(method='4d')
+    start, end = 'br.qfo11', 'br.qde3'
+    i_start = line.element_names.index(start)
+    i_end = line.element_names.index(end)
+    kwargs = dict(start=start, end=end, init=tw.get_twiss_init(start),
+                  method='4d')
+
+    line.twiss(_incremental=True, **kwargs)
+    state = list(
+        line.tracker._tracker_data_base.cache['incremental_twiss'].values())[0]
+    assert state.num_tracked_elements == i_end + 1 - i_start
+    assert state.num_skipped_elements == 0
+
+    # Only the part of the range downstream of the modified element is tracked
+    line['br.qde2'].knl[1] *= 1.01
+    tw_incr = line.twiss(_incremental=True, **kwargs)
+    i_modified = line.element_names.index('br.qde2')
+    assert state.num_tracked_elements == 2 * (i_end + 1) - i_start - i_modified
+    assert state.num_skipped_elements == i_modified - i_start
+
+    tw_full = line.twiss(**kwargs)
+    assert np.all(tw_incr.name == tw_full.name)
+    for kk in ['s', 'x', 'px', 'betx', 'bety', 'alfx', 'alfy', 'mux', 'muy',
+               'dx', 'dpx']:
+        xo.assert_allclose(tw_incr[kk], tw_full[kk], rtol=0, atol=1e-15)
+
+    # Nothing changed, nothing is tracked
+    num_tracked = state.num_tracked_elements
+    tw_incr = line.twiss(_incremental=True, **kwargs)
+    assert state.num_tracked_elements == num_tracked
+    xo.assert_allclose(tw_incr.betx, tw_full.betx, rtol=0, atol=1e-15)
+
+    # Different initial conditions, everything is tracked again
+    init = tw_full.get_twiss_init(start)
+    init.x += 1e-4
+    tw_incr = line.twiss(start=start, end=end, init=init, method='4d',
+                         _incremental=True)
+    assert state.num_tracked_elements == num_tracked + i_end + 1 - i_start
+    tw_full = line.twiss(start=start, end=end, init=init, method='4d')
+    xo.assert_allclose(tw_incr.x, tw_full.x, rtol=0, atol=1e-15)
+    xo.assert_allclose(tw_incr.betx, tw_full.betx, rtol=0, atol=1e-15)
+
+
+@pytest.mark.parametrize('method', ['4d', '6d'])
+def test_closed_orbit_cache(method):
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    line['br.qfo11'].knl[0] = 1e-4
+
+    line.enable_closed_orbit_cache = True
+    tw_first = line.twiss(method=method)
+    co_cache = list(
+        line.tracker._tracker_data_base.cache['closed_orbit'].values())[0]
+    assert co_cache.num_cold_starts == 1
+
+    # Nothing changed, the search starts from the stored orbit
+    tw = line.twiss(method=method)
+    assert co_cache.num_warm_starts == 1
+    xo.assert_allclose(tw.x, tw_first.x, rtol=0, atol=1e-12)
+
+    # Small change, the search starts from the stored orbit
+    line['br.qfo11'].knl[0] = 1.2e-4
+    tw_warm = line.twiss(method=method)
+    assert co_cache.num_warm_starts == 2
+    assert co_cache.num_fallbacks == 0
+
+    line.enable_closed_orbit_cache = False
+    tw_cold = line.twiss(method=method)
+    assert co_cache.num_warm_starts == 2
+    xo.assert_allclose(tw_warm.x, tw_cold.x, rtol=0, atol=1e-11)
+    xo.assert_allclose(tw_warm.y, tw_cold.y, rtol=0, atol=1e-11)
+    xo.assert_allclose(tw_warm.betx, tw_cold.betx, rtol=1e-8, atol=0)
+
+    # Different reference particle, the stored orbit is not used
+    line.enable_closed_orbit_cache = True
+    line.particle_ref.p0c *= 1.001
+    line.twiss(method=method)
+    assert co_cache.num_cold_starts == 2
+
+
+@pytest.mark.parametrize('method', ['4d', '6d'])
+def test_closed_orbit_quasi_newton(method):
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+    line['br.qfo11'].knl[0] = 1e-4
+    line['br.qde3'].ksl[0] = -5e-5
+
+    tw_ref = line.twiss(method=method)
+    tw = line.twiss(method=method,
+                    co_search_settings={'solver': 'quasi_newton'})
+
+    info = tw.particle_on_co._fsolve_info
+    assert info['solver'] == 'quasi_newton'
+    assert info['num_one_turn_tracks'] <= 6
+
+    for kk in ['x', 'px', 'y', 'py']:
+        xo.assert_allclose(tw[kk], tw_ref[kk], rtol=0, atol=1e-11)
+    xo.assert_allclose(tw.R_matrix[:4, :4], tw_ref.R_matrix[:4, :4],
+                       rtol=0, atol=1e-8)
+    xo.assert_allclose(tw.R_matrix, tw_ref.R_matrix, rtol=0, atol=1e-6)
+    xo.assert_allclose(tw.betx, tw_ref.betx, rtol=1e-8, atol=0)
+    xo.assert_allclose(tw.qx, tw_ref.qx, rtol=0, atol=1e-9)
+
+    # The tolerance given in the settings is used (the zero guess is accepted)
+    tw_loose = line.twiss(method=method,
+                          co_search_settings={'solver': 'quasi_newton',
+                                              'tol': 1e-2})
+    assert tw_loose.particle_on_co._fsolve_info['num_one_turn_tracks'] == 1
+    assert tw_loose.particle_on_co._fsolve_info['num_iterations'] == 1
+    assert np.abs(tw_loose.x - tw_ref.x).max() > 1e-6
+
+    # Starting from the stored orbit and Jacobian, the orbit is found with a
+    # single turn plus the one for the one-turn matrix
+    line.enable_closed_orbit_cache = True
+    line.twiss(method=method, co_search_settings={'solver': 'quasi_newton'})
+    tw = line.twiss(method=method,
+                    co_search_settings={'solver': 'quasi_newton'})
+    assert tw.particle_on_co._fsolve_info['num_one_turn_tracks'] == 2
+    xo.assert_allclose(tw.x, tw_ref.x, rtol=0, atol=1e-11)
+
+
+def test_multiturn_twiss_single_pass():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    num_turns = 3
+    tw = line.twiss(method='4d')
+    tw_mt = line.twiss(method='4d', num_turns=num_turns)
+
+    num_elements = len(line.element_names)
+    assert len(tw_mt) == num_turns * (num_elements + 1) + 1
+    assert list(tw_mt.rows['_turn.*'].name) == ['_turn_0', '_turn_1', '_turn_2']
+    assert tw_mt.name[-1] == '_end_point'
+
+    # Each turn of the table is the same as a twiss started at the end of the
+    # previous turn
+    tw_turn = tw_mt._tw0
+    for i_turn in range(1, num_turns):
+        init = tw_turn.get_twiss_init(-1)
+        init.element_name = line.element_names[0]
+        tw_turn = line.twiss(method='4d', init=init,
+                             start=line.element_names[0],
+                             end=line.element_names[-1])
+        i_start = list(tw_mt.name).index(f'_turn_{i_turn}')
+        i_rows = i_start + 1 + np.arange(num_elements)
+        assert np.all(tw_mt.name[i_rows] == tw_turn.name[:-1])
+        for kk in ['x', 'px', 'zeta', 'delta']:
+            xo.assert_allclose(tw_mt[kk][i_rows], tw_turn[kk][:-1],
+                               rtol=0, atol=1e-14)
+        for kk in ['betx', 'bety', 'dx']:
+            xo.assert_allclose(tw_mt[kk][i_rows], tw_turn[kk][:-1],
+                               rtol=1e-8, atol=1e-10)
+        for kk in ['mux', 'muy']:
+            xo.assert_allclose(tw_mt[kk][i_rows], tw_turn[kk][:-1],
+                               rtol=0, atol=1e-9)
+        xo.assert_allclose(tw_mt['s', f'_turn_{i_turn}'],
+                           i_turn * tw.circumference, rtol=0, atol=1e-9)
+
+    xo.assert_allclose(tw_mt.mux[-1], num_turns * tw.qx, rtol=0, atol=1e-9)
+    xo.assert_allclose(tw_mt.s[-1], num_turns * tw.circumference,
+                       rtol=0, atol=1e-9)
+    assert np.all(np.isnan(tw_mt.wx_chrom[num_elements + 1:]))
+
+
+def test_multiturn_twiss_6d():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    num_turns = 3
+    tw = line.twiss(method='6d')
+    tw_mt = line.twiss(method='6d', num_turns=num_turns)
+
+    # Same as the concatenation of single-turn twiss tables, each started at
+    # the end of the previous turn
+    tw_turn = tw_mt._tw0
+    for i_turn in range(1, num_turns):
+        init = tw_turn.get_twiss_init(-1)
+        init.element_name = line.element_names[0]
+        tw_turn = line.twiss(method='6d', init=init,
+                             start=line.element_names[0],
+                             end=line.element_names[-1])
+        i_start = list(tw_mt.name).index(f'_turn_{i_turn}')
+        i_rows = i_start + np.arange(len(tw_turn))
+        for kk in ['x', 'zeta', 'delta']:
+            xo.assert_allclose(tw_mt[kk][i_rows[1:]], tw_turn[kk][:-1],
+                               rtol=0, atol=1e-12)
+        for kk in ['betx', 'bety', 'dx']:
+            xo.assert_allclose(tw_mt[kk][i_rows[1:]], tw_turn[kk][:-1],
+                               rtol=1e-6, atol=1e-10)
+        for kk in ['mux', 'muy', 'muzeta']:
+            xo.assert_allclose(tw_mt[kk][i_rows[1:]], tw_turn[kk][:-1],
+                               rtol=0, atol=1e-8)
+        xo.assert_allclose(tw_mt.dzeta[i_rows[1:]], tw_turn.dzeta[:-1],
+                           rtol=1e-9, atol=0)
+
+    for kk in ['mux', 'muy', 'muzeta']:
+        xo.assert_allclose(tw_mt[kk][-1], tw_turn[kk][-1], rtol=0, atol=1e-8)
+    xo.assert_allclose(tw_mt.dzeta[-1], tw_turn.dzeta[-1], rtol=1e-9, atol=0)
+    xo.assert_allclose(tw_mt['dzeta', '_end_point'], num_turns * tw.dzeta[-1],
+                       rtol=1e-8, atol=0)
+    xo.assert_allclose(tw_mt['muzeta', '_end_point'], num_turns * tw.qs,
+                       rtol=0, atol=1e-8)
+
+
+def test_twiss_sparse_at_elements():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    tw = line.twiss(method='4d')
+    start, end = 'br.qfo11', 'br.qde3'
+    init = tw.get_twiss_init(start)
+    tw_full = line.twiss(method='4d', start=start, end=end, init=init)
+
+    at_elements = ['br.qde2', 'br.qfo12', 5, '_end_point', -2]
+    tw_sparse = line.twiss(method='4d', start=start, end=end, init=init,
+                           at_elements=at_elements, sparse_at_elements=True)
+
+    # Only the requested elements and the start of the range are recorded
+    assert line.record_last_track.ebe_mode == 2
+    assert line.record_last_track.x.shape == (13, len(at_elements) + 1)
+
+    assert list(tw_sparse.name) == ['br.qde2', 'br.qfo12', tw_full.name[5],
+                                    '_end_point', 'br.qde3']
+    tw_ref = tw_full.rows[list(tw_sparse.name)]
+    for kk in ['s', 'x', 'px', 'y', 'py', 'zeta', 'delta', 'betx', 'bety',
+               'alfx', 'alfy', 'dx', 'dpx', 'mux', 'muy', 'dzeta']:
+        xo.assert_allclose(tw_sparse[kk], tw_ref[kk], rtol=1e-12, atol=1e-14)
+
+
+def test_twiss_lazy_lattice_functions():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    tw = line.twiss(method='4d')
+    start, end = 'br.qfo11', 'br.qde3'
+    init = tw.get_twiss_init(start)
+    init.mux = 0.3
+    init.muy = 0.1
+
+    tw_open = line.twiss(method='4d', start=start, end=end, init=init)
+
+    # The lattice functions are not computed until they are accessed
+    assert 'betx' in tw_open.keys()
+    assert set(xt.twiss.COLUMNS_LATTICE_FUNCTIONS) == set(
+        tw_open._data._pending)
+    xo.assert_allclose(tw_open.x[:-1], tw.rows[start:end].x,
+                       rtol=0, atol=1e-12)
+    assert len(tw_open._data._pending) == len(
+        xt.twiss.COLUMNS_LATTICE_FUNCTIONS)
+
+    betx = tw_open['betx', end]
+    assert len(tw_open._data._pending) == 0
+
+    tw_ref = tw.rows[start:end]
+    xo.assert_allclose(betx, tw['betx', end], rtol=1e-8, atol=0)
+    for kk in ['betx', 'bety', 'alfx', 'alfy', 'dx', 'dpx']:
+        xo.assert_allclose(tw_open[kk][:-1], tw_ref[kk], rtol=1e-8, atol=1e-8)
+    xo.assert_allclose(tw_open.mux[:-1], tw_ref.mux - tw_ref.mux[0] + 0.3,
+                       rtol=0, atol=1e-10)
+    xo.assert_allclose(tw_open.muy[:-1], tw_ref.muy - tw_ref.muy[0] + 0.1,
+                       rtol=0, atol=1e-10)
+    assert np.all(tw_open.muzeta == 0)
+    assert tw_open._col_names.index('W_matrix') < tw_open._col_names.index('betx')
+
+
+def test_twiss_sparse_at_elements_far_apart():
+
+    line = xt.Line.from_json(test_data_folder /
+                             'psb_injection/line_and_particle.json')
+    line.build_tracker()
+
+    tw = line.twiss(method='4d')
+    init = tw.get_twiss_init(line.element_names[0])
+    tw_full = line.twiss(method='4d', start=line.element_names[0],
+                         end='_end_point', init=init)
+
+    # More than half a betatron period between the requested points
+    at_elements = ['br.qfo11', 'br.qde5', 'br.qfo101', '_end_point']
+    tw_ref = tw_full.rows[at_elements]
+    assert np.all(np.diff(tw_ref.mux) > 0.5)
+    assert np.all(np.diff(tw_ref.muy) > 0.5)
+
+    # By default the full range is recorded and the phase advance is kept
+    tw_at = line.twiss(method='4d', start=line.element_names[0],
+                       end='_end_point', init=init, at_elements=at_elements)
+    assert line.record_last_track.ebe_mode == 1
+    for kk in ['s', 'x', 'betx', 'bety', 'dx', 'mux', 'muy']:
+        xo.assert_allclose(tw_at[kk], tw_ref[kk], rtol=1e-12, atol=1e-14)
+    xo.assert_allclose(tw_at.mux[-1], tw.qx, rtol=0, atol=1e-8)
+
+    # With a sparse record only the fractional part of the phase advance is
+    # kept
+    tw_sparse = line.twiss(method='4d', start=line.element_names[0],
+                           end='_end_point', init=init,
+                           at_elements=at_elements, sparse_at_elements=True)
+    assert line.record_last_track.ebe_mode == 2
+    for kk in ['s', 'x', 'betx', 'bety', 'dx']:
+        xo.assert_allclose(tw_sparse[kk], tw_ref[kk], rtol=1e-12, atol=1e-14)
+    for kk in ['mux', 'muy']:
+        xo.assert_allclose(np.mod(tw_sparse[kk] - tw_ref[kk] + 0.5, 1), 0.5,
+                           rtol=0, atol=1e-10)
+    assert tw_sparse.mux[-1] < tw.qx - 1
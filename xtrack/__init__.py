@@ -5,7 +5,7 @@
 
 from .general import _pkg_root, _print, START, END
 
-from .particles import (Particles, PROTON_MASS_EV, ELECTRON_MASS_EV,
+from .particles import (Particles, ParticlesFloat32, PROTON_MASS_EV, ELECTRON_MASS_EV,
                         enable_pyheadtail_interface, disable_pyheadtail_interface)
 
 from .base_element import BeamElement, Replica
@@ -14,6 +14,7 @@ from .random import *
 from .tracker_data import TrackerData
 from .line import Line, Node, freeze_longitudinal, _temp_knobs, EnergyProgram
 from .tracker import Tracker, Log
+from .kernel_cache import KernelCache
 from .match import (Vary, Target, TargetList, VaryList, TargetInequality, Action,
                     TargetRelPhaseAdvance, TargetSet, GreaterThan, LessThan,
                     TargetRmatrixTerm, TargetRmatrix)
@@ -24,7 +25,8 @@ from .loss_location_refinement import LossLocationRefinement
 from .internal_record import (RecordIdentifier, RecordIndex, new_io_buffer,
                              start_internal_logging, stop_internal_logging)
 from .pipeline import (PipelineStatus, PipelineMultiTracker, PipelineBranch,
-                        PipelineManager)
+                        PipelineManager, SharedMemoryCommunicator,
+                        track_branches_in_processes)
 
 from .monitors import *
 from . import linear_normal_form
@@ -172,6 +172,8 @@ def _generate_per_particle_kernel_from_local_particle_function(
         add_to_call = ", " + ", ".join(f"{arg.name}" for arg in additional_args)
 
     source = ('''
+            // The per-element kernels take double precision particles only
+            #ifndef XTRACK_PARTICLES_FLOAT32
             /*gpukern*/
             '''
             f'void {kernel_name}(\n'
@@ -243,6 +245,7 @@ def _generate_per_particle_kernel_from_local_particle_function(
             check_is_active(&lpart);                                   //only_for_context cpu_openmp
             #endif                                                     //only_for_context cpu_openmp
         }
+            #endif // XTRACK_PARTICLES_FLOAT32
 ''')
     return source
 
@@ -2395,11 +2395,9 @@ class SecondOrderTaylorMap(BeamElement):
         twinit = tw.get_twiss_init(start)
         twinit_out = tw.get_twiss_init(end)
 
-        RR = line.compute_one_turn_matrix_finite_differences(
-            start=start, end=end, particle_on_co=twinit.particle_on_co
-            )['R_matrix']
-        TT = line.compute_T_matrix(start=start, end=end,
-                                    particle_on_co=twinit.particle_on_co)
+        from ..twiss import _compute_R_and_T_matrix
+        RR, TT = _compute_R_and_T_matrix(
+            line, start=start, end=end, particle_on_co=twinit.particle_on_co)
 
         x_co_in = np.array([
             twinit.particle_on_co.x[0],
@@ -2479,5 +2477,227 @@ class SecondOrderTaylorMap(BeamElement):
 
         return out
 
+class TaylorMap(BeamElement):
+
+    '''
+    Implements a truncated power series map of arbitrary order:
+
+       z_out[i] = sum_t (C[i,t] * prod_j (z_in[j] - z0[j])**E[t,j])
+
+       where z = (x, px, y, py, zeta, pzeta)
+
+    When the map is built with `TaylorMap.from_line`, the coefficients are
+    obtained from a polynomial fit of the tracked map around the expansion
+    point, not from a differential algebra: they approximate the Taylor
+    coefficients to an accuracy that depends on the size of the fitted
+    region.
+
+    Parameters
+    ----------
+    length : float
+        length of the element in meters.
+    exponents : array_like
+        n_terms x 6 array of the exponents E of the monomials.
+    coefficients : array_like
+        6 x n_terms array of the coefficients C of the monomials.
+    z_in : array_like
+        6x1 array with the expansion point z0.
+
+    '''
+
+    isthick = True
+
+    _extra_c_sources = [
+        _pkg_root.joinpath('beam_elements/elements_src/taylor_map.h')]
+
+    _xofields={
+        'num_terms': xo.Int64,
+        'exponents': xo.Int64[:],
+        'coefficients': xo.Float64[:],
+        'z_in': xo.Float64[6],
+        'length': xo.Float64,
+    }
+
+    _skip_in_to_dict = ['num_terms']  # defined by exponents
+
+    def __init__(self, exponents=None, coefficients=None, _xobject=None,
+                 **kwargs):
+
+        if _xobject is not None:
+            super().__init__(_xobject=_xobject, **kwargs)
+            return
+
+        kwargs.pop('num_terms', None)
+        exponents = np.array(exponents, dtype=np.int64).reshape(-1, 6)
+        num_terms = len(exponents)
+        coefficients = np.array(coefficients, dtype=np.float64).reshape(
+                                                                6, num_terms)
+
+        super().__init__(num_terms=num_terms,
+                         exponents=exponents.flatten(),
+                         coefficients=coefficients.flatten(), **kwargs)
+
+    @classmethod
+    def from_line(cls, line, start=None, end=None, order=3,
+                  twiss_table=None, particle_on_co=None, amplitudes=None,
+                  **kwargs):
+
+        '''
+        Generate a `TaylorMap` from a `Line` object. The coefficients are
+        obtained from a single tracking of particles placed on a symmetric
+        grid around the closed orbit, to which the power series is fitted by
+        least squares (see `amplitudes`). They are therefore fit-based: they
+        tend to the Taylor coefficients of the map as the amplitudes are
+        reduced, with an error driven by the terms above `order`.
+
+        Parameters
+        ----------
+        line : Line
+            A `Line` object.
+        start : str, optional
+            Name of the element where the map starts. If not given, the
+            one-turn map is computed.
+        end : str, optional
+            Name of the element where the map stops.
+        order : int
+            Order of the map.
+        twiss_table : TwissTable, optional
+            A `TwissTable` object. If not given, it will be computed.
+        particle_on_co : Particles, optional
+            Particle around which the map is expanded. If not given, the
+            closed orbit at `start` is used.
+        amplitudes : dict, optional
+            Half-widths of the region around the expansion point in which
+            the map is fitted, with keys `x`, `px`, `y`, `py`, `zeta`,
+            `pzeta` (defaults in
+            `xtrack.twiss.DEFAULT_TAYLOR_MAP_AMPLITUDES`). The grid covers
+            the part of the box in which the sum of the absolute values of
+            the coordinates, normalized to these half-widths, is at most one.
+
+        Returns
+        -------
+        TaylorMap
+            A `TaylorMap` object.
+
+        '''
+
+        from ..twiss import _fit_taylor_map
+
+        if (start is None) != (end is None):
+            raise ValueError('`start` and `end` must be both given or both None')
+
+        if particle_on_co is None or start is not None:
+            if twiss_table is None:
+                tw = line.twiss(reverse=False)
+            else:
+                tw = twiss_table
+
+        if particle_on_co is None:
+            particle_on_co = tw.get_twiss_init(
+                                start or line.element_names[0]).particle_on_co
+
+        exponents, coefficients, z_in = _fit_taylor_map(
+            line, start=start, end=end, particle_on_co=particle_on_co,
+            order=order, amplitudes=amplitudes)
+
+        if start is None:
+            length = line.get_length()
+        else:
+            length = tw['s', end] - tw['s', start]
+
+        return cls(exponents=exponents, coefficients=coefficients, z_in=z_in,
+                   length=length, **kwargs)
+
+    @property
+    def order(self):
+        return int(self.get_exponents().sum(axis=1).max())
+
+    def get_exponents(self):
+        '''
+        Exponents of the monomials, with shape (n_terms, 6).
+        '''
+        return np.array(self.exponents).reshape(-1, 6)
+
+    def get_coefficients(self):
+        '''
+        Coefficients of the monomials, with shape (6, n_terms).
+        '''
+        return np.array(self.coefficients).reshape(6, -1)
+
+    def evaluate(self, z):
+
+        '''
+        Apply the map to the coordinates `z` = (x, px, y, py, zeta, pzeta),
+        with shape (6,) or (6, n_points).
+        '''
+
+        from ..twiss import _monomials
+
+        z = np.array(z, dtype=np.float64)
+        dz = z.reshape(6, -1) - np.array(self.z_in)[:, None]
+        out = self.get_coefficients() @ _monomials(self.get_exponents(), dz).T
+
+        return out.reshape(z.shape)
+
+    def jacobian(self, z):
+
+        '''
+        Jacobian of the map at the coordinates `z`, with shape (6, 6).
+        '''
+
+        from ..twiss import _monomials
+
+        dz = np.array(z, dtype=np.float64) - np.array(self.z_in)
+        exponents = self.get_exponents()
+        coefficients = self.get_coefficients()
+
+        out = np.zeros(shape=(6, 6), dtype=np.float64)
+        for jj in range(6):
+            exponents_d = exponents.copy()
+            exponents_d[:, jj] = np.maximum(exponents[:, jj] - 1, 0)
+            monomials_d = (exponents[:, jj]
+                           * _monomials(exponents_d, dz[:, None])[0, :])
+            out[:, jj] = coefficients @ monomials_d
+
+        return out
+
+    def get_tunes_4d(self, pzeta=None, max_iterations=20, tol=1e-14):
+
+        '''
+        Fractional transverse tunes of a one-turn map for a given `pzeta`,
+        obtained from the linearization of the map around its transverse
+        fixed point (no tracking is needed). The chromaticities can be
+        obtained by differentiating with respect to `pzeta`.
+
+        Returns
+        -------
+        qx, qy : float
+            Fractional tunes.
+        '''
+
+        from ..linear_normal_form import compute_linear_normal_form
+
+        zz = np.array(self.z_in)
+        if pzeta is not None:
+            zz[5] = pzeta
+
+        # Transverse fixed point (zeta and pzeta are kept fixed)
+        for _ in range(max_iterations):
+            err = (self.evaluate(zz) - zz)[:4]
+            if np.all(np.abs(err) < tol):
+                break
+            jac = self.jacobian(zz)[:4, :4] - np.eye(4)
+            zz[:4] -= np.linalg.solve(jac, err)
+
+        RR = np.eye(6)
+        RR[:4, :4] = self.jacobian(zz)[:4, :4]
+        _, _, Rot, _ = compute_linear_normal_form(RR, only_4d_block=True)
+
+        qx = np.mod(np.arctan2(Rot[0, 1], Rot[0, 0]) / (2 * np.pi), 1)
+        qy = np.mod(np.arctan2(Rot[2, 3], Rot[2, 2]) / (2 * np.pi), 1)
+
+        return qx, qy
+
+
 class ThinSliceNotNeededError(Exception):
     pass
@@ -0,0 +1,59 @@
+// copyright ############################### //
+// This file is part of the Xtrack Package.  //
+// Copyright (c) CERN, 2024.                 //
+// ######################################### //
+
+#ifndef XTRACK_TAYLORMAP_H
+#define XTRACK_TAYLORMAP_H
+
+/*gpufun*/
+void TaylorMap_track_local_particle(TaylorMapData el, LocalParticle* part0){
+
+    double const length = TaylorMapData_get_length(el);
+    int64_t const num_terms = TaylorMapData_get_num_terms(el);
+
+    //start_per_particle_block (part0->part)
+
+        double dz[6];
+        double z_out[6];
+
+        dz[0] = LocalParticle_get_x(part) - TaylorMapData_get_z_in(el, 0);
+        dz[1] = LocalParticle_get_px(part) - TaylorMapData_get_z_in(el, 1);
+        dz[2] = LocalParticle_get_y(part) - TaylorMapData_get_z_in(el, 2);
+        dz[3] = LocalParticle_get_py(part) - TaylorMapData_get_z_in(el, 3);
+        dz[4] = LocalParticle_get_zeta(part) - TaylorMapData_get_z_in(el, 4);
+        dz[5] = LocalParticle_get_ptau(part) / LocalParticle_get_beta0(part)
+                - TaylorMapData_get_z_in(el, 5);
+
+        for (int ii = 0; ii < 6; ii++){
+            z_out[ii] = 0;
+        }
+
+        for (int64_t tt = 0; tt < num_terms; tt++){
+            double monomial = 1.;
+            for (int jj = 0; jj < 6; jj++){
+                int64_t const ee = TaylorMapData_get_exponents(el, 6 * tt + jj);
+                for (int64_t kk = 0; kk < ee; kk++){
+                    monomial *= dz[jj];
+                }
+            }
+            for (int ii = 0; ii < 6; ii++){
+                z_out[ii] += TaylorMapData_get_coefficients(
+                                        el, ii * num_terms + tt) * monomial;
+            }
+        }
+
+        LocalParticle_set_x(part, z_out[0]);
+        LocalParticle_set_px(part, z_out[1]);
+        LocalParticle_set_y(part, z_out[2]);
+        LocalParticle_set_py(part, z_out[3]);
+        LocalParticle_set_zeta(part, z_out[4]);
+        LocalParticle_update_ptau(part, z_out[5] * LocalParticle_get_beta0(part));
+
+        LocalParticle_add_to_s(part, length);
+
+    //end_per_particle_block
+
+}
+
+#endif
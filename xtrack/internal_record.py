@@ -87,6 +87,175 @@ class RecordIndex(xo.Struct):
 
 class IOBufferHeader(xo.Struct):
     buffer_id = xo.Int64
+    element_profile_offset = xo.Int64
+    time_dependent_schedule_offset = xo.Int64
+
+
+_ElementProfile_source = r'''
+#ifdef XTRACK_PROFILE_ELEMENTS
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <x86intrin.h>
+#else
+#include <time.h>
+#endif
+
+/*gpufun*/
+int64_t ElementProfile_clock(void){
+    #if defined(__x86_64__) || defined(__i386__)
+    return (int64_t) __rdtsc();
+    #elif defined(__aarch64__)
+    int64_t ticks;
+    __asm__ volatile("mrs %0, cntvct_el0" : "=r"(ticks));
+    return ticks;
+    #else
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return (int64_t) ts.tv_sec * 1000000000 + (int64_t) ts.tv_nsec;
+    #endif
+}
+
+/*gpufun*/
+ElementProfile ElementProfile_from_io_buffer(/*gpuglmem*/ int8_t* io_buffer){
+    if (io_buffer == NULL){
+        return NULL;
+    }
+    int64_t offset = IOBufferHeader_get_element_profile_offset(
+                                            (IOBufferHeader) io_buffer);
+    if (offset <= 0){
+        return NULL;
+    }
+    return (ElementProfile) (io_buffer + offset);
+}
+
+/*gpufun*/
+void ElementProfile_record(ElementProfile profile, int64_t elem_idx,
+                           int64_t num_cycles){
+    if (profile == NULL || elem_idx >= ElementProfile_len_calls(profile)){
+        return;
+    }
+    /*gpuglmem*/ int64_t* calls = ElementProfile_getp1_calls(profile, elem_idx);
+    /*gpuglmem*/ int64_t* cycles = ElementProfile_getp1_cycles(profile, elem_idx);
+
+    #pragma omp atomic //only_for_context cpu_openmp
+    *calls += 1;
+    #pragma omp atomic //only_for_context cpu_openmp
+    *cycles += num_cycles;
+}
+
+#endif // XTRACK_PROFILE_ELEMENTS
+'''
+
+
+class ElementProfile(xo.Struct):
+    '''
+    Per-element counters filled by the track kernel when it is compiled with
+    `XTRACK_PROFILE_ELEMENTS`. Stored in the io_buffer of the tracker.
+    '''
+    calls = xo.Int64[:]
+    cycles = xo.Int64[:]
+
+    _depends_on = [IOBufferHeader]
+    _extra_c_sources = [_ElementProfile_source]
+
+
+_TimeDependentSchedule_source = r'''
+#ifdef XTRACK_TIME_DEPENDENT_SCHEDULE
+
+/*gpufun*/
+TimeDependentSchedule TimeDependentSchedule_from_io_buffer(
+                                        /*gpuglmem*/ int8_t* io_buffer){
+    if (io_buffer == NULL){
+        return NULL;
+    }
+    int64_t offset = IOBufferHeader_get_time_dependent_schedule_offset(
+                                            (IOBufferHeader) io_buffer);
+    if (offset <= 0){
+        return NULL;
+    }
+    return (TimeDependentSchedule) (io_buffer + offset);
+}
+
+/*gpufun*/
+void TimeDependentSchedule_update_p0c(LocalParticle* part, double new_p0c){
+    // Same as Particles.update_p0c_and_energy_deviations (px and py are not
+    // rescaled)
+    double const mass0 = LocalParticle_get_mass0(part);
+    double const old_p0c = LocalParticle_get_p0c(part);
+    double const old_beta0 = LocalParticle_get_beta0(part);
+    double const ppc = (LocalParticle_get_delta(part) + 1.) * old_p0c;
+
+    double const new_energy0 = sqrt(new_p0c * new_p0c + mass0 * mass0);
+    double const new_beta0 = new_p0c / new_energy0;
+
+    LocalParticle_set_p0c(part, new_p0c);
+    LocalParticle_set_gamma0(part, new_energy0 / mass0);
+    LocalParticle_set_beta0(part, new_beta0);
+    LocalParticle_update_delta(part, ppc / new_p0c - 1.);
+    LocalParticle_scale_zeta(part, new_beta0 / old_beta0);
+}
+
+/*gpufun*/
+void TimeDependentSchedule_apply(TimeDependentSchedule schedule,
+                                 /*gpuglmem*/ int8_t* buffer,
+                                 LocalParticle* part0){
+    // Called at the start of each turn, the active particles are at the
+    // beginning of the arrays and the first one gives the turn number
+    if (schedule == NULL || part0->_num_active_particles == 0){
+        return;
+    }
+    int64_t const row = part0->at_turn[0]
+                        - TimeDependentSchedule_get_start_turn(schedule);
+    if (row < 0 || row >= TimeDependentSchedule_len_turn_to_update(schedule)){
+        return;
+    }
+    int64_t const iupdate = TimeDependentSchedule_get_turn_to_update(schedule, row);
+    if (iupdate == TimeDependentSchedule_get_last_applied_update(schedule)){
+        return;
+    }
+
+    int64_t const num_targets = TimeDependentSchedule_len_target_offsets(schedule);
+    for (int64_t ii = 0; ii < num_targets; ii++){
+        int64_t const offset = TimeDependentSchedule_get_target_offsets(schedule, ii);
+        *((/*gpuglmem*/ int64_t*) (buffer + offset)) =
+            TimeDependentSchedule_get_values(schedule, iupdate * num_targets + ii);
+    }
+
+    if (TimeDependentSchedule_len_p0c(schedule) > 0){
+        double const p0c = TimeDependentSchedule_get_p0c(schedule, iupdate);
+        //start_per_particle_block (part0->part)
+            TimeDependentSchedule_update_p0c(part, p0c);
+        //end_per_particle_block
+    }
+
+    TimeDependentSchedule_set_last_applied_update(schedule, iupdate);
+}
+
+#endif // XTRACK_TIME_DEPENDENT_SCHEDULE
+'''
+
+
+class TimeDependentSchedule(xo.Struct):
+    '''
+    Per-turn settings of the elements controlled by time-dependent variables,
+    applied by the track kernel at the start of each turn when it is compiled
+    with `XTRACK_TIME_DEPENDENT_SCHEDULE`. Stored in the io_buffer of the
+    tracker.
+
+    `values` contains, for each update, the 64-bit words to be written at
+    `target_offsets` in the element buffer and `turn_to_update` gives the
+    update to be applied at each turn starting from `start_turn`. If `p0c` is
+    not empty, the reference momentum of the particles is updated as well.
+    '''
+    start_turn = xo.Int64
+    last_applied_update = xo.Int64
+    turn_to_update = xo.Int64[:]
+    target_offsets = xo.Int64[:]
+    values = xo.Int64[:]
+    p0c = xo.Float64[:]
+
+    _depends_on = [IOBufferHeader, Particles._XoStruct]
+    _extra_c_sources = [_TimeDependentSchedule_source]
 
 def new_io_buffer(_context=None, capacity=1048576):
 
@@ -98,6 +267,8 @@ def new_io_buffer(_context=None, capacity=1048576):
     assert head._offset == 0
     assert head._buffer is iobuf
     head.buffer_id = np.random.randint(0, 2**60, dtype=np.int64)
+    head.element_profile_offset = 0
+    head.time_dependent_schedule_offset = 0
 
     return iobuf
 
@@ -0,0 +1,283 @@
+# copyright ############################### #
+# This file is part of the Xtrack Package.  #
+# Copyright (c) CERN, 2024.                 #
+# ######################################### #
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import xobjects as xo
+from xobjects.context import (classes_from_kernels, sort_classes,
+                              sources_from_classes)
+
+from .general import _print
+from ._version import __version__
+
+KERNEL_CACHE_ENV_VAR = 'XTRACK_KERNEL_CACHE_DIR'
+_MODULE_PREFIX = 'xtk_'
+
+
+class KernelCache:
+    """
+    Local on-disk cache of compiled track kernels.
+
+    The compiled shared objects are stored in `path` and are named after a
+    hash of everything that determines the compiled code: the tracker
+    config, the C structs generated from the `_xofields` of the classes in
+    the kernel (and of the classes they depend on), the contents of their
+    C sources and of the local files they include, the versions of the
+    packages providing them and the compilation settings. Several processes
+    can share
+    the same cache directory: kernels are compiled in a private staging
+    directory and moved in place atomically.
+
+    Parameters
+    ----------
+    path: str or pathlib.Path
+        Directory in which the compiled kernels are stored (created if
+        needed).
+    max_size: int, optional
+        Maximum size in bytes of the cache. When it is exceeded, the least
+        recently used kernels are removed. Default is 1 GB.
+    """
+
+    def __init__(self, path, max_size=1_000_000_000):
+        self.path = Path(path).absolute()
+        self.max_size = max_size
+
+    def __repr__(self):
+        return f'KernelCache({str(self.path)!r}, max_size={self.max_size})'
+
+    def get_key(self, config_headers, kernel_element_classes,
+                extra_classes=(), kernel_names=(), extra_sources=(),
+                context=None, kernel_descriptions=None):
+        """
+        Return the cache key (also used as module name) for a kernel.
+        """
+        element_classes = [_class_name(cc) for cc in kernel_element_classes]
+        package_versions = {'xobjects': xo.__version__, 'xtrack': __version__}
+        for cc in list(kernel_element_classes) + list(extra_classes):
+            pkg = _class_package(cc)
+            if pkg not in package_versions:
+                package_versions[pkg] = getattr(
+                    sys.modules.get(pkg), '__version__', None)
+
+        # Struct definitions and sources of the classes used in the kernel
+        classes = list(kernel_element_classes) + list(extra_classes)
+        if kernel_descriptions is not None:
+            classes += list(classes_from_kernels(kernel_descriptions))
+        sources = sources_from_classes(sort_classes(classes))
+        sources += list(extra_sources)
+        source_hash = hashlib.sha256()
+        contents = []
+        folders = []
+        for ss in sources:
+            ss_contents, ss_folder = _source_contents(ss)
+            source_hash.update(ss_contents.encode())
+            contents.append(ss_contents)
+            if ss_folder is not None and ss_folder not in folders:
+                folders.append(ss_folder)
+        for fname, ff_contents in _included_files(contents, folders):
+            source_hash.update(fname.encode())
+            source_hash.update(ff_contents.encode())
+
+        description = {
+            'config_headers': sorted(config_headers),
+            'element_classes': sorted(element_classes),
+            'extra_classes': sorted(_class_name(cc) for cc in extra_classes),
+            'kernel_names': sorted(kernel_names),
+            'package_versions': package_versions,
+            'sources': source_hash.hexdigest(),
+            'openmp': getattr(context, 'openmp_enabled', False),
+            'compiler': [os.environ.get(kk) for kk in ('CC', 'CFLAGS', 'LDFLAGS')],
+            'python': sys.implementation.cache_tag,
+        }
+        digest = hashlib.sha256(
+            json.dumps(description, sort_keys=True).encode()).hexdigest()
+        return _MODULE_PREFIX + digest[:32]
+
+    def load(self, key, context, kernel_descriptions):
+        """
+        Load the kernels stored under `key`. Returns `None` if they are not
+        available in the cache.
+        """
+        so_files = list(self.path.glob(f'{key}.*'))
+        if len(so_files) == 0:
+            return None
+
+        try:
+            kernels = context.kernels_from_file(
+                module_name=key,
+                containing_dir=self.path,
+                kernel_descriptions=kernel_descriptions,
+            )
+        except (OSError, ImportError) as err:
+            # The file might have been evicted by another process or be
+            # corrupted, in which case we just compile again
+            _print(f'Could not load kernel {key} from cache: {err}')
+            return None
+
+        for ff in so_files:
+            try:
+                os.utime(ff)  # Mark as recently used
+            except OSError:
+                pass
+
+        return kernels
+
+    def new_staging_dir(self):
+        """
+        Create a private directory in which a kernel can be compiled before
+        being moved to the cache with `store`.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix='.staging_', dir=self.path))
+
+    def store(self, key, staging_dir):
+        """
+        Move the kernel compiled in `staging_dir` to the cache and remove the
+        staging directory. Older kernels are evicted if the size limit is
+        exceeded.
+        """
+        staging_dir = Path(staging_dir)
+        try:
+            for ff in staging_dir.glob(f'{key}.*'):
+                os.replace(ff, self.path / ff.name)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        Return the cached files sorted from least to most recently used.
+        """
+        if not self.path.exists():
+            return []
+        out = []
+        for ff in self.path.glob(f'{_MODULE_PREFIX}*'):
+            try:
+                stat = ff.stat()
+            except FileNotFoundError:
+                continue
+            out.append((stat.st_mtime, stat.st_size, ff))
+        out.sort(key=lambda x: x[0])
+        return [(ff, size) for _, size, ff in out]
+
+    @property
+    def size(self):
+        return sum(size for _, size in self.entries())
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used kernels until the cache size is below
+        `max_size`. Files belonging to the kernel `keep` are never removed.
+        """
+        entries = self.entries()
+        total_size = sum(size for _, size in entries)
+        for ff, size in entries:
+            if total_size <= self.max_size:
+                break
+            if keep is not None and ff.name.startswith(keep + '.'):
+                continue
+            try:
+                ff.unlink()
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def clear(self):
+        """
+        Remove all kernels from the cache.
+        """
+        for ff, _ in self.entries():
+            try:
+                ff.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _class_name(cls):
+    if hasattr(cls, '_DressingClass'):
+        cls = cls._DressingClass
+    return f'{cls.__module__}.{cls.__name__}'
+
+
+def _source_contents(source):
+    """
+    Return the text of a kernel source and the folder in which its included
+    files are searched (`None` for sources given as strings). File-like
+    sources are left at their initial position, as they are read again when
+    the kernel is compiled.
+    """
+    if isinstance(source, xo.context.Source):
+        source = source.source
+    if hasattr(source, 'read'):
+        position = source.tell()
+        contents = source.read()
+        source.seek(position)
+        return contents, os.path.dirname(getattr(source, 'name', ''))
+    if isinstance(source, Path):
+        with open(source, 'r') as fid:
+            return fid.read(), str(source.parent)
+    return source, None
+
+
+_INCLUDE_PATTERN = re.compile(
+    r'//include_file\s+(\S+)\s+for_context|#include\s+"([^"]+)"')
+
+
+def _included_files(contents, folders):
+    """
+    Return the names and contents, sorted by name, of the files included
+    by the given sources (`//include_file` directives and `#include "..."`)
+    and, recursively, by the included files. As in xobjects, they are
+    searched in the working directory and in the folders of the sources.
+    Headers that are not found there (e.g. system headers) are skipped.
+    """
+    found = {}
+    to_scan = list(contents)
+    while to_scan:
+        for mm in _INCLUDE_PATTERN.finditer(to_scan.pop()):
+            fname = mm.group(1) or mm.group(2)
+            if fname in found:
+                continue
+            for folder in ['./'] + folders:
+                fpath = os.path.join(folder, fname)
+                if os.path.isfile(fpath):
+                    break
+            else:
+                continue
+            with open(fpath, 'r') as fid:
+                found[fname] = fid.read()
+            to_scan.append(found[fname])
+    return sorted(found.items())
+
+
+def _class_package(cls):
+    if hasattr(cls, '_DressingClass'):
+        cls = cls._DressingClass
+    return cls.__module__.split('.')[0]
+
+
+def get_kernel_cache(kernel_cache):
+    """
+    Return a `KernelCache` from the user input, which can be a `KernelCache`,
+    a path or `None`. In the latter case the cache directory is taken from the
+    environment variable `XTRACK_KERNEL_CACHE_DIR` (no cache if not set).
+    """
+    if kernel_cache is False:
+        return None
+    if kernel_cache is None:
+        kernel_cache = os.environ.get(KERNEL_CACHE_ENV_VAR) or None
+        if kernel_cache is None:
+            return None
+    if isinstance(kernel_cache, KernelCache):
+        return kernel_cache
+    return KernelCache(kernel_cache)
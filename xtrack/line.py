@@ -5,6 +5,7 @@
 
 import io
 import math
+import numbers
 import logging
 import json
 import uuid
@@ -106,6 +107,8 @@ class Line:
         self._extra_config['_bhabha_model'] = None
         self._extra_config['_needs_rng'] = False
         self._extra_config['enable_time_dependent_vars'] = False
+        self._extra_config['enable_linear_map_cache'] = False
+        self._extra_config['enable_closed_orbit_cache'] = False
         self._extra_config['twiss_default'] = {}
         self._extra_config['steering_monitors_x'] = None
         self._extra_config['steering_monitors_y'] = None
@@ -723,6 +726,196 @@ class Line:
 
         return xd.Table(data=data)
 
+    def get_tracking_profile(self, by_element_type=False, reset=False):
+        """
+        Return the time spent in each element during tracking.
+
+        The counters are filled only when tracking with the config flag
+        `XTRACK_PROFILE_ELEMENTS` set (CPU contexts only), e.g.:
+
+            line.config.XTRACK_PROFILE_ELEMENTS = True
+            line.track(particles, num_turns=100)
+            prof = line.get_tracking_profile()
+
+        The counters are accumulated over successive tracking calls until they
+        are reset.
+
+        Parameters
+        ----------
+        by_element_type : bool, optional
+            If True, the counters are summed over the elements of the same
+            type and one row per element type is returned.
+        reset : bool, optional
+            If True, the counters are set to zero after being read.
+
+        Returns
+        -------
+        profile : Table
+            Table with, for each element (or element type), the number of
+            calls of the element tracking code (`calls`), the clock ticks spent
+            in it (`cycles`, CPU timestamp counter when available), the ticks
+            per call (`cycles_per_call`) and the fraction of the total
+            (`fraction`). In the per-element table, these columns are joined
+            to the ones of `Line.get_table()`.
+        """
+
+        self._check_valid_tracker()
+        if self.iscollective:
+            raise NotImplementedError(
+                'Tracking profile is not available for collective lines')
+
+        tt = self.get_table()
+        num_elements = len(self.element_names)
+        calls = np.zeros(len(tt), dtype=np.int64)
+        cycles = np.zeros(len(tt), dtype=np.int64)
+
+        profile = self.tracker._get_element_profile(create=False)
+        if profile is not None:
+            calls[:num_elements] = profile.calls.to_nparray()
+            cycles[:num_elements] = profile.cycles.to_nparray()
+            if reset:
+                self.tracker._reset_element_profile()
+
+        total_cycles = np.sum(cycles)
+
+        if by_element_type:
+            element_type = np.array(sorted(set(tt.element_type[:num_elements])))
+            data = {
+                'name': element_type,
+                'num_elements': np.array([
+                    np.sum(tt.element_type[:num_elements] == et)
+                    for et in element_type]),
+                'calls': np.array([np.sum(calls[tt.element_type == et])
+                                   for et in element_type], dtype=np.int64),
+                'cycles': np.array([np.sum(cycles[tt.element_type == et])
+                                    for et in element_type], dtype=np.int64),
+            }
+            calls = data['calls']
+            cycles = data['cycles']
+        else:
+            data = {kk: tt[kk] for kk in tt._col_names}
+            data['calls'] = calls
+            data['cycles'] = cycles
+
+        data['cycles_per_call'] = cycles / np.maximum(calls, 1)
+        data['fraction'] = cycles / (total_cycles if total_cycles > 0 else 1)
+
+        return xd.Table(data=data)
+
+    def check_float32_tracking(self, particles, num_turns=1, **kwargs):
+        """
+        Track the particles both in double and in single precision (see
+        `ParticlesFloat32`) and report the difference between the final
+        coordinates of the two runs.
+
+        Parameters
+        ----------
+        particles : Particles or ParticlesFloat32
+            Particles to be tracked. They are not modified.
+        num_turns : int, optional
+            Number of turns to be tracked. Default is 1.
+        **kwargs
+            Further arguments passed to `Line.track`.
+
+        Returns
+        -------
+        drift : Table
+            Table with, for each coordinate, the largest (`max_abs_diff`) and
+            rms (`rms_diff`) deviation of the single precision run from the
+            double precision one, together with the largest absolute value
+            of the coordinate in the double precision run (`max_abs_value`).
+            The deviations are computed on the particles surviving in both
+            runs. The number of particles whose state differs between the
+            two runs is given in `drift.num_state_mismatch`.
+        """
+
+        self._check_valid_tracker()
+
+        ctx2np = particles._context.nparray_from_context_array
+        dct = particles.to_dict()
+        p64 = xt.Particles.from_dict(dct, _context=particles._context)
+        p32 = xt.ParticlesFloat32.from_dict(dct, _context=particles._context)
+
+        self.track(p64, num_turns=num_turns, **kwargs)
+        self.track(p32, num_turns=num_turns, **kwargs)
+
+        coord_names = ['x', 'px', 'y', 'py', 'zeta', 'delta']
+        i64 = np.argsort(ctx2np(p64.particle_id))
+        i32 = np.argsort(ctx2np(p32.particle_id))
+        state64 = ctx2np(p64.state)[i64]
+        state32 = ctx2np(p32.state)[i32]
+        mask = (state64 > 0) & (state32 > 0)
+
+        max_abs_diff = []
+        rms_diff = []
+        max_abs_value = []
+        for nn in coord_names:
+            v64 = ctx2np(getattr(p64, nn))[i64][mask]
+            v32 = np.array(ctx2np(getattr(p32, nn))[i32][mask], dtype=np.float64)
+            diff = v32 - v64
+            if len(diff) == 0:
+                max_abs_diff.append(0.)
+                rms_diff.append(0.)
+                max_abs_value.append(0.)
+                continue
+            max_abs_diff.append(np.max(np.abs(diff)))
+            rms_diff.append(np.sqrt(np.mean(diff**2)))
+            max_abs_value.append(np.max(np.abs(v64)))
+
+        data = {
+            'name': np.array(coord_names),
+            'max_abs_diff': np.array(max_abs_diff),
+            'rms_diff': np.array(rms_diff),
+            'max_abs_value': np.array(max_abs_value),
+        }
+        col_names = list(data.keys())
+        data['num_turns'] = num_turns
+        data['num_state_mismatch'] = int(np.sum(
+                                        (state64 > 0) != (state32 > 0)))
+
+        return xd.Table(data=data, col_names=col_names)
+
+    def compile_time_dependent_vars(self, num_turns, start_turn=0):
+        """
+        Precompute the effect of the time-dependent variables on the elements
+        so that the tracking can run without returning to Python at each turn.
+
+        The variables depending on `t_turn_s` (e.g. piecewise-linear functions
+        of time) are evaluated at the start of each turn from `start_turn` to
+        `start_turn + num_turns`, honoring `dt_update_time_dependent_vars`,
+        and the resulting element settings (and reference momentum, if an
+        energy program is defined) are stored in per-turn tables. While the
+        tables exist and `enable_time_dependent_vars` is True, `Line.track`
+        applies them in the track kernel at the start of each turn instead of
+        looping over the turns in Python, e.g.:
+
+            line.enable_time_dependent_vars = True
+            line.compile_time_dependent_vars(num_turns=10000)
+            line.track(particles, num_turns=10000)
+
+        The tables need to be compiled again if variables not depending on
+        time are changed. Tracking with `log` falls back to the Python loop.
+        Only available on the serial CPU context.
+
+        Parameters
+        ----------
+        num_turns : int
+            Number of turns covered by the tables.
+        start_turn : int, optional
+            First turn covered by the tables. Default is 0.
+        """
+        self._check_valid_tracker()
+        self.tracker.compile_time_dependent_vars(num_turns=num_turns,
+                                                 start_turn=start_turn)
+
+    def discard_time_dependent_schedule(self):
+        """
+        Remove the tables built by `compile_time_dependent_vars`, the
+        time-dependent variables are then updated in Python at each turn.
+        """
+        self._check_valid_tracker()
+        self.tracker.discard_time_dependent_schedule()
+
     def copy(self, _context=None, _buffer=None):
         '''
         Return a copy of the line.
@@ -769,6 +962,7 @@ class Line:
             io_buffer=None,
             use_prebuilt_kernels=True,
             enable_pipeline_hold=False,
+            kernel_cache=None,
             **kwargs):
 
         """
@@ -796,6 +990,16 @@ class Line:
             If False, the kernels are always compiled.
         enable_pipeline_hold: bool, optional
             If True, the pipeline hold mechanism is enabled.
+        kernel_cache: str or xtrack.kernel_cache.KernelCache, optional
+            Directory (or KernelCache object) in which compiled kernels are
+            stored and looked up before compiling, so that they can be reused
+            by other processes. If not provided, the directory given by the
+            environment variable `XTRACK_KERNEL_CACHE_DIR` is used, if set.
+            Only supported on the serial CPU context.
+        precompile: list, optional
+            Additional configurations for which the track kernel is compiled
+            in parallel with the present one (see `Tracker.precompile`), e.g.
+            `[{'XTRACK_MULTIPOLE_NO_SYNRAD': False}, 'backtrack']`.
 
         """
 
@@ -811,6 +1015,7 @@ class Line:
                                 io_buffer=io_buffer,
                                 use_prebuilt_kernels=use_prebuilt_kernels,
                                 enable_pipeline_hold=enable_pipeline_hold,
+                                kernel_cache=kernel_cache,
                                 **kwargs)
 
         return self.tracker
@@ -892,6 +1097,8 @@ class Line:
             If True, a turn-by-turn monitor is created. If a monitor is provided,
             it is used directly. If the string `ONE_TURN_EBE` is provided, the
             particles coordinates are recorded at each element (one turn).
+            If an `xtrack.MemmapParticlesMonitor` is provided, the tracking
+            is performed in chunks of turns and the data is stored on disk.
             The recorded data can be retrieved in `line.record_last_track`.
         freeze_longitudinal: bool, optional
             If True, the longitudinal coordinates are frozen during tracking.
@@ -903,6 +1110,35 @@ class Line:
             is provided, it is used as the number of turns between two updates
             of the progress bar. If True, 100 is taken by default. By default,
             equals to False and no progress bar is displayed.
+        checkpoint_every: int, optional
+            If provided, the tracking is performed in chunks of
+            `checkpoint_every` turns and the state of the tracking session
+            (particles, including the random generator state, monitor and
+            turn counter) is saved to `checkpoint_path` after each chunk. The
+            session can be continued with `Line.resume_track`.
+        checkpoint_path: str or pathlib.Path, optional
+            File in which the checkpoint is saved (replaced atomically).
+        n_workers: int, optional
+            If larger than one, the particles are split by index into
+            `n_workers` shards, tracked in parallel in separate processes
+            (CPU contexts and non-collective lines only) and merged back,
+            with active and lost particles sorted by `particle_id`.
+        stop_when_all_lost: bool, optional
+            If True, the tracking is performed in chunks of turns (growing in
+            size) and stops as soon as no active particle is left.
+        max_time_s: float, optional
+            If provided, the tracking is performed in chunks of turns and
+            stops after the first chunk ending beyond this time (in seconds).
+            The chunk size is adapted so that the budget is not exceeded by
+            much more than the time needed to track one turn.
+
+        Returns
+        -------
+        status: xtrack.tracker.TrackingStatus or None
+            When `stop_when_all_lost` or `max_time_s` are used, a status
+            reporting the number of turns tracked (`num_turns_done`), whether
+            all turns were tracked (`completed`) and the reason of the stop
+            (`stop_reason`: 'completed', 'all_lost' or 'max_time').
         """
 
         self._check_valid_tracker()
@@ -918,6 +1154,39 @@ class Line:
             with_progress=with_progress,
             **kwargs)
 
+    def resume_track(self, checkpoint_path, with_progress=False, time=False,
+                     checkpoint_every=None):
+        """
+        Resume a tracking session from a checkpoint saved by `Line.track`
+        (see `checkpoint_every` and `checkpoint_path` in `Line.track`). The
+        line must be the same as the one used to save the checkpoint.
+
+        Parameters
+        ----------
+        checkpoint_path: str or pathlib.Path
+            File from which the checkpoint is loaded. It is updated during
+            the resumed tracking.
+        with_progress: bool or int, optional
+            If truthy, a progress bar is displayed during tracking.
+        time: bool, optional
+            If True, the time taken for tracking is recorded and can be
+            retrieved in `line.time_last_track`.
+        checkpoint_every: int, optional
+            Number of turns between checkpoints. Defaults to the value used
+            to save the checkpoint.
+
+        Returns
+        -------
+        particles: xtrack.Particles
+            The tracked particles, rebuilt from the checkpoint. The recorded
+            data can be retrieved in `line.record_last_track`.
+        """
+
+        self._check_valid_tracker()
+        return self.tracker.resume_track(
+            checkpoint_path, with_progress=with_progress, time=time,
+            checkpoint_every=checkpoint_every)
+
     def slice_thick_elements(self, slicing_strategies):
         """
         Slice thick elements in the line. Slicing is done in place.
@@ -1103,6 +1372,7 @@ class Line:
         delta_disp=None, delta_chrom=None, zeta_disp=None,
         co_guess=None, steps_r_matrix=None,
         co_search_settings=None, at_elements=None, at_s=None,
+        sparse_at_elements=None,
         continue_on_closed_orbit_error=None,
         freeze_longitudinal=None,
         freeze_energy=None,
@@ -1140,6 +1410,8 @@ class Line:
         _keep_initial_particles=None,
         _initial_particles=None,
         _ebe_monitor=None,
+        _multi_delta=None,
+        _incremental=None,
         ele_start='__discontinued__',
         ele_stop='__discontinued__',
         ele_init='__discontinued__',
@@ -1180,7 +1452,7 @@ class Line:
                   solver_options={}, allow_twiss_failure=True,
                   restore_if_fail=True, verbose=False,
                   n_steps_max=20, default_tol=None,
-                  solver=None, check_limits=True, **kwargs):
+                  solver=None, check_limits=True, n_workers=None, **kwargs):
         '''
         Change a set of knobs in the beamline in order to match assigned targets.
 
@@ -1223,6 +1495,12 @@ class Line:
             If True (default), the limits of the knobs are checked before the
             optimization. If False, if the knobs are out of limits, the optimization
             knobs are set to the limits on the first iteration.
+        n_workers : int
+            If larger than one, the columns of the Jacobian (one per knob) are
+            computed in parallel in `n_workers` separate processes, each
+            working on its own copy of the line. Only available for lines on a
+            serial `xo.ContextCpu` (an error is raised for GPU or OpenMP
+            contexts).
         **kwargs : dict
             Additional arguments to be passed to the twiss.
 
@@ -1294,7 +1572,8 @@ class Line:
                         restore_if_fail=restore_if_fail,
                         verbose=verbose, n_steps_max=n_steps_max,
                         default_tol=default_tol, solver=solver,
-                        check_limits=check_limits, **kwargs)
+                        check_limits=check_limits, n_workers=n_workers,
+                        **kwargs)
 
 
     def match_knob(self, knob_name, vary, targets,
@@ -1529,7 +1808,9 @@ class Line:
             particle is used.
         co_search_settings : dict
             Dictionary containing the settings for the closed orbit search
-            (passed as keyword arguments to the `scipy.fsolve` function)
+            (passed as keyword arguments to the `scipy.fsolve` function).
+            With `{'solver': 'quasi_newton'}` a Newton search with Broyden
+            updates of the one-turn Jacobian is used.
         delta_zeta : float
             Initial delta_zeta coordinate.
         delta0 : float
@@ -3322,9 +3603,7 @@ class Line:
 
     def _init_var_management(self, dct=None):
 
-        from collections import defaultdict
-
-        _var_values = defaultdict(lambda: 0)
+        _var_values = _VarValues(lambda: 0)
         _var_values.default_factory = None
 
         functions = Functions()
@@ -3510,6 +3789,36 @@ class Line:
         assert value in (True, False)
         self._extra_config['enable_time_dependent_vars'] = value
 
+    @property
+    def enable_linear_map_cache(self):
+        '''
+        If True, the linear maps of the individual elements are cached and
+        the one-turn matrix used by the twiss is updated recomputing only the
+        maps of the elements modified since the previous call (see
+        `xtrack.linear_map_cache.LinearMapCache`).
+        '''
+        return self._extra_config['enable_linear_map_cache']
+
+    @enable_linear_map_cache.setter
+    def enable_linear_map_cache(self, value):
+        assert value in (True, False)
+        self._extra_config['enable_linear_map_cache'] = value
+
+    @property
+    def enable_closed_orbit_cache(self):
+        '''
+        If True, the closed orbit found by the twiss is stored and used as
+        starting point of the closed orbit search of the following twiss
+        calls with the same method, `delta0` and `zeta0`, unless many
+        elements were modified in the meantime.
+        '''
+        return self._extra_config['enable_closed_orbit_cache']
+
+    @enable_closed_orbit_cache.setter
+    def enable_closed_orbit_cache(self, value):
+        assert value in (True, False)
+        self._extra_config['enable_closed_orbit_cache'] = value
+
     @property
     def dt_update_time_dependent_vars(self):
         return self._extra_config['dt_update_time_dependent_vars']
@@ -3938,6 +4247,62 @@ class Line:
 def frac(x):
     return x % 1
 
+class _VarValues(defaultdict):
+
+    """
+    Container of the values of the line variables. Along with the values, it
+    keeps a fingerprint of the numeric and string values (`values_hash`),
+    updated at each assignment, which is the same whenever the variables
+    have the same values. It is used to key results computed for a given
+    state of the variables without going through all of them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.values_hash = 0
+        for kk, vv in self.items():
+            self.values_hash ^= _var_value_hash(kk, vv)
+
+    def __setitem__(self, key, value):
+        if key in self:
+            self.values_hash ^= _var_value_hash(key, dict.__getitem__(self, key))
+        super().__setitem__(key, value)
+        self.values_hash ^= _var_value_hash(key, value)
+
+    def __delitem__(self, key):
+        self.values_hash ^= _var_value_hash(key, dict.__getitem__(self, key))
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        for kk, vv in dict(*args, **kwargs).items():
+            self[kk] = vv
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *args):
+        if key in self:
+            self.values_hash ^= _var_value_hash(
+                                        key, dict.__getitem__(self, key))
+        return super().pop(key, *args)
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.values_hash ^= _var_value_hash(key, value)
+        return key, value
+
+    def clear(self):
+        super().clear()
+        self.values_hash = 0
+
+def _var_value_hash(key, value):
+    # Only numbers and strings are part of the state of the variables
+    if isinstance(value, (numbers.Number, str)):
+        return hash((key, value))
+    return 0
+
 class Functions:
 
     _mathfunctions = dict(
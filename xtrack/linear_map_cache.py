@@ -0,0 +1,355 @@
+# copyright ############################### #
+# This file is part of the Xtrack Package.  #
+# Copyright (c) CERN, 2024.                 #
+# ######################################### #
+
+import copy
+
+import numpy as np
+
+import xtrack as xt
+
+from .twiss import (AT_TURN_FOR_TWISS, _build_r_matrix_probes,
+                    _probe_coords_from_monitor, _r_matrix_from_probes,
+                    _r_matrix_probe_shifts)
+
+# Above this fraction of modified elements the maps are rebuilt from a single
+# tracking through the full line
+MAX_FRACTION_UPDATED_ELEMENTS = 0.1
+
+# Orbit changes smaller than this fraction of the finite-difference steps do
+# not trigger a recomputation of the maps
+ORBIT_TOL_FRACTION = 1e-3
+
+# Number of incremental updates of the cumulative maps after which they are
+# recomputed from the element maps
+MAX_CORRECTIONS = 100
+
+_ORBIT_COORDS = ('x', 'px', 'y', 'py', 'zeta', 'delta')
+_STEP_NAMES = ('dx', 'dpx', 'dy', 'dpy', 'dzeta', 'ddelta')
+
+
+class ElementBufferSnapshot:
+
+    """
+    Copy of the data of the elements of a line in the tracker buffer, used to
+    find the elements modified since the copy was taken (through `line.attr`,
+    `MultiSetter`, the xdeps variables or by setting the element attributes
+    directly). The data of the parents of the slices is included in that of
+    the slices. Only available on CPU.
+
+    Parameters
+    ----------
+    line: Line
+        Line with a built tracker.
+    """
+
+    def __init__(self, line):
+
+        self.line = line
+
+        # Location in the buffer of the data of each element
+        tracker_data = line.tracker._tracker_data_base
+        objects = {}
+        for ii, nn in enumerate(tracker_data.element_names):
+            ee = tracker_data._element_dict[nn]
+            xobjs = [ee._xobject]
+            if getattr(ee, '_parent', None) is not None:
+                xobjs.append(ee._parent._xobject)
+            for xx in xobjs:
+                if xx._offset not in objects:
+                    objects[xx._offset] = (xx._size, [])
+                objects[xx._offset][1].append(ii)
+
+        self._obj_start = np.array(sorted(objects.keys()), dtype=np.int64)
+        self._obj_end = self._obj_start + np.array(
+            [objects[oo][0] for oo in self._obj_start], dtype=np.int64)
+        self._obj_elements = [np.array(objects[oo][1], dtype=np.int64)
+                              for oo in self._obj_start]
+        self._range = (int(self._obj_start[0]), int(self._obj_end.max()))
+
+        self.update()
+
+    def _buffer_view(self):
+        return self.line._buffer.buffer[self._range[0]:self._range[1]]
+
+    def update(self):
+        """
+        Take a new copy of the data of the elements.
+        """
+        self._data = self._buffer_view().copy()
+
+    def copy(self):
+        """
+        Return a new snapshot of the present data of the elements, sharing the
+        location of the elements in the buffer with this one.
+        """
+        out = copy.copy(self)
+        out.update()
+        return out
+
+    def modified_elements(self):
+        """
+        Return the sorted indices of the elements modified since the last
+        update.
+        """
+        changed = np.nonzero(self._buffer_view() != self._data)[0]
+        changed += self._range[0]
+        if len(changed) == 0:
+            return np.array([], dtype=np.int64)
+        i_obj = np.searchsorted(self._obj_start, changed, side='right') - 1
+        i_obj = np.unique(i_obj[changed < self._obj_end[i_obj]])
+        if len(i_obj) == 0:
+            return np.array([], dtype=np.int64)
+        return np.unique(np.concatenate(
+                                [self._obj_elements[ii] for ii in i_obj]))
+
+
+class LinearMapCache:
+
+    """
+    Cache of the linear maps (6x6 transfer matrices around the closed orbit)
+    of the individual elements of a line, from which the one-turn matrix and
+    the element-by-element matrices are obtained as cumulative products.
+
+    At each call, the elements whose data has been modified since their map
+    was computed are identified by comparing the tracker buffer with a
+    snapshot, which covers changes made through `line.attr`, `MultiSetter`,
+    the xdeps variables or by setting the element attributes directly. The
+    maps of these elements, and of the elements crossed with a different
+    orbit, are recomputed by tracking the finite-difference probes through
+    the element alone and the cumulative products are updated from the first
+    modified element.
+
+    The cache is enabled with `line.enable_linear_map_cache = True` and is
+    used by `Line.compute_one_turn_matrix_finite_differences` (and therefore
+    by `Line.twiss`) for the full one-turn matrix on CPU.
+
+    Parameters
+    ----------
+    line: Line
+        Line for which the maps are cached.
+    steps_r_matrix: dict
+        Steps used for the finite differences.
+    """
+
+    def __init__(self, line, steps_r_matrix):
+
+        self.line = line
+        self.steps_r_matrix = steps_r_matrix
+        self.orbit_tol = np.array(
+            [ORBIT_TOL_FRACTION * steps_r_matrix[nn] for nn in _STEP_NAMES])
+
+        self.element_maps = None
+        self.cumulative_maps = None
+        self.end_turn_map = None
+        self._orbit = None
+        self._reference = None
+        self._snapshot = ElementBufferSnapshot(line)
+
+        self.num_full_builds = 0
+        self.num_element_updates = 0
+        self.num_reused = 0
+        self._num_corrections = 0
+
+    @property
+    def num_elements(self):
+        return len(self.line.tracker._tracker_data_base.element_names)
+
+    def compute_one_turn_matrix(self, particle_on_co, element_by_element=False):
+        """
+        Return the one-turn matrix around `particle_on_co` (and the
+        element-by-element matrices if `element_by_element` is True), in the
+        format of `Line.compute_one_turn_matrix_finite_differences`.
+        """
+
+        reference = (float(particle_on_co._xobject.p0c[0]),
+                     float(particle_on_co.mass0), float(particle_on_co.q0))
+        if self.element_maps is None or reference != self._reference:
+            self._full_build(particle_on_co)
+            self._reference = reference
+        else:
+            self._update(particle_on_co)
+
+        out = {'R_matrix': self.end_turn_map @ self.cumulative_maps[-1]}
+        if element_by_element:
+            out['R_matrix_ebe'] = self.cumulative_maps.copy()
+        else:
+            out['R_matrix_ebe'] = None
+
+        return out
+
+    def _full_build(self, particle_on_co):
+
+        line = self.line
+
+        part, dpzeta = _build_r_matrix_probes(
+            particle_on_co, self.steps_r_matrix, include_orbit=True)
+        part.at_turn = AT_TURN_FOR_TWISS
+        line.track(part, turn_by_turn_monitor='ONE_TURN_EBE')
+        mon = line.record_last_track
+
+        self._orbit = _orbit_from_monitor(mon)
+
+        cumulative_maps = _r_matrix_from_probes(
+            _probe_coords_from_monitor(mon)[:, :, 1:],
+            self.steps_r_matrix, dpzeta)
+        RR = _r_matrix_from_probes(self._probe_coords(part)[:, 1:],
+                                   self.steps_r_matrix, dpzeta)
+
+        # R_k = P_{k+1} P_k^-1, P_k being the cumulative map at element k
+        self.element_maps = _right_divide(cumulative_maps[1:],
+                                          cumulative_maps[:-1])
+        self.end_turn_map = _right_divide(RR, cumulative_maps[-1])
+        self.cumulative_maps = cumulative_maps
+        self._num_corrections = 0
+
+        # Reused to compute the maps of single elements
+        self._probes = part
+        self._probe_shifts = _r_matrix_probe_shifts(self.steps_r_matrix,
+                                                    include_orbit=True)
+
+        self._snapshot.update()
+        self.num_full_builds += 1
+
+    def _update(self, particle_on_co):
+
+        i_modified = self._snapshot.modified_elements()
+        max_updated = MAX_FRACTION_UPDATED_ELEMENTS * self.num_elements
+
+        orbit_start = np.array([float(getattr(particle_on_co._xobject, nn)[0])
+                                for nn in _ORBIT_COORDS])
+        if np.all(np.abs(orbit_start - self._orbit_coords()[0])
+                  <= self.orbit_tol):
+            if len(i_modified) == 0:
+                self.num_reused += 1
+                return
+
+            # If the orbit at the exit of the modified elements is unchanged,
+            # the orbit in the rest of the line is also unchanged
+            if len(i_modified) <= max_updated:
+                orbit_coords = self._orbit_coords()
+                new_maps = {}
+                for ii in i_modified:
+                    RR, orbit_exit = self._compute_element_map(ii)
+                    if np.any(np.abs(orbit_exit - orbit_coords[ii + 1])
+                              > self.orbit_tol):
+                        break
+                    new_maps[ii] = RR
+                else:
+                    self._set_element_maps(new_maps)
+                    self._snapshot.update()
+                    return
+
+        # The stored orbit is the one at which each map was computed
+        orbit = self._track_orbit(particle_on_co)
+        orbit_coords = np.array([orbit[nn] for nn in _ORBIT_COORDS]).T
+        orbit_changed = np.any(np.abs(orbit_coords - self._orbit_coords())
+                               > self.orbit_tol, axis=1)
+        to_update = orbit_changed[:-1]
+        to_update[i_modified] = True
+
+        i_update = np.nonzero(to_update)[0]
+        if len(i_update) > max_updated:
+            self._full_build(particle_on_co)
+            return
+
+        for nn in self._orbit.keys():
+            self._orbit[nn][i_update] = orbit[nn][i_update]
+
+        self._set_element_maps(
+            {ii: self._compute_element_map(ii)[0] for ii in i_update})
+        self._snapshot.update()
+
+    def _set_element_maps(self, new_maps):
+
+        PP = self.cumulative_maps
+        for ii in sorted(new_maps.keys()):
+            # P_k, k > ii, are updated as P_k C with P_{ii+1} C = R_ii P_ii
+            CC = np.linalg.solve(PP[ii + 1], new_maps[ii] @ PP[ii])
+            PP[ii + 1:] = (PP[ii + 1:].reshape(-1, 6) @ CC).reshape(-1, 6, 6)
+            self.element_maps[ii] = new_maps[ii]
+
+        self.num_element_updates += len(new_maps)
+        self._num_corrections += len(new_maps)
+
+        # Limit the accumulation of rounding errors
+        if self._num_corrections > MAX_CORRECTIONS:
+            PP[1:] = _cumulative_products(self.element_maps) @ PP[0]
+            self._num_corrections = 0
+
+    def _orbit_coords(self):
+        return np.array([self._orbit[nn] for nn in _ORBIT_COORDS]).T
+
+    def _probe_coords(self, part):
+        ctx2np = self.line._buffer.context.nparray_from_context_array
+        return np.array([ctx2np(part.x), ctx2np(part.px),
+                         ctx2np(part.y), ctx2np(part.py),
+                         ctx2np(part.zeta),
+                         ctx2np(part.ptau/part.beta0)])
+
+    def _track_orbit(self, particle_on_co):
+        part = particle_on_co.copy()
+        part.at_turn = AT_TURN_FOR_TWISS
+        self.line.track(part, turn_by_turn_monitor='ONE_TURN_EBE')
+        return _orbit_from_monitor(self.line.record_last_track)
+
+    def _compute_element_map(self, ii):
+
+        # Probes around the orbit at the entrance of the element
+        part = self._probes
+        shifts = self._probe_shifts
+        with part._bypass_linked_vars():
+            for nn, vv in self._orbit.items():
+                if nn != 'particle_id':
+                    getattr(part, nn)[:] = vv[ii]
+            for jj, nn in enumerate(_ORBIT_COORDS[:5]):
+                getattr(part, nn)[:] += shifts[jj]
+        part.update_delta(self._orbit['delta'][ii] + shifts[5])
+        dpzeta = float((part.ptau[6] - part.ptau[12]) / 2 / part.beta0[1])
+
+        self.line.track(part, ele_start=ii, num_elements=1)
+
+        coords = self._probe_coords(part)
+        RR = _r_matrix_from_probes(coords[:, 1:], self.steps_r_matrix, dpzeta)
+
+        return RR, coords[:, 0]
+
+
+def get_linear_map_cache(line, steps_r_matrix):
+    """
+    Return the `LinearMapCache` of the line for the present tracker
+    configuration and finite-difference steps (created if needed).
+    """
+    caches = line.tracker._tracker_data_base.cache
+    if caches.get('linear_maps') is None:
+        caches['linear_maps'] = {}
+    key = (line.tracker._hashable_config(),
+           tuple(sorted(steps_r_matrix.items())))
+    if key not in caches['linear_maps']:
+        caches['linear_maps'][key] = LinearMapCache(line, steps_r_matrix)
+    return caches['linear_maps'][key]
+
+
+def _orbit_from_monitor(mon):
+    # Coordinates of the first particle recorded by an element-by-element
+    # monitor
+    return {nn: np.array(getattr(mon, nn)[0, :])
+            for _, nn in xt.Particles.per_particle_vars}
+
+
+def _right_divide(aa, bb):
+    # aa @ inv(bb) for stacks of matrices
+    return np.swapaxes(np.linalg.solve(np.swapaxes(bb, -1, -2),
+                                       np.swapaxes(aa, -1, -2)), -1, -2)
+
+
+def _cumulative_products(mats):
+    # out[k] = mats[k] @ mats[k-1] @ ... @ mats[0], computed with log2(n)
+    # vectorized steps (Hillis-Steele scan)
+    out = mats.copy()
+    shift = 1
+    while shift < len(out):
+        out[shift:] = out[shift:] @ out[:-shift]
+        shift *= 2
+    return out
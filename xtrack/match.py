@@ -1,11 +1,15 @@
+from collections import OrderedDict
 from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+import multiprocessing
 
 import numpy as np
 from scipy.optimize import fsolve, minimize
 
 from .twiss import TwissInit, VARS_FOR_TWISS_INIT_GENERATION, _complete_twiss_init
 from .general import _print, START, END, _LOC
+import xobjects as xo
 import xtrack as xt
 import xdeps as xd
 
@@ -43,19 +47,111 @@ ALLOWED_TARGET_KWARGS= ['x', 'px', 'y', 'py', 'zeta', 'delta', 'pzata', 'ptau',
                         'eq_gemitt_x', 'eq_gemitt_y', 'eq_gemitt_zeta',
                         'eq_nemitt_x', 'eq_nemitt_y', 'eq_nemitt_zeta']
 
+DEFAULT_ACTION_CACHE_SIZE = 4
+
 Action = xd.Action
 
+class _ActionCache:
+
+    """
+    Bounded LRU cache of the results of an action. Each result can be stored
+    with snapshots of the element buffers of the lines (see
+    `xtrack.linear_map_cache.ElementBufferSnapshot`), in which case it is
+    discarded if any element was modified since it was stored.
+    """
+
+    def __init__(self, size=DEFAULT_ACTION_CACHE_SIZE):
+        self.size = size
+        self._results = OrderedDict()
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get(self, key):
+        if key in self._results:
+            result, snapshots = self._results[key]
+            if all(len(ss.modified_elements()) == 0 for ss in snapshots):
+                self._results.move_to_end(key)
+                self.num_hits += 1
+                return result
+            del self._results[key]
+        self.num_misses += 1
+        return None
+
+    def store(self, key, result, snapshots=()):
+        if self.size < 1:
+            return
+        self._results[key] = (result, snapshots)
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        self._results.clear()
+
+    def __getstate__(self):
+        # The stored results are not pickled
+        state = self.__dict__.copy()
+        state['_results'] = OrderedDict()
+        return state
+
+
 class ActionTwiss(xd.Action):
 
     def __init__(self, line, allow_twiss_failure=False,
                  compensate_radiation_energy_loss=False,
+                 cache_size=DEFAULT_ACTION_CACHE_SIZE,
                  **kwargs):
         self.line = line
         self.kwargs = kwargs
         self.allow_twiss_failure = allow_twiss_failure
         self.compensate_radiation_energy_loss = compensate_radiation_energy_loss
 
+        # Results cached by knob values, when the knobs are known (set by
+        # match_line)
+        self.vary = None
+        self.cache = _ActionCache(size=cache_size)
+        self._snapshots = None
+
+    def _lines(self):
+        if isinstance(self.line, xt.Multiline):
+            return [self.line[nn] for nn in self.line.line_names]
+        return [self.line]
+
+    def _cache_key(self):
+        # Only on CPU, where the element buffers can be compared with the
+        # snapshots taken when the results were stored
+        if self.vary is None:
+            return None
+        lines = self._lines()
+        if not all(isinstance(ll.tracker._context, xo.ContextCpu)
+                   for ll in lines):
+            return None
+        config = tuple(ll.tracker._hashable_config() for ll in lines)
+        vref = self.line._xdeps_vref
+        # Fingerprint of the values of all the variables, kept up to date by
+        # the container (see `xtrack.line._VarValues`)
+        var_values_hash = None if vref is None else vref._owner.values_hash
+        return (tuple(vv.get_value() for vv in self.vary), var_values_hash,
+                config)
+
+    def _take_snapshots(self):
+        from .linear_map_cache import ElementBufferSnapshot
+        if self._snapshots is None:
+            # The location of the elements in the buffers is found once
+            self._snapshots = tuple(ElementBufferSnapshot(ll)
+                                    for ll in self._lines())
+            return self._snapshots
+        return tuple(ss.copy() for ss in self._snapshots)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_snapshots'] = None
+        return state
+
     def prepare(self):
+        self.cache.clear()
+        self._snapshots = None
+
         line = self.line
         kwargs = self.kwargs
 
@@ -186,6 +282,11 @@ class ActionTwiss(xd.Action):
             kwargs['init'] = twinit_list[0]
             kwargs['_keep_initial_particles'] = _keep_ini_particles_list[0]
 
+        # With given initial conditions, the twiss is re-tracked only from
+        # the first element modified by the knobs
+        if all(_keep_ini_particles_list):
+            kwargs['_incremental'] = True
+
         tw0 = line.twiss(**kwargs)
 
         if ismultiline:
@@ -198,6 +299,12 @@ class ActionTwiss(xd.Action):
         self.kwargs = kwargs
 
     def run(self, allow_failure=True):
+        key = self._cache_key()
+        if key is not None:
+            out = self.cache.get(key)
+            if out is not None:
+                return out
+
         if self.compensate_radiation_energy_loss:
             if isinstance(self.line, xt.Multiline):
                 raise NotImplementedError(
@@ -215,6 +322,10 @@ class ActionTwiss(xd.Action):
                 else:
                     raise ee
         out.line = self.line
+
+        if key is not None:
+            self.cache.store(key, out, snapshots=self._take_snapshots())
+
         return out
 
 # Alternative transitions functions
@@ -787,12 +898,50 @@ class TargetRmatrix(TargetSet):
                                                       tol=thistol, **kwargs))
 
 
+class Optimize(xd.Optimize):
+
+    """
+    xdeps.Optimize also logging the number of cache hits and misses of the
+    actions (cumulated over all actions) in the columns `cache_hits` and
+    `cache_misses` of the log.
+    """
+
+    def add_point_to_log(self, tag=''):
+        super().add_point_to_log(tag=tag)
+        self._add_action_cache_counters_to_log()
+
+    def step(self, n_steps=1, **kwargs):
+        for _ in range(n_steps):
+            super().step(n_steps=1, **kwargs)
+            self._add_action_cache_counters_to_log()
+            if self._err.last_point_within_tol:
+                break
+        return self
+
+    def log(self):
+        out = super().log()
+        for kk in ['cache_hits', 'cache_misses']:
+            out._data[kk] = np.array(self._log[kk])
+            out._col_names.append(kk)
+        return out
+
+    def _add_action_cache_counters_to_log(self):
+        num_hits = 0
+        num_misses = 0
+        for aa in self.actions:
+            cache = getattr(aa, 'cache', None)
+            if cache is not None:
+                num_hits += cache.num_hits
+                num_misses += cache.num_misses
+        self._log.setdefault('cache_hits', []).append(num_hits)
+        self._log.setdefault('cache_misses', []).append(num_misses)
+
 def match_line(line, vary, targets, solve=True, assert_within_tol=True,
                   compensate_radiation_energy_loss=False,
                   solver_options={}, allow_twiss_failure=True,
                   restore_if_fail=True, verbose=False,
                   n_steps_max=20, default_tol=None,
-                  solver=None, check_limits=True, **kwargs):
+                  solver=None, check_limits=True, n_workers=None, **kwargs):
 
     if not isinstance(targets, (list, tuple)):
         targets = [targets]
@@ -869,18 +1018,113 @@ def match_line(line, vary, targets, solve=True, assert_within_tol=True,
     vary_flatten = _flatten_vary(vary)
     _complete_vary_with_info_from_line(vary_flatten, line)
 
-    opt = xd.Optimize(vary=vary_flatten, targets=targets_flatten, solver=solver,
+    for tt in targets_flatten:
+        if isinstance(tt.action, ActionTwiss):
+            tt.action.vary = vary_flatten
+
+    opt = Optimize(vary=vary_flatten, targets=targets_flatten, solver=solver,
                         verbose=verbose, assert_within_tol=assert_within_tol,
                         solver_options=solver_options,
                         n_steps_max=n_steps_max,
                         restore_if_fail=restore_if_fail,
                         check_limits=check_limits)
 
+    if n_workers is not None and n_workers > 1:
+        _check_lines_for_parallel_jacobian(line, targets_flatten)
+        opt._err.get_jacobian = partial(_get_jacobian_parallel, opt._err,
+                                        n_workers=n_workers)
+
     if solve:
         opt.solve()
 
     return opt
 
+_merit_function_for_parallel_jacobian = None
+
+def _check_lines_for_parallel_jacobian(line, targets):
+
+    lines = [line]
+    for tt in targets:
+        if isinstance(tt.action, ActionTwiss):
+            lines.append(tt.action.line)
+
+    for ll in lines:
+        if isinstance(ll, xt.Multiline):
+            sublines = [ll[nn] for nn in ll.line_names]
+        else:
+            sublines = [ll]
+        for sl in sublines:
+            context = sl.tracker._context
+            if (not isinstance(context, xo.ContextCpu)
+                    or context.omp_num_threads != 0):
+                raise NotImplementedError(
+                    'Matching with `n_workers` is only available for lines '
+                    'on a serial CPU context (no GPU, no OpenMP)')
+
+def _get_jacobian_parallel(merit_function, x, f0=None, n_workers=None):
+
+    '''Same as MeritFunctionForMatch.get_jacobian, with the columns computed
+    in separate processes, each having its own copy of the lines'''
+
+    x = np.array(x).copy()
+    steps = merit_function._knobs_to_x(merit_function.steps_for_jacobian)
+    assert len(x) == len(steps)
+    if f0 is None:
+        f0 = merit_function(x)
+    if np.isscalar(f0):
+        jac = np.zeros((1, len(x)))
+    else:
+        jac = np.zeros((len(f0), len(x)))
+
+    i_columns = np.where(merit_function.mask_input)[0]
+    x_columns = []
+    for ii in i_columns:
+        x_ii = x.copy()
+        x_ii[ii] += steps[ii]
+        x_columns.append(x_ii)
+
+    if len(x_columns) > 0:
+        # The pool is created at each call so that the workers see the
+        # present state of the lines, knobs and targets
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # The workers inherit the lines and the compiled kernels
+            mp_context = multiprocessing.get_context('fork')
+            initargs = (None,)
+        else:
+            # The lines are pickled (kernels are recompiled in the workers)
+            mp_context = multiprocessing.get_context('spawn')
+            initargs = (merit_function,)
+
+        global _merit_function_for_parallel_jacobian
+        _merit_function_for_parallel_jacobian = merit_function
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=min(n_workers, len(x_columns)),
+                    mp_context=mp_context,
+                    initializer=_init_parallel_jacobian_worker,
+                    initargs=initargs) as executor:
+                f_columns = list(executor.map(_eval_merit_function_worker,
+                                              x_columns))
+        finally:
+            _merit_function_for_parallel_jacobian = None
+
+        for ii, ff in zip(i_columns, f_columns):
+            jac[:, ii] = (ff - f0) / steps[ii]
+        merit_function.call_counter += len(x_columns)
+
+    merit_function._last_jac = jac
+    return jac
+
+def _init_parallel_jacobian_worker(merit_function):
+    global _merit_function_for_parallel_jacobian
+    if merit_function is not None:
+        # Not forked, the merit function was unpickled
+        _merit_function_for_parallel_jacobian = merit_function
+    _merit_function_for_parallel_jacobian.show_call_counter = False
+
+def _eval_merit_function_worker(x):
+    return _merit_function_for_parallel_jacobian(x, check_limits=False)
+
 def _flatten_vary(vary):
     vary_flatten = []
     for vv in vary:
@@ -1044,7 +1288,7 @@ def opt_from_callable(function, x0, steps, tar, tols):
     x = x0.copy()
     vary = [xt.Vary(ii, container=x, step=steps[ii]) for ii in range(len(x))]
 
-    opt = xd.Optimize(
+    opt = Optimize(
         vary=vary,
         targets=ActionCall(function, vary).get_targets(tar),
         show_call_counter=False,
@@ -1056,13 +1300,22 @@ def opt_from_callable(function, x0, steps, tar, tols):
     return opt
 
 class ActionCall(Action):
-    def __init__(self, function, vary):
+    def __init__(self, function, vary, cache_size=DEFAULT_ACTION_CACHE_SIZE):
         self.vary = vary
         self.function = function
+        self.cache = _ActionCache(size=cache_size)
+
+    def prepare(self):
+        self.cache.clear()
 
     def run(self):
         x = [vv.container[vv.name] for vv in self.vary]
-        return self.function(x)
+        key = tuple(x)
+        out = self.cache.get(key)
+        if out is None:
+            out = self.function(x)
+            self.cache.store(key, out)
+        return out
 
     def get_targets(self, ftar):
         tars = []
@@ -5,5 +5,6 @@ from .beam_position_monitor import *
 from .beam_size_monitor import *
 from .beam_profile_monitor import *
 from .bunch_monitor import *
+from .memmap_particles_monitor import MemmapParticlesMonitor
 
 monitor_classes = tuple(v for v in globals().values() if isinstance(v, type) and issubclass(v, BeamElement))
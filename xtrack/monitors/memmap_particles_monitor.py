@@ -0,0 +1,223 @@
+# copyright ############################### #
+# This file is part of the Xtrack Package.  #
+# Copyright (c) CERN, 2024.                 #
+# ######################################### #
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+import xtrack as xt
+
+from .particles_monitor import ParticlesMonitor
+
+_METADATA_FILE = 'monitor.json'
+
+
+class MemmapParticlesMonitor:
+
+    '''
+    Turn-by-turn monitor storing the particles coordinates in memory-mapped
+    files on disk.
+
+    The monitor is passed to `Line.track` as `turn_by_turn_monitor`. Tracking
+    is then performed in chunks of `chunk_turns` turns: each chunk is recorded
+    by a regular `ParticlesMonitor` allocated once in the context buffer, and
+    is flushed to disk at the end of the chunk. The memory needed is therefore
+    independent of the number of recorded turns.
+
+    The data is stored in `path` as one `.npy` file per recorded variable and
+    can be accessed as for the `ParticlesMonitor`, e.g. `mon.x[i_part, i_turn]`
+    (the arrays are `numpy.memmap` objects).
+
+    Parameters
+    ----------
+    path: str or pathlib.Path
+        Directory in which the data is stored (created if needed).
+    start_at_turn: int
+        Turn at which the monitor starts logging the particles coordinates.
+    stop_at_turn: int
+        Turn at which the monitor stops logging the particles coordinates.
+    num_particles: int
+        Number of particles to be logged.
+    particle_id_range: tuple of int
+        Range of particle ids to be logged.
+    chunk_turns: int
+        Number of turns tracked and recorded in memory before flushing to disk.
+    variables: list of str
+        Variables to be stored. By default all per-particle variables are
+        stored.
+    mode: str
+        'w+' (default) to create a new monitor, 'r' or 'r+' to open an
+        existing one from `path`.
+    '''
+
+    def __init__(
+        self,
+        path,
+        start_at_turn=None,
+        stop_at_turn=None,
+        num_particles=None,
+        particle_id_range=None,
+        chunk_turns=1000,
+        variables=None,
+        mode='w+',
+    ):
+
+        self.path = Path(path)
+
+        if mode in ('r', 'r+'):
+            with open(self.path / _METADATA_FILE, 'r') as fid:
+                meta = json.load(fid)
+            self.start_at_turn = meta['start_at_turn']
+            self.stop_at_turn = meta['stop_at_turn']
+            self.part_id_start = meta['part_id_start']
+            self.part_id_end = meta['part_id_end']
+            self.variables = meta['variables']
+            self.chunk_turns = meta['chunk_turns']
+            self._arrays = {
+                nn: np.lib.format.open_memmap(self.path / f'{nn}.npy', mode=mode)
+                for nn in self.variables}
+            self._chunk_monitor = None
+            self._chunk_window = None
+            return
+
+        if mode != 'w+':
+            raise ValueError(f'Invalid mode `{mode}`')
+
+        if particle_id_range is not None:
+            assert num_particles is None
+            part_id_start = int(particle_id_range[0])
+            part_id_end = int(particle_id_range[1])
+        else:
+            assert num_particles is not None
+            part_id_start = 0
+            part_id_end = int(num_particles)
+
+        assert part_id_end >= part_id_start
+        assert int(stop_at_turn) > int(start_at_turn)
+        assert chunk_turns > 0
+
+        all_vars = [nn for _, nn in xt.Particles.per_particle_vars]
+        if variables is None:
+            variables = all_vars
+        for nn in variables:
+            if nn not in all_vars:
+                raise ValueError(f'`{nn}` is not a per-particle variable')
+
+        self.start_at_turn = int(start_at_turn)
+        self.stop_at_turn = int(stop_at_turn)
+        self.part_id_start = part_id_start
+        self.part_id_end = part_id_end
+        self.chunk_turns = int(chunk_turns)
+        self.variables = list(variables)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        shape = (self.part_id_end - self.part_id_start,
+                 self.stop_at_turn - self.start_at_turn)
+        dtypes = {nn: tt._dtype for tt, nn in xt.Particles.per_particle_vars}
+        self._arrays = {
+            nn: np.lib.format.open_memmap(self.path / f'{nn}.npy', mode='w+',
+                                          dtype=dtypes[nn], shape=shape)
+            for nn in self.variables}
+
+        with open(self.path / _METADATA_FILE, 'w') as fid:
+            json.dump({
+                'start_at_turn': self.start_at_turn,
+                'stop_at_turn': self.stop_at_turn,
+                'part_id_start': self.part_id_start,
+                'part_id_end': self.part_id_end,
+                'chunk_turns': self.chunk_turns,
+                'variables': self.variables,
+            }, fid, indent=1)
+
+        self._chunk_monitor = None
+        self._chunk_window = None
+
+    def __getattr__(self, name):
+        arrays = self.__dict__.get('_arrays') or {}
+        if name in arrays:
+            return arrays[name]
+        raise AttributeError(f'`{name}` is not recorded by this monitor')
+
+    def __getstate__(self):
+        # The data stays on disk, only the metadata is pickled
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        state['_chunk_monitor'] = None
+        state['_chunk_window'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._arrays = {
+            nn: np.lib.format.open_memmap(self.path / f'{nn}.npy', mode='r+')
+            for nn in self.variables}
+
+    @property
+    def ebe_mode(self):
+        return 0
+
+    def _get_chunk_monitor(self, particles, num_turns):
+        """
+        Prepare the in-buffer monitor recording the next `num_turns` turns
+        of `particles`. Returns `None` if these turns are not to be recorded.
+        """
+        if self._chunk_monitor is None:
+            self._chunk_monitor = ParticlesMonitor(
+                _context=particles._buffer.context,
+                start_at_turn=0,
+                stop_at_turn=self.chunk_turns + 1,
+                particle_id_range=(self.part_id_start, self.part_id_end))
+
+        # The extra turn covers the record at the start of a partial turn
+        turn_start = max(_first_active_turn(particles), self.start_at_turn)
+        turn_stop = min(turn_start + num_turns + 1, self.stop_at_turn)
+        if turn_stop <= turn_start:
+            self._chunk_window = None
+            return None
+        assert turn_stop - turn_start <= self.chunk_turns + 1
+
+        mon = self._chunk_monitor
+        with mon.data._bypass_linked_vars():
+            for nn in self.variables:
+                getattr(mon.data, nn)[:] = 0
+        mon.start_at_turn = turn_start
+        mon.stop_at_turn = turn_stop
+        self._chunk_window = (turn_start, turn_stop)
+
+        return mon
+
+    def _flush_chunk(self):
+        if self._chunk_window is None:
+            return
+        turn_start, turn_stop = self._chunk_window
+        n_turns = turn_stop - turn_start
+        n_part = self.part_id_end - self.part_id_start
+        mon = self._chunk_monitor
+        ctx2np = mon._buffer.context.nparray_from_context_array
+        i_start = turn_start - self.start_at_turn
+        for nn in self.variables:
+            vv = ctx2np(getattr(mon.data, nn))[:n_part * n_turns]
+            self._arrays[nn][:, i_start:i_start + n_turns] = vv.reshape(
+                                                            n_part, n_turns)
+        self.flush()
+        self._chunk_window = None
+
+    def flush(self):
+        """
+        Write the recorded data to disk.
+        """
+        for vv in self._arrays.values():
+            vv.flush()
+
+
+def _first_active_turn(particles):
+    ctx2np = particles._buffer.context.nparray_from_context_array
+    state = ctx2np(particles.state)
+    at_turn = ctx2np(particles.at_turn)
+    mask_active = state > 0
+    if not np.any(mask_active):
+        return int(np.max(at_turn))
+    return int(np.min(at_turn[mask_active]))
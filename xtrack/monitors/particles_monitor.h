@@ -6,6 +6,30 @@
 #ifndef XTRACK_MONITORS_H
 #define XTRACK_MONITORS_H
 
+/*gpufun*/
+int64_t ParticlesMonitor_sparse_ebe_index(ParticlesMonitorData el,
+                                          int64_t const at_element){
+
+    // Position of at_element in the (sorted) list of recorded elements,
+    // -1 if the element is not recorded
+    int64_t i_low = 0;
+    int64_t i_high = ParticlesMonitorData_len_ebe_at_elements(el) - 1;
+    while (i_low <= i_high){
+        int64_t const i_mid = (i_low + i_high) / 2;
+        int64_t const ee = ParticlesMonitorData_get_ebe_at_elements(el, i_mid);
+        if (ee == at_element){
+            return i_mid;
+        }
+        if (ee < at_element){
+            i_low = i_mid + 1;
+        }
+        else{
+            i_high = i_mid - 1;
+        }
+    }
+    return -1;
+}
+
 /*gpufun*/
 void ParticlesMonitor_track_local_particle(ParticlesMonitorData el,
                        LocalParticle* part0){
@@ -23,7 +47,12 @@ void ParticlesMonitor_track_local_particle(ParticlesMonitorData el,
 
     //start_per_particle_block (part0->part)
     int64_t at_turn;
-    if (ebe_mode){
+    if (ebe_mode == 2){
+        // Sparse element-by-element mode
+        at_turn = ParticlesMonitor_sparse_ebe_index(el,
+                                    LocalParticle_get_at_element(part));
+    }
+    else if (ebe_mode){
         at_turn = LocalParticle_get_at_element(part);
     }
     else{
@@ -40,7 +69,7 @@ void ParticlesMonitor_track_local_particle(ParticlesMonitorData el,
                 int64_t const store_at =
                     n_turns_record * (particle_id - part_id_start)
                     + at_turn - start_at_turn;
-                LocalParticle_to_Particles(part, data, store_at, 0);
+                LocalParticle_to_ParticlesData(part, data, store_at, 0);
             }
         }
     }
@@ -60,7 +89,7 @@ void ParticlesMonitor_track_local_particle(ParticlesMonitorData el,
                     n_turns_record * (part_id_end  - part_id_start) * i_frame
                     + n_turns_record * (particle_id - part_id_start)
                     + (at_turn - i_frame * repetition_period) - start_at_turn;
-                LocalParticle_to_Particles(part, data, store_at, 0);
+                LocalParticle_to_ParticlesData(part, data, store_at, 0);
             }
         }
     }
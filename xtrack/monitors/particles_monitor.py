@@ -3,6 +3,8 @@
 # Copyright (c) CERN, 2021.                 #
 # ######################################### #
 
+import numpy as np
+
 import xobjects as xo
 import xtrack as xt
 
@@ -22,6 +24,7 @@ def _monitor_init(
     num_particles=None,
     particle_id_range=None,
     auto_to_numpy=True,
+    at_elements=None,
 ):
 
     '''
@@ -44,6 +47,12 @@ def _monitor_init(
     auto_to_numpy: bool
         If True, the data is automatically converted to numpy arrays when
         accessed.
+    at_elements: list of int
+        If provided, the monitor is used as element-by-element monitor
+        (passed as `turn_by_turn_monitor` to `Line.track`) recording only
+        at the entrance of the elements with the given indices (in
+        increasing order). In this case `start_at_turn`, `stop_at_turn`,
+        `n_repetitions` and `repetition_period` must not be provided.
 
     '''
 
@@ -62,6 +71,17 @@ def _monitor_init(
         n_part_ids = part_id_end - part_id_start
         assert n_part_ids >= 0
 
+        if at_elements is not None:
+            assert start_at_turn is None and stop_at_turn is None
+            assert n_repetitions is None and repetition_period is None
+            at_elements = np.unique(np.array(at_elements, dtype=np.int64))
+            start_at_turn = 0
+            stop_at_turn = len(at_elements)
+            ebe_mode = 2
+        else:
+            at_elements = []
+            ebe_mode = 0
+
         n_turns = int(stop_at_turn) - int(start_at_turn)
 
         if repetition_period is not None:
@@ -90,7 +110,9 @@ def _monitor_init(
             n_records=n_records,
             n_repetitions=n_repetitions,
             repetition_period=repetition_period,
+            ebe_mode=ebe_mode,
             data=data_init,
+            ebe_at_elements=at_elements,
         )
 
         self._dressed_data = self._ParticlesClass(_xobject=self._xobject.data,
@@ -102,6 +124,8 @@ def _monitor_init(
                 getattr(self.data, nn)[:] = 0
 
 def monitor_from_dict(cls, dct, **kwargs):
+    if 'ebe_at_elements' not in dct: # Saved before the sparse ebe mode
+        dct = {**dct, 'ebe_at_elements': []}
     xobj = cls._XoStruct(**dct, **kwargs)
     return cls(_xobject=xobj)
 
@@ -154,6 +178,7 @@ class ParticlesMonitor(BeamElement):
         "repetition_period": xo.Int64,
         "flag_auto_to_numpy": xo.Int64,
         "data": xt.Particles,
+        'ebe_at_elements': xo.Int64[:],
     }
 
     _extra_c_sources = [
@@ -1,6 +1,4 @@
-from collections import defaultdict
-
-from ..line import Functions
+from ..line import Functions, _VarValues
 import xdeps
 
 class VarSharing:
@@ -9,7 +7,7 @@ class VarSharing:
 
 
         mgr = xdeps.Manager()
-        newvref = mgr.ref(defaultdict(lambda: 0), "vars")
+        newvref = mgr.ref(_VarValues(lambda: 0), "vars")
         newvref._owner.default_factory = None
 
         functions = Functions()
@@ -4,7 +4,8 @@
 # ######################################### #
 
 from .constants import PROTON_MASS_EV, ELECTRON_MASS_EV, MUON_MASS_EV, Pb208_MASS_EV
-from .particles import Particles, reference_from_pdg_id, LAST_INVALID_STATE
+from .particles import (Particles, ParticlesFloat32, reference_from_pdg_id,
+                        LAST_INVALID_STATE)
 
 
 def enable_pyheadtail_interface():
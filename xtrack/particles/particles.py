@@ -99,6 +99,8 @@ class Particles(xo.HybridClass):
         'beta0': '_beta0',
     }
 
+    _rng_init_kernel_name = 'Particles_initialize_rand_gen'
+
     _kernels = {
         'Particles_initialize_rand_gen': xo.Kernel(
             c_name="Particles_initialize_rand_gen",
@@ -109,10 +111,16 @@ class Particles(xo.HybridClass):
             n_threads='n_init')
     }
 
+    def __new__(cls, *args, dtype=None, **kwargs):
+        if dtype is not None and np.dtype(dtype) == np.float32:
+            cls = ParticlesFloat32
+        return super().__new__(cls)
+
     def __init__(
             self,
             _capacity=None,
             _no_reorganize=False,
+            dtype=None,
             **kwargs,
     ):
 
@@ -197,7 +205,14 @@ class Particles(xo.HybridClass):
             Identifier of the parent particle (secondary production processes)
         t_sim : float, optional
             Simulation frame time (typically one revolution period)
+        dtype : numpy dtype, optional
+            Floating point type of the particles coordinates, `np.float64`
+            (default) or `np.float32`. In the latter case, a `ParticlesFloat32`
+            object is created.
         """
+        if dtype is not None and np.dtype(dtype) not in (np.float32, np.float64):
+            raise ValueError(f'Unsupported dtype `{dtype}`')
+
         if '_xobject' in kwargs.keys():
             # Initialize xobject
             self.xoinitialize(**kwargs)
@@ -1036,7 +1051,7 @@ class Particles(xo.HybridClass):
                 seeds = np.array(seeds, dtype=np.uint32)
 
         seeds_dev = context.nparray_to_context_array(seeds)
-        kernel = context.kernels['Particles_initialize_rand_gen']
+        kernel = context.kernels[self._rng_init_kernel_name]
         kernel(particles=self, seeds=seeds_dev, n_init=self._capacity)
 
     def hide_first_n_particles(self, num_particles):
@@ -1362,6 +1377,17 @@ class Particles(xo.HybridClass):
         if mode != 'no_local_copy':
             raise NotImplementedError
 
+        # The source only depends on the class, so it is generated only once
+        # (this is called at each tracking call)
+        if cls not in _local_particle_api_cache:
+            _local_particle_api_cache[cls] = cls._gen_local_particle_api()
+        return _local_particle_api_cache[cls]
+
+    @classmethod
+    def _gen_local_particle_api(cls):
+
+        cname = cls._XoStruct.__name__
+
         src_lines = []
         src_lines.append('typedef struct {')
 
@@ -1390,17 +1416,17 @@ class Particles(xo.HybridClass):
         # Particles_to_LocalParticle
         src_lines.append('''
             /*gpufun*/
-            void Particles_to_LocalParticle(ParticlesData source,
+            void Particles_to_LocalParticle(''' + cname + ''' source,
                                             LocalParticle* dest,
                                             int64_t id,
                                             int64_t eid){''')
         for _, vv in cls.size_vars + cls.scalar_vars:
             src_lines.append(
-                f'  dest->{vv} = ParticlesData_get_' + vv + '(source);')
+                f'  dest->{vv} = {cname}_get_' + vv + '(source);')
 
         for _, vv in cls.per_particle_vars:
             src_lines.append(
-                f'  dest->{vv} = ParticlesData_getp1_' + vv + '(source, 0);')
+                f'  dest->{vv} = {cname}_getp1_' + vv + '(source, 0);')
 
         src_lines.append('  dest->ipart = id;')
         src_lines.append('  dest->endpart = eid;')
@@ -1408,26 +1434,34 @@ class Particles(xo.HybridClass):
         src_particles_to_local = '\n'.join(src_lines)
 
         # LocalParticle_to_Particles
+        # (LocalParticle_to_ParticlesData is used by the monitors, which always
+        # store the coordinates in double precision)
         src_lines = []
-        src_lines.append('''
+        for fname, dest_cname in [('LocalParticle_to_Particles', cname),
+                                  ('LocalParticle_to_ParticlesData', 'ParticlesData')]:
+            if fname == 'LocalParticle_to_ParticlesData' and cname == 'ParticlesData':
+                src_lines.append('#define LocalParticle_to_ParticlesData '
+                                 'LocalParticle_to_Particles')
+                continue
+            src_lines.append(f'''
             /*gpufun*/
-            void LocalParticle_to_Particles(
+            void {fname}(
                                             LocalParticle* source,
-                                            ParticlesData dest,
+                                            {dest_cname} dest,
                                             int64_t id,
-                                            int64_t set_scalar){''')
-        src_lines.append('if (set_scalar){')
-        for _, vv in cls.size_vars + cls.scalar_vars:
-            src_lines.append(
-                f'  ParticlesData_set_' + vv + '(dest,'
-                                               f'      LocalParticle_get_{vv}(source));')
-        src_lines.append('}')
+                                            int64_t set_scalar){{''')
+            src_lines.append('if (set_scalar){')
+            for _, vv in cls.size_vars + cls.scalar_vars:
+                src_lines.append(
+                    f'  {dest_cname}_set_' + vv + '(dest,'
+                                                   f'      LocalParticle_get_{vv}(source));')
+            src_lines.append('}')
 
-        for _, vv in cls.per_particle_vars:
-            src_lines.append(
-                f'  ParticlesData_set_' + vv + '(dest, id, '
-                                               f'      LocalParticle_get_{vv}(source));')
-        src_lines.append('}')
+            for _, vv in cls.per_particle_vars:
+                src_lines.append(
+                    f'  {dest_cname}_set_' + vv + '(dest, id, '
+                                                   f'      LocalParticle_get_{vv}(source));')
+            src_lines.append('}')
         src_local_to_particles = '\n'.join(src_lines)
 
         # Adders
@@ -1879,6 +1913,20 @@ class Particles(xo.HybridClass):
                         LocalParticle_set_state(part, kill_state);
                     }
                 """
+
+        # The API can be included by more than one particles class in the
+        # same build (e.g. single precision particles and double precision
+        # monitors), so it is self-contained and defined only once
+        struct_apis = []
+        if cname != 'ParticlesData':
+            struct_apis = [Particles._XoStruct._gen_c_api().source,
+                           cls._XoStruct._gen_c_api().source]
+        source = ('#ifndef XTRACK_LOCAL_PARTICLE_API\n'
+                  '#define XTRACK_LOCAL_PARTICLE_API\n'
+                  + ''.join(ss + '\n' for ss in struct_apis)
+                  + source
+                  + '\n#endif // XTRACK_LOCAL_PARTICLE_API\n')
+
         return source
 
     @classmethod
@@ -2164,6 +2212,66 @@ class Particles(xo.HybridClass):
         self._update_zeta(mask=mask, zeta=self.zeta * self.beta0 / old_beta0)
 
 
+_local_particle_api_cache = {}
+
+_SINGLE_PRECISION_VARS = ('x', 'px', 'y', 'py', 'delta', 'ptau', 'rpp', 'rvv')
+
+_particles_float32_rng_src = (
+    Path(__file__).parent.joinpath('rng_src', 'particles_rng.h').read_text()
+    .replace('XTRACK_PARTICLES_RNG_H', 'XTRACK_PARTICLES_FLOAT32_RNG_H')
+    .replace('Particles_initialize_rand_gen', 'ParticlesFloat32_initialize_rand_gen')
+    .replace('ParticlesData', 'ParticlesFloat32Data'))
+
+
+class ParticlesFloat32(Particles):
+    """
+    Particles object storing the transverse coordinates and the energy
+    deviations (`x`, `px`, `y`, `py`, `delta`, `ptau`, `rpp`, `rvv`) in single
+    precision, halving the memory traffic when tracking large numbers of
+    particles. The reference quantities and the longitudinal accumulators
+    (`p0c`, `s`, `zeta`, ...) stay in double precision, and so do the
+    computations in the beam elements.
+
+    It is normally created with `Particles(..., dtype=np.float32)`. The track
+    kernel is compiled with the flag `XTRACK_PARTICLES_FLOAT32` when tracking
+    such particles.
+    """
+
+    _cname = 'ParticlesFloat32Data'
+
+    part_energy_vars = tuple(
+        (xo.Float32, nn) for _, nn in Particles.part_energy_vars)
+
+    per_particle_vars = tuple(
+        (xo.Float32 if nn in _SINGLE_PRECISION_VARS else tt, nn)
+        for tt, nn in Particles.per_particle_vars)
+
+    _xofields = {
+        **{nn: tt for tt, nn in Particles.size_vars + Particles.scalar_vars},
+        **{nn: tt[:] for tt, nn in per_particle_vars},
+    }
+
+    _extra_c_sources = [
+        Path(__file__).parent.joinpath('rng_src', 'base_rng.h'),
+        _particles_float32_rng_src,
+        '\n /*placeholder_for_local_particle_src*/ \n'
+    ]
+
+    _rename = Particles._rename
+
+    _rng_init_kernel_name = 'ParticlesFloat32_initialize_rand_gen'
+
+    _kernels = {
+        'ParticlesFloat32_initialize_rand_gen': xo.Kernel(
+            c_name="ParticlesFloat32_initialize_rand_gen",
+            args=[
+                xo.Arg(xo.ThisClass, name='particles'),
+                xo.Arg(xo.UInt32, pointer=True, name='seeds'),
+                xo.Arg(xo.Int32, name='n_init')],
+            n_threads='n_init')
+    }
+
+
 def _mask_to_where(mask, ctx):
     if hasattr(mask, 'get'):
         mask = mask.get()
@@ -1,3 +1,5 @@
 from .core import PipelineStatus, PipelineID
 from .multitracker import PipelineMultiTracker, PipelineBranch
-from .manager import PipelineManager
\ No newline at end of file
+from .manager import PipelineManager
+from .shared_memory import (SharedMemoryCommunicator,
+                            track_branches_in_processes)
@@ -1,4 +1,4 @@
-from xtrack.pipeline.core import PipelineID, PipelineCommunicator
+from xtrack.pipeline.core import PipelineID, PipelineCommunicator, PipelineStatus
 from xtrack.general import _print
 
 class PipelineManager:
@@ -85,3 +85,14 @@ class PipelineManager:
         if self.verbose:
             _print(f'Pipeline manager {element_name}: {reciever_name} at rank {self.get_particles_rank(reciever_name)} recieving from {sender_name} at rank {self.get_particles_rank(sender_name)} with tag {tag}')
         self._communicator.Recv(recieve_buffer,source=self.get_particles_rank(sender_name),tag=tag)
+
+    #
+    # Status to be returned by an element waiting for a message. The multitracker
+    # resumes the tracking only once the message has arrived
+    #
+    def hold_until_recieved(self,element_name,sender_name,reciever_name,internal_tag=0,info=None):
+        tag = self.get_message_tag(element_name=element_name,sender_name=sender_name,reciever_name=reciever_name,internal_tag=internal_tag)
+        return PipelineStatus(on_hold=True, info=info,
+                              data={'communicator': self._communicator,
+                                    'source': self.get_particles_rank(sender_name),
+                                    'tag': tag})
@@ -1,3 +1,5 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import xtrack as xt
 _print = xt.general._print
 
@@ -24,38 +26,153 @@ class PipelineBranch:
 
 class PipelineMultiTracker:
 
-    def __init__(self, branches, enable_debug_log=False):
+    """
+    Track several `PipelineBranch` objects, resuming each branch put on hold
+    by a pipelined element.
+
+    A branch held by an element that returned the status built by
+    `PipelineManager.hold_until_recieved` is resumed only when the awaited
+    message has arrived (checked with `Iprobe` on the communicator). Other
+    held branches are always resumed. If none of the held branches is ready,
+    all of them are resumed.
+
+    Parameters
+    ----------
+    branches: list of PipelineBranch
+        Branches to be tracked.
+    enable_debug_log: bool
+        If True, each resume is logged in `debug_log`.
+    backend: str, optional
+        Execution backend. By default (None) the branches are advanced one
+        after the other. With 'threads' the branches that are ready are
+        resumed concurrently in a thread pool (branches sharing the same line
+        are never advanced at the same time). With 'processes' each branch is
+        tracked in its own process with `track_branches_in_processes`, which
+        requires a `SharedMemoryCommunicator`.
+    num_workers: int, optional
+        Number of threads used by the 'threads' backend.
+    communicator: SharedMemoryCommunicator, optional
+        Communicator used by the 'processes' backend.
+    """
+
+    def __init__(self, branches, enable_debug_log=False, backend=None,
+                 num_workers=None, communicator=None):
+        if backend not in (None, 'threads', 'processes'):
+            raise ValueError(f'Invalid backend `{backend}`')
+        if backend == 'processes':
+            if communicator is None:
+                raise ValueError('The processes backend requires a '
+                                 '`SharedMemoryCommunicator`')
+            if enable_debug_log:
+                raise NotImplementedError('The debug log is not available '
+                                          'with the processes backend')
+
         self.branches = branches
         self.enable_debug_log = enable_debug_log
+        self.backend = backend
+        self.num_workers = num_workers
+        self.communicator = communicator
 
         if self.enable_debug_log:
             self.debug_log = []
 
     def track(self, **kwargs):
 
+        if self.backend == 'processes':
+            from .shared_memory import track_branches_in_processes
+            track_branches_in_processes(self.branches,
+                                        communicator=self.communicator,
+                                        **kwargs)
+            return
+
+        if self.backend == 'threads':
+            with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+                self._track_with_executor(executor, **kwargs)
+            return
+
         for branch in self.branches:
             branch.pipeline_status = branch.line.track(
                  branch.particles, **kwargs)
 
-        need_resume = True
-        while need_resume:
-            need_resume = False
-            for i_branch, branch in enumerate(self.branches):
-                if (branch.pipeline_status is not None
-                        and branch.pipeline_status.on_hold):
-                    if self.enable_debug_log:
-                        self.debug_log.append({
-                            'branch': i_branch,
-                            'track_session_turn':
-                                            branch.pipeline_status.data['tt'],
-                            'held_by_element': branch.line.tracker._part_names[
-                                            branch.pipeline_status.data['ipp']],
-                            'info': branch.pipeline_status.data['status_from_element'].info
-                        })
+        while True:
+            held = [ii for ii, bb in enumerate(self.branches) if _is_held(bb)]
+            if len(held) == 0:
+                break
+            any_ready = any(_is_ready_to_resume(self.branches[ii].pipeline_status)
+                            for ii in held)
+            for i_branch in held:
+                # Readiness is checked again as the branches resumed before
+                # in this pass might have sent the awaited message
+                if any_ready and not _is_ready_to_resume(
+                                    self.branches[i_branch].pipeline_status):
+                    continue
+                self._resume(i_branch)
+
+    def _track_with_executor(self, executor, **kwargs):
+
+        def _track(branch):
+            branch.pipeline_status = branch.line.track(
+                 branch.particles, **kwargs)
+
+        self._run_concurrently(executor, _track, self.branches)
+
+        while True:
+            held = [ii for ii, bb in enumerate(self.branches) if _is_held(bb)]
+            if len(held) == 0:
+                break
+            ready = [ii for ii in held
+                     if _is_ready_to_resume(self.branches[ii].pipeline_status)]
+            if len(ready) == 0:
+                ready = held
+            self._run_concurrently(executor, self._resume, ready)
+
+    def _run_concurrently(self, executor, function, items):
+        # Branches sharing a tracker are run in separate batches
+        pending = list(items)
+        while pending:
+            batch = []
+            trackers_in_batch = set()
+            for item in list(pending):
+                branch = (self.branches[item] if isinstance(item, int)
+                          else item)
+                if id(branch.line.tracker) in trackers_in_batch:
+                    continue
+                trackers_in_batch.add(id(branch.line.tracker))
+                batch.append(item)
+                pending.remove(item)
+            for future in [executor.submit(function, item) for item in batch]:
+                future.result()
+
+    def _resume(self, i_branch):
+        branch = self.branches[i_branch]
+        if self.enable_debug_log:
+            self.debug_log.append({
+                'branch': i_branch,
+                'track_session_turn':
+                                branch.pipeline_status.data['tt'],
+                'held_by_element': branch.line.tracker._part_names[
+                                branch.pipeline_status.data['ipp']],
+                'info': branch.pipeline_status.data['status_from_element'].info
+            })
+
+        branch.pipeline_status = branch.line.tracker.resume(
+                                            branch.pipeline_status)
 
-                    branch.pipeline_status = branch.line.tracker.resume(
-                                                        branch.pipeline_status)
-                    need_resume = True
 
+def _is_held(branch):
+    return (branch.pipeline_status is not None
+            and branch.pipeline_status.on_hold)
 
 
+def _is_ready_to_resume(status):
+    """
+    Check whether the message awaited by the element that put the tracking on
+    hold has arrived. Returns True if the element did not specify what it is
+    waiting for.
+    """
+    status_from_element = status.data['status_from_element']
+    waiting_for = getattr(status_from_element, 'data', None)
+    if not isinstance(waiting_for, dict) or 'communicator' not in waiting_for:
+        return True
+    return waiting_for['communicator'].Iprobe(source=waiting_for['source'],
+                                              tag=waiting_for['tag'])
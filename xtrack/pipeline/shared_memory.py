@@ -0,0 +1,251 @@
+import multiprocessing
+import queue
+import time
+import traceback
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .multitracker import _is_ready_to_resume
+
+_POLL_INTERVAL = 1e-5
+
+
+class SharedMemoryRequest:
+    def __init__(self, communicator, channel, end_position):
+        self._communicator = communicator
+        self._channel = channel
+        self._end_position = end_position
+
+    def Test(self):
+        # The message has been taken out of the ring buffer by the receiver
+        read_count = self._communicator._counters[self._channel, 1]
+        return read_count >= self._end_position
+
+
+class SharedMemoryCommunicator:
+    """
+    Communicator for the pipeline subsystem exchanging messages between
+    processes on the same node through ring buffers in shared memory. It
+    provides the subset of the mpi4py API used by `PipelineManager`
+    (`Issend`, `Recv`, `Iprobe`, `Get_rank`, `Get_size`).
+
+    There is one ring buffer for each pair of (source, destination) ranks.
+    The communicator is created once, before the processes are started, and
+    each process sets its own `rank` (see `track_branches_in_processes`).
+
+    Parameters
+    ----------
+    num_ranks: int
+        Number of ranks (processes) communicating.
+    capacity: int
+        Size in bytes of each ring buffer. Messages larger than this cannot
+        be sent.
+    rank: int, optional
+        Rank of the process using the communicator.
+    name: str, optional
+        Name of an existing shared memory block to attach to.
+    """
+
+    def __init__(self, num_ranks, capacity=1_048_576, rank=None, name=None):
+        self.num_ranks = int(num_ranks)
+        self.capacity = int(capacity) // 8 * 8
+        self.rank = rank
+
+        num_channels = self.num_ranks * self.num_ranks
+        size = num_channels * (16 + self.capacity)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+
+        # Bytes written and read in each channel (monotonically increasing)
+        self._counters = np.ndarray((num_channels, 2), dtype=np.int64,
+                                    buffer=self._shm.buf)
+        self._data = np.ndarray((num_channels, self.capacity), dtype=np.uint8,
+                                buffer=self._shm.buf, offset=num_channels * 16)
+        if self._owner:
+            self._counters[:] = 0
+
+        # Messages already taken out of the ring buffers, by (source, tag)
+        self._received = {}
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def __getstate__(self):
+        return {'num_ranks': self.num_ranks, 'capacity': self.capacity,
+                'rank': self.rank, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def Get_rank(self):
+        return self.rank
+
+    def Get_size(self):
+        return self.num_ranks
+
+    def _channel(self, source, dest):
+        return source * self.num_ranks + dest
+
+    def _write(self, channel, position, data):
+        start = position % self.capacity
+        n_first = min(len(data), self.capacity - start)
+        self._data[channel, start:start + n_first] = data[:n_first]
+        self._data[channel, :len(data) - n_first] = data[n_first:]
+
+    def _read(self, channel, position, size):
+        start = position % self.capacity
+        n_first = min(size, self.capacity - start)
+        return np.concatenate([self._data[channel, start:start + n_first],
+                               self._data[channel, :size - n_first]])
+
+    def Issend(self, send_buffer, dest, tag):
+        payload = np.ascontiguousarray(send_buffer).view(np.uint8).ravel()
+        header = np.array([tag, len(payload)], dtype=np.int64).view(np.uint8)
+        padding = np.zeros(-len(payload) % 8, dtype=np.uint8)
+        message = np.concatenate([header, payload, padding])
+        if len(message) > self.capacity:
+            raise ValueError(f'Message of {len(payload)} bytes does not fit '
+                             'in the shared memory ring buffer')
+
+        channel = self._channel(self.rank, dest)
+        position = self._counters[channel, 0]
+        while position + len(message) - self._counters[channel, 1] > self.capacity:
+            time.sleep(_POLL_INTERVAL) # Wait for the receiver to free space
+        self._write(channel, position, message)
+        # Published only after the data is written
+        self._counters[channel, 0] = position + len(message)
+
+        return SharedMemoryRequest(self, channel, position + len(message))
+
+    def _drain(self, source):
+        channel = self._channel(source, self.rank)
+        position = self._counters[channel, 1]
+        end = self._counters[channel, 0]
+        while position < end:
+            tag, size = self._read(channel, position, 16).view(np.int64)
+            payload = self._read(channel, position + 16, int(size))
+            key = (source, int(tag))
+            if key not in self._received:
+                self._received[key] = deque()
+            self._received[key].append(payload)
+            position += 16 + int(size) + (-int(size) % 8)
+        self._counters[channel, 1] = position
+
+    def Iprobe(self, source, tag):
+        self._drain(source)
+        return bool(self._received.get((source, tag)))
+
+    def Recv(self, recieve_buffer, source, tag):
+        while not self.Iprobe(source=source, tag=tag):
+            time.sleep(_POLL_INTERVAL)
+        message = self._received[(source, tag)].popleft()
+        recieve_buffer[:] = message.view(recieve_buffer.dtype).reshape(
+                                                    recieve_buffer.shape)
+
+    def close(self):
+        """
+        Detach from the shared memory (the block is released by the process
+        that created it).
+        """
+        self._counters = None
+        self._data = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def track_branches_in_processes(branches, communicator, ranks=None,
+                                timeout=None, **kwargs):
+    """
+    Track each `PipelineBranch` in its own process, the branches exchanging
+    messages through a `SharedMemoryCommunicator`. Each process tracks its
+    branch with `line.track(particles, **kwargs)` and resumes the tracking
+    each time it is put on hold until it is complete. The tracked particles
+    are copied back into the `particles` of each branch.
+
+    The processes are forked, so that they inherit the lines with their
+    compiled kernels and the pipeline manager. The state of the elements
+    (e.g. the pipeline manager) in the parent process is not updated.
+
+    Parameters
+    ----------
+    branches: list of PipelineBranch
+        Branches to be tracked.
+    communicator: SharedMemoryCommunicator
+        Communicator used by the pipeline manager of the elements.
+    ranks: list of int, optional
+        Rank of each branch. Default is the index of the branch.
+    timeout: float, optional
+        Maximum time in seconds to wait for the processes.
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        raise NotImplementedError('Tracking branches in separate processes '
+                                  'requires the fork start method')
+    if ranks is None:
+        ranks = list(range(len(branches)))
+    assert len(ranks) == len(branches)
+    assert len(set(ranks)) == len(ranks)
+
+    mp_context = multiprocessing.get_context('fork')
+    results = mp_context.Queue()
+    processes = [mp_context.Process(
+                    target=_track_branch_worker,
+                    args=(branch, communicator, rank, kwargs, results, ii))
+                 for ii, (branch, rank) in enumerate(zip(branches, ranks))]
+    for pp in processes:
+        pp.start()
+
+    tracked = {}
+    t_start = time.perf_counter()
+    try:
+        while len(tracked) < len(branches):
+            try:
+                ii, particles, error = results.get(timeout=0.1)
+            except queue.Empty:
+                if any(pp.exitcode not in (None, 0) for pp in processes):
+                    raise RuntimeError('A branch process exited unexpectedly')
+                if (timeout is not None
+                        and time.perf_counter() - t_start > timeout):
+                    raise TimeoutError('Tracking of the branches timed out')
+                continue
+            if error is not None:
+                raise RuntimeError(f'Tracking of branch {ii} failed:\n{error}')
+            tracked[ii] = particles
+    finally:
+        for pp in processes:
+            if len(tracked) < len(branches):
+                pp.terminate()
+            pp.join()
+
+    for ii, branch in enumerate(branches):
+        particles = branch.particles
+        with particles._bypass_linked_vars():
+            for _, nn in particles.per_particle_vars:
+                getattr(particles, nn)[:] = getattr(tracked[ii], nn)
+        branch.pipeline_status = None
+
+
+def _track_branch_worker(branch, communicator, rank, kwargs, results, index):
+    try:
+        communicator.rank = rank
+        status = branch.line.track(branch.particles, **kwargs)
+        while status is not None and status.on_hold:
+            while not _is_ready_to_resume(status):
+                time.sleep(_POLL_INTERVAL) # Let the other processes advance
+            status = branch.line.tracker.resume(status)
+        results.put((index, branch.particles, None))
+    except Exception:
+        results.put((index, None, traceback.format_exc()))
@@ -5,6 +5,12 @@
 from time import perf_counter
 from typing import Literal, Union
 import logging
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
 from collections import UserDict, defaultdict
 
@@ -17,11 +23,14 @@ import xtrack as xt
 from .base_element import _handle_per_particle_blocks
 from .beam_elements import Drift
 from .general import _pkg_root
-from .internal_record import new_io_buffer
+from .internal_record import (new_io_buffer, ElementProfile, IOBufferHeader,
+                              TimeDependentSchedule)
+from .kernel_cache import KernelCache, get_kernel_cache
 from .line import Line, _is_thick, _is_collective
 from .line import freeze_longitudinal as _freeze_longitudinal
 from .pipeline import PipelineStatus
 from .progress_indicator import progress
+from .particles.particles import LAST_INVALID_STATE
 from .tracker_data import TrackerData
 
 logger = logging.getLogger(__name__)
@@ -51,6 +60,8 @@ class Tracker:
         particles_monitor_class=None,
         extra_headers=(),
         local_particle_src=None,
+        kernel_cache=None,
+        precompile=None,
         _prebuilding_kernels=False,
     ):
 
@@ -81,6 +92,7 @@ class Tracker:
         self.local_particle_src = local_particle_src
         self._enable_pipeline_hold = enable_pipeline_hold
         self.use_prebuilt_kernels = use_prebuilt_kernels
+        self.kernel_cache = get_kernel_cache(kernel_cache)
 
         # Some data for collective mode prepared also for non-collective lines
         # to allow collective actions by the tracker (e.g. time-functions on knobs)
@@ -147,6 +159,9 @@ class Tracker:
         self.line.tracker = self
 
         if compile:
+            if precompile:
+                # Compile the present config together with the requested ones
+                self.precompile([{}] + list(precompile))
             _ = self.get_track_kernel_and_data_for_present_config()  # This triggers compilation
 
     def _init_io_buffer(self, io_buffer=None):
@@ -160,6 +175,175 @@ class Tracker:
             else:
                 io_buffer = io_bufs[0]
         self.io_buffer = io_buffer
+        self._element_profile = None
+        self._time_dependent_schedule = None
+        self._time_dependent_schedule_t_update = None
+        self._collective_track_plans = {}
+
+    def _get_element_profile(self, create=True):
+        """
+        Return the per-element counters filled by the track kernel when
+        `XTRACK_PROFILE_ELEMENTS` is set, allocating them in the io_buffer if
+        needed.
+        """
+        if self._element_profile is None and create:
+            if not isinstance(self._context, xo.ContextCpu):
+                raise NotImplementedError(
+                    'XTRACK_PROFILE_ELEMENTS is only supported on CPU')
+            num_elements = len(self._tracker_data_base.element_names)
+            profile = ElementProfile(calls=num_elements, cycles=num_elements,
+                                     _buffer=self.io_buffer)
+            header = IOBufferHeader._from_buffer(self.io_buffer, 0)
+            header.element_profile_offset = profile._offset
+            self._element_profile = profile
+        return self._element_profile
+
+    def _reset_element_profile(self):
+        profile = self._get_element_profile(create=False)
+        if profile is not None:
+            profile.calls.to_nplike()[:] = 0
+            profile.cycles.to_nplike()[:] = 0
+
+    def compile_time_dependent_vars(self, num_turns, start_turn=0):
+        """
+        Evaluate the time-dependent variables of the line for the turns from
+        `start_turn` to `start_turn + num_turns` and store the resulting
+        element settings in per-turn tables applied by the track kernel. See
+        `Line.compile_time_dependent_vars`.
+        """
+        line = self.line
+
+        if not line.enable_time_dependent_vars:
+            raise ValueError('Time-dependent variables are not enabled in '
+                             'the line')
+        if self.iscollective:
+            raise NotImplementedError('Compiled time-dependent variables are '
+                                      'not available for collective lines')
+        if (not isinstance(self._context, xo.ContextCpu)
+                or getattr(self._context, 'openmp_enabled', False)):
+            raise NotImplementedError('Compiled time-dependent variables are '
+                                      'only supported on the serial CPU context')
+        assert num_turns > 0
+
+        self.discard_time_dependent_schedule()
+
+        # Time at the start of each turn (as in `_track_with_collective`)
+        turns = np.arange(start_turn, start_turn + num_turns)
+        if line.energy_program is not None:
+            t_turns = np.atleast_1d(
+                line.energy_program.get_t_s_at_turn(turns)).astype(np.float64)
+        else:
+            beta0 = line.particle_ref._xobject.beta0[0]
+            t_turns = (turns * self._tracker_data_base.line_length
+                       / (beta0 * clight))
+
+        dt_update = line.dt_update_time_dependent_vars
+        if not dt_update:
+            t_update = t_turns
+            turn_to_update = np.arange(num_turns, dtype=np.int64)
+        else:
+            turn_to_update = np.zeros(num_turns, dtype=np.int64)
+            t_update = [t_turns[0]]
+            for ii, tt in enumerate(t_turns):
+                if tt > t_update[-1] + dt_update:
+                    t_update.append(tt)
+                turn_to_update[ii] = len(t_update) - 1
+            t_update = np.array(t_update)
+
+        # Words of the tracked elements depending on t_turn_s
+        element_names = set(self._tracker_data_base.element_names)
+        dep_names = set()
+        for rr in line._xdeps_manager.find_deps([line.vars['t_turn_s']]):
+            if (getattr(rr, '_owner', None) is line.element_refs
+                    and rr._key in element_names):
+                dep_names.add(rr._key)
+        word_index = []
+        for nn in sorted(dep_names):
+            xobj = line.element_dict[nn]._xobject
+            assert xobj._buffer is self._buffer
+            assert xobj._offset % 8 == 0 and xobj._size % 8 == 0
+            word_index.append(np.arange(xobj._offset // 8,
+                                        (xobj._offset + xobj._size) // 8))
+        if len(word_index) > 0:
+            word_index = np.concatenate(word_index)
+        else:
+            word_index = np.zeros(0, dtype=np.int64)
+
+        def _read_words():
+            buf = self._buffer.buffer
+            return buf[:len(buf) // 8 * 8].view(np.int64)[word_index]
+
+        # Evaluate the expressions for all updates
+        t_turn_s_before = line.vars['t_turn_s']._value
+        words_before = _read_words()
+        words = np.zeros((len(t_update), len(word_index)), dtype=np.int64)
+        try:
+            for ii, tt in enumerate(t_update):
+                line.vars['t_turn_s'] = tt
+                words[ii, :] = _read_words()
+        finally:
+            line.vars['t_turn_s'] = t_turn_s_before
+
+        mask_targets = (np.any(words != words[:1, :], axis=0)
+                        | (words[0, :] != words_before))
+        values = words[:, mask_targets]
+
+        if line.energy_program is not None:
+            p0c = np.atleast_1d(
+                line.energy_program.get_p0c_at_t_s(t_update)).astype(np.float64)
+        else:
+            p0c = np.zeros(0)
+
+        schedule = TimeDependentSchedule(
+            start_turn=start_turn,
+            last_applied_update=-1,
+            turn_to_update=turn_to_update,
+            target_offsets=8 * word_index[mask_targets],
+            values=values.flatten(),
+            p0c=p0c,
+            _buffer=self.io_buffer)
+        header = IOBufferHeader._from_buffer(self.io_buffer, 0)
+        header.time_dependent_schedule_offset = schedule._offset
+        self._time_dependent_schedule = schedule
+        self._time_dependent_schedule_t_update = t_update
+
+        return schedule
+
+    def discard_time_dependent_schedule(self):
+        """
+        Remove the tables built by `compile_time_dependent_vars`.
+        """
+        schedule = self._time_dependent_schedule
+        if schedule is None:
+            return
+        header = IOBufferHeader._from_buffer(self.io_buffer, 0)
+        header.time_dependent_schedule_offset = 0
+        self.io_buffer.free(schedule._offset, schedule._size)
+        self._time_dependent_schedule = None
+        self._time_dependent_schedule_t_update = None
+
+    def _time_dependent_schedule_covers(self, particles, num_turns):
+        schedule = self._time_dependent_schedule
+        if schedule is None:
+            return False
+        ctx2np = particles._context.nparray_from_context_array
+        state = ctx2np(particles.state)
+        at_turn = ctx2np(particles.at_turn)
+        if not np.any(state > 0):
+            return True
+        first_turn = at_turn[state > 0][0]
+        return (first_turn >= schedule.start_turn and first_turn + num_turns
+                <= schedule.start_turn + len(schedule.turn_to_update))
+
+    def _sync_time_dependent_vars(self):
+        # Bring the line variables to the last state applied by the kernel
+        iupdate = self._time_dependent_schedule.last_applied_update
+        if iupdate < 0:
+            return
+        t_turn = float(self._time_dependent_schedule_t_update[iupdate])
+        self.line._t_last_update_time_dependent_vars = t_turn
+        if self.vars['t_turn_s']._value != t_turn:
+            self.vars['t_turn_s'] = t_turn
 
     def _split_parts_for_collective_mode(self, line, _buffer):
 
@@ -297,30 +481,100 @@ class Tracker:
                 "Please rebuild the tracker, for example using `line.build_tracker(...)`.")
 
     def _track(self, particles, *args, with_progress: Union[bool, int] = False,
-               time=False, **kwargs):
+               time=False, checkpoint_every=None, checkpoint_path=None,
+               n_workers=None, stop_when_all_lost=False, max_time_s=None,
+               _resume_at_turn=0, **kwargs):
 
         out = None
 
+        early_termination = stop_when_all_lost or max_time_s is not None
+
+        if n_workers is not None and n_workers > 1:
+            if (with_progress or checkpoint_every is not None
+                    or early_termination):
+                raise NotImplementedError(
+                    'Progress indicator, checkpoints and early termination '
+                    'are not supported with `n_workers`')
+            if time:
+                t0 = perf_counter()
+            self._track_parallel(particles, n_workers=n_workers, **kwargs)
+            self.time_last_track = perf_counter() - t0 if time else None
+            return None
+
+        if (checkpoint_every is None) != (checkpoint_path is None):
+            raise ValueError('`checkpoint_every` and `checkpoint_path` must '
+                             'be provided together.')
+        if checkpoint_every is not None and kwargs.get('log') is not None:
+            raise NotImplementedError('`log` is not supported with checkpoints')
+
         if time:
             t0 = perf_counter()
 
         assert self.iscollective in (True, False)
-        if self.iscollective or self.line.enable_time_dependent_vars:
+        if (not self.iscollective and self.line.enable_time_dependent_vars
+                and self._time_dependent_schedule is not None
+                and kwargs.get('log') is None and not kwargs.get('backtrack')):
+            # Time-dependent variables are applied by the kernel
+            if kwargs.get('num_elements') is not None:
+                turns_to_cover = kwargs['num_elements'] // self.num_elements + 1
+            else:
+                turns_to_cover = kwargs.get('num_turns') or 1
+                if kwargs.get('ele_stop') is not None:
+                    turns_to_cover += 1
+            if not self._time_dependent_schedule_covers(particles,
+                                                        turns_to_cover):
+                raise ValueError('The turns to be tracked are not covered by '
+                                 'the compiled time-dependent variables, '
+                                 'please call `compile_time_dependent_vars` '
+                                 'again.')
+            tracking_func = partial(self._track_no_collective,
+                                    _apply_time_dependent_schedule=True)
+        elif self.iscollective or self.line.enable_time_dependent_vars:
             tracking_func = self._track_with_collective
         else:
             tracking_func = self._track_no_collective
 
-        if with_progress:
+        memmap_monitor = None
+        if isinstance(kwargs.get('turn_by_turn_monitor'),
+                      xt.MemmapParticlesMonitor):
+            memmap_monitor = kwargs['turn_by_turn_monitor']
+
+        chunked_tracking = (memmap_monitor is not None
+                            or checkpoint_every is not None
+                            or early_termination)
+
+        if with_progress or chunked_tracking:
             if self.enable_pipeline_hold:
-                raise ValueError("Progress indicator is not supported with pipeline hold")
+                raise ValueError("Progress indicator, memmap monitor, "
+                                 "checkpoints and early termination are not "
+                                 "supported with pipeline hold")
 
-            try:
-                num_turns = kwargs['num_turns']
-            except KeyError:
-                raise ValueError('Tracking with progress indicator is only '
-                                 'possible over more than one turn.')
+            if chunked_tracking and kwargs.get('num_elements') is not None:
+                raise ValueError('`num_elements` cannot be used with a memmap '
+                                 'monitor, checkpoints or early termination, '
+                                 'please use `num_turns`.')
 
-            if with_progress is True:
+            num_turns = kwargs.get('num_turns')
+            if num_turns is None:
+                if chunked_tracking:
+                    num_turns = kwargs['num_turns'] = 1
+                else:
+                    raise ValueError('Tracking with progress indicator is only '
+                                     'possible over more than one turn.')
+
+            if chunked_tracking:
+                # Turns are tracked in chunks fitting in the monitor buffer
+                # and/or between two checkpoints
+                batch_size = num_turns
+                if memmap_monitor is not None:
+                    batch_size = min(batch_size, memmap_monitor.chunk_turns)
+                if checkpoint_every is not None:
+                    assert checkpoint_every > 0
+                    batch_size = min(batch_size, int(checkpoint_every))
+                if with_progress is not True and with_progress:
+                    batch_size = min(batch_size, int(with_progress))
+                scaling = batch_size if batch_size > 1 else None
+            elif with_progress is True:
                 batch_size = scaling = 100
             else:
                 batch_size = int(with_progress)
@@ -339,14 +593,32 @@ class Tracker:
                 _, monitor, _, _ = self._get_monitor(particles, True, num_turns)
                 kwargs['turn_by_turn_monitor'] = monitor
 
-            for ii in progress(
-                    range(0, num_turns, batch_size),
-                    desc='Tracking',
-                    unit_scale=scaling,
-            ):
+            if early_termination and not with_progress:
+                # Chunks growing in size, checked between each other
+                batches = _AdaptiveTurnBatches(
+                    _resume_at_turn, num_turns, max_batch_size=batch_size,
+                    t_start=perf_counter(),
+                    max_time_s=max_time_s)
+            else:
+                batches = range(_resume_at_turn, num_turns, batch_size)
+                if with_progress:
+                    batches = progress(batches, desc='Tracking',
+                                       unit_scale=scaling)
+
+            if early_termination:
+                t_start_early_termination = perf_counter()
+                stop_reason = 'completed'
+                num_turns_done = _resume_at_turn
+
+            for ii in batches:
+                if isinstance(batches, _AdaptiveTurnBatches):
+                    this_batch_size = batches.batch_size
+                else:
+                    this_batch_size = min(batch_size, num_turns - ii)
+
                 one_turn_kwargs = kwargs.copy()
                 is_first_batch = ii == 0
-                is_last_batch = ii + batch_size >= num_turns
+                is_last_batch = ii + this_batch_size >= num_turns
 
                 if is_first_batch and is_last_batch:
                     # This is the only batch, we track as normal
@@ -354,24 +626,65 @@ class Tracker:
                 elif is_first_batch:
                     # Not the last batch, so track until the last element
                     one_turn_kwargs['ele_stop'] = None
-                    one_turn_kwargs['num_turns'] = batch_size
+                    one_turn_kwargs['num_turns'] = this_batch_size
                 elif is_last_batch:
                     # Not the first batch, so track from the first element
                     one_turn_kwargs['ele_start'] = None
-                    remaining_turns = num_turns % batch_size
-                    if remaining_turns == 0:
-                        remaining_turns = batch_size
-                    one_turn_kwargs['num_turns'] = remaining_turns
+                    one_turn_kwargs['num_turns'] = num_turns - ii
                     one_turn_kwargs['_reset_log'] = False
                 elif not is_first_batch and not is_last_batch:
                     # A 'middle batch', track from first to last element
-                    one_turn_kwargs['num_turns'] = batch_size
+                    one_turn_kwargs['num_turns'] = this_batch_size
                     one_turn_kwargs['ele_start'] = None
                     one_turn_kwargs['ele_stop'] = None
                     one_turn_kwargs['_reset_log'] = False
 
+                if memmap_monitor is not None:
+                    one_turn_kwargs['turn_by_turn_monitor'] = (
+                        memmap_monitor._get_chunk_monitor(
+                            particles, one_turn_kwargs.get('num_turns') or 1))
+
                 tracking_func(particles, *args, **one_turn_kwargs)
                 # particles.reorganize() # could be done in the future to optimize GPU usage
+
+                if memmap_monitor is not None:
+                    memmap_monitor._flush_chunk()
+
+                if checkpoint_every is not None:
+                    _save_checkpoint(checkpoint_path, {
+                        'particles': particles,
+                        'track_kwargs': kwargs,
+                        'checkpoint_every': checkpoint_every,
+                        'num_turns_done': ii + this_batch_size,
+                        'hash_config': self._hashable_config(),
+                    })
+
+                if early_termination:
+                    num_turns_done = ii + this_batch_size
+                    if is_last_batch:
+                        break
+                    if (stop_when_all_lost
+                            and _num_active_particles(particles) == 0):
+                        stop_reason = 'all_lost'
+                        break
+                    if (max_time_s is not None and
+                            perf_counter() - t_start_early_termination
+                            >= max_time_s):
+                        stop_reason = 'max_time'
+                        break
+
+            if early_termination:
+                out = TrackingStatus(
+                    num_turns_done=num_turns_done,
+                    num_turns=num_turns,
+                    completed=(stop_reason == 'completed'),
+                    stop_reason=stop_reason,
+                    num_active_particles=_num_active_particles(particles))
+
+            if memmap_monitor is not None:
+                self.record_last_track = memmap_monitor
+            elif checkpoint_every is not None:
+                self.record_last_track = kwargs.get('turn_by_turn_monitor')
         else:
             out = tracking_func(particles, *args, **kwargs)
 
@@ -384,6 +697,133 @@ class Tracker:
 
         return out
 
+    def _track_parallel(self, particles, n_workers, **kwargs):
+
+        if not isinstance(self._context, xo.ContextCpu):
+            raise NotImplementedError(
+                'Tracking with `n_workers` is only available on CPU')
+        if self.iscollective:
+            raise NotImplementedError(
+                'Tracking with `n_workers` is not available for collective '
+                'lines, as collective elements need all the particles')
+        if isinstance(kwargs.get('turn_by_turn_monitor'),
+                      xt.MemmapParticlesMonitor):
+            raise NotImplementedError(
+                'Memmap monitors are not supported with `n_workers`')
+
+        # Split the particles by index into contiguous shards
+        capacity = particles._capacity
+        bounds = np.linspace(0, capacity, min(n_workers, capacity) + 1,
+                             dtype=int)
+        shards = []
+        for i_start, i_end in zip(bounds[:-1], bounds[1:]):
+            mask = np.zeros(capacity, dtype=bool)
+            mask[i_start:i_end] = True
+            shards.append(particles.filter(mask))
+
+        monitor_in = kwargs.get('turn_by_turn_monitor')
+
+        # Track the shards in worker processes
+        if 'fork' in multiprocessing.get_all_start_methods():
+            # The workers inherit the line and the compiled kernels
+            mp_context = multiprocessing.get_context('fork')
+            initargs = (None, None)
+        else:
+            mp_context = multiprocessing.get_context('spawn')
+            initargs = (self.line.to_dict(), self.kernel_cache)
+
+        global _line_for_parallel_tracking
+        _line_for_parallel_tracking = self.line
+        try:
+            with ProcessPoolExecutor(max_workers=len(shards),
+                                     mp_context=mp_context,
+                                     initializer=_init_parallel_tracking_worker,
+                                     initargs=initargs) as executor:
+                futures = [executor.submit(_track_shard_worker, shard, kwargs)
+                           for shard in shards]
+                results = [ff.result() for ff in futures]
+        finally:
+            _line_for_parallel_tracking = None
+
+        tracked_shards = [rr[0] for rr in results]
+        shard_monitors = [rr[1] for rr in results]
+
+        # Copy the tracked particles back into the original object, with
+        # active and lost particles sorted by particle_id
+        state = np.concatenate([pp.state for pp in tracked_shards])
+        particle_id = np.concatenate([pp.particle_id for pp in tracked_shards])
+        group = np.where(state > 0, 0,
+                         np.where(state > LAST_INVALID_STATE, 1, 2))
+        order = np.lexsort((particle_id, group))
+        with particles._bypass_linked_vars():
+            for tt, nn in particles.per_particle_vars:
+                vv = np.concatenate([getattr(pp, nn) for pp in tracked_shards])
+                getattr(particles, nn)[:] = vv[order]
+        particles.reorganize()
+
+        # Merge the monitors
+        monitor = None
+        if monitor_in is not None and monitor_in is not False:
+            if isinstance(monitor_in, self.particles_monitor_class):
+                monitor = monitor_in
+            else:
+                mon0 = shard_monitors[0]
+                monitor = self.particles_monitor_class(
+                    _context=self._context,
+                    start_at_turn=mon0.start_at_turn,
+                    stop_at_turn=mon0.stop_at_turn,
+                    particle_id_range=(
+                        min(mm.part_id_start for mm in shard_monitors),
+                        max(mm.part_id_end for mm in shard_monitors)))
+                monitor.ebe_mode = mon0.ebe_mode
+            for pp, mon in zip(tracked_shards, shard_monitors):
+                _copy_monitor_rows(mon, monitor, pp.particle_id[pp.state
+                                                > LAST_INVALID_STATE])
+
+        self.record_last_track = monitor
+
+    def resume_track(self, checkpoint_path, with_progress=False, time=False,
+                     checkpoint_every=None):
+        """
+        Resume a tracking session from a checkpoint written by
+        `track(..., checkpoint_every=..., checkpoint_path=...)`. The line must
+        be identical to the one used to write the checkpoint. The checkpoint
+        keeps being updated while tracking.
+
+        Returns the tracked particles (a new object, rebuilt from the
+        checkpoint).
+        """
+
+        checkpoint = _load_checkpoint(checkpoint_path)
+
+        if checkpoint['hash_config'] != self._hashable_config():
+            raise ValueError('The checkpoint was written with a different '
+                             'line config.')
+
+        particles = checkpoint['particles']
+        if not isinstance(self._context, xo.ContextCpu):
+            particles = particles.copy(_context=self._context)
+
+        kwargs = checkpoint['track_kwargs']
+        monitor = kwargs.get('turn_by_turn_monitor')
+        if (isinstance(monitor, xt.ParticlesMonitor)
+                and not isinstance(self._context, xo.ContextCpu)):
+            kwargs['turn_by_turn_monitor'] = monitor.copy(_context=self._context)
+
+        if checkpoint_every is None:
+            checkpoint_every = checkpoint['checkpoint_every']
+
+        num_turns_done = checkpoint['num_turns_done']
+        if num_turns_done < kwargs['num_turns']:
+            self._track(particles, with_progress=with_progress, time=time,
+                        checkpoint_every=checkpoint_every,
+                        checkpoint_path=checkpoint_path,
+                        _resume_at_turn=num_turns_done, **kwargs)
+        else:
+            self.record_last_track = kwargs.get('turn_by_turn_monitor')
+
+        return particles
+
     @property
     def particle_ref(self) -> xt.Particles:
         self._check_invalidated()
@@ -426,7 +866,15 @@ class Tracker:
             containing_dir='.',
             extra_classes=[],
             extra_kernels={},
+            config=None,
+            kernel_cache=None,
     ):
+        if config is None:
+            config = self.config
+
+        if kernel_cache is None:
+            kernel_cache = self.kernel_cache
+
         if compile == 'force':
             use_prebuilt_kernels = False
         elif not self._context.allow_prebuilt_kernels:  # only CPU serial
@@ -444,14 +892,14 @@ class Tracker:
                 kernel_info = None
             else:
                 kernel_info = get_suitable_kernel(
-                    self.config, self.line_element_classes
+                    config, self.line_element_classes
                 )
 
             if kernel_info:
                 module_name, modules_classes = kernel_info
 
                 kernel_description = self.get_kernel_descriptions(
-                                            modules_classes)['track_line']
+                            modules_classes, config=config)['track_line']
                 kernels = self._context.kernels_from_file(
                     module_name=module_name,
                     containing_dir=XSK_PREBUILT_KERNELS_LOCATION,
@@ -468,6 +916,50 @@ class Tracker:
         headers.extend(self.extra_headers)
         headers.append(_pkg_root.joinpath("headers/constants.h"))
 
+        kernels = self.get_kernel_descriptions(kernel_element_classes,
+                                               config=config)
+        kernels.update(extra_kernels)
+
+        if config.get('XTRACK_PROFILE_ELEMENTS', False):
+            if not isinstance(context, xo.ContextCpu):
+                raise NotImplementedError(
+                    'XTRACK_PROFILE_ELEMENTS is only supported on CPU')
+            extra_classes = list(extra_classes) + [ElementProfile]
+
+        if config.get('XTRACK_TIME_DEPENDENT_SCHEDULE', False):
+            if (not isinstance(context, xo.ContextCpu)
+                    or getattr(context, 'openmp_enabled', False)):
+                raise NotImplementedError(
+                    'XTRACK_TIME_DEPENDENT_SCHEDULE is only supported on the '
+                    'serial CPU context')
+            if config.get('XSUITE_BACKTRACK', False):
+                raise NotImplementedError(
+                    'XTRACK_TIME_DEPENDENT_SCHEDULE is not supported in '
+                    'backtracking')
+            extra_classes = list(extra_classes) + [TimeDependentSchedule]
+
+        # Look for the kernel in the local kernel cache (CPU serial only)
+        cache_key = None
+        staging_dir = None
+        if (kernel_cache is not None and module_name is None and compile
+                and self._context.allow_prebuilt_kernels):
+            cache_key = kernel_cache.get_key(
+                config_headers=self._config_to_headers(config),
+                kernel_element_classes=kernel_element_classes,
+                extra_classes=extra_classes,
+                kernel_names=kernels.keys(),
+                extra_sources=list(self.extra_headers) + [self.local_particle_src],
+                context=context,
+                kernel_descriptions=kernels)
+            if compile != 'force':
+                cached_kernels = kernel_cache.load(
+                    cache_key, context=context, kernel_descriptions=kernels)
+                if cached_kernels is not None:
+                    return cached_kernels['track_line']
+            staging_dir = kernel_cache.new_staging_dir()
+            module_name = cache_key
+            containing_dir = staging_dir
+
         src_lines = []
         src_lines.append(
             r"""
@@ -525,6 +1017,15 @@ class Tracker:
             LocalParticle lpart;
             lpart.io_buffer = io_buffer;
 
+            #ifdef XTRACK_PROFILE_ELEMENTS
+            ElementProfile elem_profile = ElementProfile_from_io_buffer(io_buffer);
+            #endif
+
+            #ifdef XTRACK_TIME_DEPENDENT_SCHEDULE
+            TimeDependentSchedule td_schedule =
+                            TimeDependentSchedule_from_io_buffer(io_buffer);
+            #endif
+
             /*gpuglmem*/ int8_t* tbt_mon_pointer =
                             buffer_tbt_monitor + offset_tbt_monitor;
             ParticlesMonitorData tbt_monitor =
@@ -548,6 +1049,9 @@ class Tracker:
                 if (flag_monitor==1){
                     ParticlesMonitor_track_local_particle(tbt_monitor, &lpart);
                 }
+                #ifdef XTRACK_TIME_DEPENDENT_SCHEDULE
+                TimeDependentSchedule_apply(td_schedule, buffer, &lpart);
+                #endif
                 int64_t elem_idx = ele_start;
                 int64_t const increm = 1;
                 #else
@@ -569,6 +1073,10 @@ class Tracker:
                         /*gpuglmem*/ void* el = ElementRefData_member_elements(elem_ref_data, elem_idx);
                         int64_t elem_type = ElementRefData_typeid_elements(elem_ref_data, elem_idx);
 
+                        #ifdef XTRACK_PROFILE_ELEMENTS
+                        int64_t const profile_start = ElementProfile_clock();
+                        #endif
+
                         switch(elem_type){
         """
         )
@@ -599,6 +1107,11 @@ class Tracker:
             r"""
                         } //switch
 
+                    #ifdef XTRACK_PROFILE_ELEMENTS
+                    ElementProfile_record(elem_profile, elem_idx,
+                                          ElementProfile_clock() - profile_start);
+                    #endif
+
                     // Setting the below flag will break particle losses
                     #ifndef DANGER_SKIP_ACTIVE_CHECK_AND_SWAPS
 
@@ -659,8 +1172,9 @@ class Tracker:
 
         source_track = "\n".join(src_lines)
 
-        kernels = self.get_kernel_descriptions(kernel_element_classes)
-        kernels.update(extra_kernels)
+        if config.get('XTRACK_PARTICLES_FLOAT32', False):
+            source_track = source_track.replace(
+                'ParticlesData', xt.ParticlesFloat32._XoStruct.__name__)
 
         # Compile!
         if self._context.allow_prebuilt_kernels:
@@ -672,33 +1186,51 @@ class Tracker:
             # Saving kernels is unsupported on GPU
             kwargs = {}
 
-        out_kernels = context.build_kernels(
-            sources=[source_track],
-            kernel_descriptions=kernels,
-            extra_headers=self._config_to_headers() + headers,
-            extra_classes=kernel_element_classes + extra_classes,
-            apply_to_source=[
-                partial(_handle_per_particle_blocks,
-                        local_particle_src=self.local_particle_src)],
-            specialize=True,
-            compile=compile,
-            save_source_as=f'{module_name}.c' if module_name else None,
-            **kwargs,
-        )
+        try:
+            out_kernels = context.build_kernels(
+                sources=[source_track],
+                kernel_descriptions=kernels,
+                extra_headers=self._config_to_headers(config) + headers,
+                extra_classes=kernel_element_classes + extra_classes,
+                apply_to_source=[
+                    partial(_handle_per_particle_blocks,
+                            local_particle_src=self.local_particle_src)],
+                specialize=True,
+                compile=compile,
+                save_source_as=(f'{module_name}.c'
+                        if module_name and staging_dir is None else None),
+                **kwargs,
+            )
+        except Exception:
+            if staging_dir is not None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        if staging_dir is not None:
+            kernel_cache.store(cache_key, staging_dir)
+
         return out_kernels['track_line']
 
-    def get_kernel_descriptions(self, kernel_element_classes):
+    def get_kernel_descriptions(self, kernel_element_classes, config=None):
+
+        if config is None:
+            config = self.config
 
         tdata_type = _element_ref_data_class_from_element_classes(
             kernel_element_classes)
 
+        if config.get('XTRACK_PARTICLES_FLOAT32', False):
+            particles_class = xt.ParticlesFloat32
+        else:
+            particles_class = xt.Particles
+
         kernel_descriptions = {
             "track_line": xo.Kernel(
                 c_name='track_line',
                 args=[
                     xo.Arg(xo.Int8, pointer=True, name="buffer"),
                     xo.Arg(tdata_type, name="tracker_data"),
-                    xo.Arg(xt.Particles._XoStruct, name="particles"),
+                    xo.Arg(particles_class._XoStruct, name="particles"),
                     xo.Arg(xo.Int32, name="num_turns"),
                     xo.Arg(xo.Int32, name="ele_start"),
                     xo.Arg(xo.Int32, name="num_ele_track"),
@@ -826,7 +1358,19 @@ class Tracker:
 
         return _need_unhide_lost_particles, moveback_to_buffer, moveback_to_offset
 
-    def _track_part(self, particles, pp, tt, ipp, ele_start, ele_stop, num_turns, monitor):
+    def _get_collective_track_plan(self, particles):
+        if isinstance(particles, xt.ParticlesFloat32) != bool(
+                self.config.get('XTRACK_PARTICLES_FLOAT32', False)):
+            # The kernel is selected by _track_no_collective
+            return None
+        key = (self._hashable_config(), particles.__class__)
+        if key not in self._collective_track_plans:
+            self._collective_track_plans[key] = _CollectiveTrackPlan(
+                                                            self, particles)
+        return self._collective_track_plans[key]
+
+    def _track_part(self, particles, pp, tt, ipp, ele_start, ele_stop, num_turns, monitor,
+                    plan=None):
         ret = None
         skip = False
         stop_tracking = False
@@ -865,7 +1409,11 @@ class Tracker:
         else:
             # We are in between the part that contains the start element,
             # and the one that contains the stop element, so track normally
-            if isinstance(pp, TrackerPartNonCollective):
+            if (plan is not None and monitor is None
+                    and isinstance(pp, TrackerPartNonCollective)
+                    and plan.can_track(particles)):
+                plan.track_part(particles, ipp)
+            elif isinstance(pp, TrackerPartNonCollective):
                 ret = pp.track(particles, turn_by_turn_monitor=monitor)
             else:
                 ret = pp.track(particles)
@@ -956,6 +1504,13 @@ class Tracker:
             tt_resume = None
             ipp_resume = None
 
+        # Kernel arguments for the non-collective parts, prepared only once
+        if particles is not None:
+            plan = self._get_collective_track_plan(particles)
+        else:
+            plan = self._get_collective_track_plan(
+                                            _session_to_resume['particles'])
+
         for tt in range(num_turns):
             if tt_resume is not None and tt < tt_resume:
                 continue
@@ -1034,14 +1589,15 @@ class Tracker:
                                             moveback_to_buffer, moveback_to_offset,
                                             _context_needs_clean_active_lost_state)
 
-                if monitor is not None and monitor.ebe_mode == 1:
+                if monitor is not None and monitor.ebe_mode in (1, 2):
                     monitor_part = monitor
                 else:
                     monitor_part = None
 
                 # Track!
                 stop_tracking, skip, returned_by_track = self._track_part(
-                        particles, pp, tt, ipp, ele_start, ele_stop, num_turns, monitor_part)
+                        particles, pp, tt, ipp, ele_start, ele_stop, num_turns, monitor_part,
+                        plan=plan)
 
                 if returned_by_track is not None:
                     if returned_by_track.on_hold:
@@ -1081,6 +1637,8 @@ class Tracker:
                         if not hasattr(self, '_zerodrift_cpu'):
                             self._zerodrift_cpu = self._zerodrift.copy(particles._buffer.context)
                         self._zerodrift_cpu.track(particles, increment_at_element=True)
+                    elif plan is not None:
+                        plan.increment_at_element(particles)
                     else:
                         self._zerodrift.track(particles, increment_at_element=True)
 
@@ -1126,6 +1684,7 @@ class Tracker:
         log=None,
         _force_no_end_turn_actions=False,
         _reset_log=True,
+        _apply_time_dependent_schedule=False,
     ):
 
         self._check_invalidated()
@@ -1149,6 +1708,26 @@ class Tracker:
                 self.config.XSUITE_BACKTRACK = True
                 return self._track_no_collective(**kwargs)
 
+        if (_apply_time_dependent_schedule and
+                not self.config.get('XTRACK_TIME_DEPENDENT_SCHEDULE', False)):
+            kwargs = locals().copy()
+            kwargs.pop('self')
+            with xt.line._preserve_config(self):
+                self.config.XTRACK_TIME_DEPENDENT_SCHEDULE = True
+                out = self._track_no_collective(**kwargs)
+            self._sync_time_dependent_vars()
+            return out
+
+        is_float32 = isinstance(particles, xt.ParticlesFloat32)
+        if is_float32 != bool(self.config.get('XTRACK_PARTICLES_FLOAT32', False)):
+            # The kernel is compiled for the precision of the particles
+            kwargs = locals().copy()
+            kwargs.pop('self')
+            kwargs.pop('is_float32')
+            with xt.line._preserve_config(self):
+                self.config.XTRACK_PARTICLES_FLOAT32 = is_float32
+                return self._track_no_collective(**kwargs)
+
         self.local_particle_src = particles.gen_local_particle_api()
 
         if freeze_longitudinal:
@@ -1272,6 +1851,9 @@ class Tracker:
         track_kernel, tracker_data = self.get_track_kernel_and_data_for_present_config()
         track_kernel.description.n_threads = particles._capacity
 
+        if self.config.get('XTRACK_PROFILE_ELEMENTS', False):
+            self._get_element_profile()
+
         # First turn
         assert num_elements_first_turn >= 0
         track_kernel(
@@ -1362,7 +1944,7 @@ class Tracker:
             monitor.ebe_mode = 1
             flag_monitor = 2
         elif isinstance(turn_by_turn_monitor, self.particles_monitor_class):
-            if turn_by_turn_monitor.ebe_mode == 1:
+            if turn_by_turn_monitor.ebe_mode in (1, 2): # element by element
                 flag_monitor = 2
             else:
                 flag_monitor = 1
@@ -1382,13 +1964,17 @@ class Tracker:
     def from_binary_file(cls, path, particles_monitor_class=None, **kwargs) -> 'Tracker':
         raise NotImplementedError('from_binary_file not implemented anymore')
 
-    def _hashable_config(self):
-        items = ((k, v) for k, v in self.config.items() if v is not False)
+    def _hashable_config(self, config=None):
+        if config is None:
+            config = self.config
+        items = ((k, v) for k, v in config.items() if v is not False)
         return tuple(sorted(items))
 
-    def _config_to_headers(self):
+    def _config_to_headers(self, config=None):
+        if config is None:
+            config = self.config
         headers = []
-        for k, v in self.config.items():
+        for k, v in config.items():
             if not isinstance(v, bool):
                 headers.append(f'#define {k} {v}')
             elif v is True:
@@ -1407,6 +1993,93 @@ class Tracker:
         self._tracker_data_base.mask_markers_for_twiss = mask_twiss
         return mask_twiss
 
+    def precompile(self, configs, n_workers=None):
+        """
+        Compile the track kernels for several configurations in parallel and
+        store them in `track_kernel`, so that switching to any of these
+        configurations later does not trigger a compilation.
+
+        Parameters
+        ----------
+        configs: list
+            Configurations to be compiled. Each entry is a dictionary of
+            config flags applied on top of the present configuration of the
+            line (a flag set to `False` is removed), or one of the strings
+            'backtrack' and 'freeze_longitudinal'.
+        n_workers: int, optional
+            Number of compilation processes. Defaults to the number of
+            configurations to be compiled, capped to the number of CPUs.
+
+        Returns
+        -------
+        hash_configs: list
+            Keys of `track_kernel` corresponding to the given configurations.
+        """
+        target_configs = []
+        hash_configs = []
+        for cc in configs:
+            if isinstance(cc, str):
+                if cc not in _PRECOMPILE_PRESETS:
+                    raise ValueError(
+                        f'Unknown config preset `{cc}`, valid presets are: '
+                        f'{list(_PRECOMPILE_PRESETS.keys())}')
+                cc = _PRECOMPILE_PRESETS[cc]()
+            config = TrackerConfig()
+            config.update(self.config)
+            config.update(cc)
+            hash_config = self._hashable_config(config)
+            hash_configs.append(hash_config)
+            if (hash_config not in self.track_kernel
+                and hash_config not in [self._hashable_config(tc)
+                                        for tc in target_configs]):
+                target_configs.append(config)
+
+        if len(target_configs) == 0:
+            return hash_configs
+
+        if n_workers is None:
+            n_workers = min(len(target_configs), os.cpu_count() or 1)
+
+        use_processes = (n_workers > 1 and len(target_configs) > 1
+                         and self._context.allow_prebuilt_kernels
+                         and 'fork' in multiprocessing.get_all_start_methods())
+
+        if not use_processes:
+            for config in target_configs:
+                self.track_kernel[self._hashable_config(config)] = (
+                    self._build_kernel(compile=True, config=config))
+            return hash_configs
+
+        # The kernels are compiled by forked processes into a kernel cache,
+        # from which they are then loaded (a temporary one is used if the
+        # tracker has none)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if self.kernel_cache is not None:
+                kernel_cache = self.kernel_cache
+            else:
+                kernel_cache = KernelCache(tmp_dir, max_size=np.inf)
+
+            global _tracker_for_precompile
+            _tracker_for_precompile = self
+            try:
+                mp_context = multiprocessing.get_context('fork')
+                with ProcessPoolExecutor(max_workers=n_workers,
+                                         mp_context=mp_context) as executor:
+                    futures = [executor.submit(_precompile_worker,
+                                               dict(config), kernel_cache)
+                               for config in target_configs]
+                    for ff in futures:
+                        ff.result()
+            finally:
+                _tracker_for_precompile = None
+
+            for config in target_configs:
+                self.track_kernel[self._hashable_config(config)] = (
+                    self._build_kernel(compile=True, config=config,
+                                       kernel_cache=kernel_cache))
+
+        return hash_configs
+
     def get_track_kernel_and_data_for_present_config(self):
 
         hash_config = self._hashable_config()
@@ -1466,7 +2139,7 @@ class Tracker:
 
         # Remove the compiled kernels from the state
         state = self.__dict__.copy()
-        state['_track_kernel'].clear()
+        state['_track_kernel'] = {}
         return state
 
     def check_compatibility_with_prebuilt_kernels(self):
@@ -1477,6 +2150,95 @@ class Tracker:
             verbose=True)
 
 
+def _save_checkpoint(path, checkpoint):
+    # Data is moved to the CPU, and written to a temporary file that replaces
+    # the previous checkpoint only when complete
+    checkpoint = checkpoint.copy()
+    particles = checkpoint['particles']
+    if not isinstance(particles._context, xo.ContextCpu):
+        checkpoint['particles'] = particles.copy(_context=xo.ContextCpu())
+    kwargs = checkpoint['track_kwargs'].copy()
+    monitor = kwargs.get('turn_by_turn_monitor')
+    if (isinstance(monitor, xt.ParticlesMonitor)
+            and not isinstance(monitor._context, xo.ContextCpu)):
+        kwargs['turn_by_turn_monitor'] = monitor.copy(_context=xo.ContextCpu())
+    checkpoint['track_kwargs'] = kwargs
+    checkpoint['version'] = _CHECKPOINT_VERSION
+
+    path = str(path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as fid:
+        pickle.dump(checkpoint, fid)
+        fid.flush()
+        os.fsync(fid.fileno())
+    os.replace(tmp_path, path)
+
+
+def _load_checkpoint(path):
+    with open(path, 'rb') as fid:
+        checkpoint = pickle.load(fid)
+    if checkpoint.get('version') != _CHECKPOINT_VERSION:
+        raise ValueError(f'Incompatible checkpoint version in {path}')
+    return checkpoint
+
+
+_CHECKPOINT_VERSION = 1
+
+_line_for_parallel_tracking = None
+
+
+def _init_parallel_tracking_worker(line_dict, kernel_cache):
+    global _line_for_parallel_tracking
+    if line_dict is not None:
+        # Not forked, the line needs to be rebuilt
+        _line_for_parallel_tracking = xt.Line.from_dict(line_dict)
+        _line_for_parallel_tracking.build_tracker(kernel_cache=kernel_cache)
+
+
+def _track_shard_worker(particles, kwargs):
+    line = _line_for_parallel_tracking
+    line.tracker._track(particles, **kwargs)
+    return particles, getattr(line.tracker, 'record_last_track', None)
+
+
+def _copy_monitor_rows(mon_src, mon_dest, particle_ids):
+    # Copy the records of the given particles between monitors with the same
+    # turn range
+    n_turns = mon_dest.stop_at_turn - mon_dest.start_at_turn
+    assert mon_src.stop_at_turn - mon_src.start_at_turn == n_turns
+    n_rep = mon_dest.n_repetitions
+    src_start, src_end = mon_src.part_id_start, mon_src.part_id_end
+    dest_start, dest_end = mon_dest.part_id_start, mon_dest.part_id_end
+    particle_ids = particle_ids[(particle_ids >= max(src_start, dest_start))
+                                & (particle_ids < min(src_end, dest_end))]
+    for _, nn in mon_dest._ParticlesClass.per_particle_vars:
+        vv_src = getattr(mon_src.data, nn).reshape(
+                                        n_rep, src_end - src_start, n_turns)
+        vv_dest = getattr(mon_dest.data, nn).reshape(
+                                        n_rep, dest_end - dest_start, n_turns)
+        vv_dest[:, particle_ids - dest_start, :] = (
+                                vv_src[:, particle_ids - src_start, :])
+
+_tracker_for_precompile = None
+
+
+def _precompile_worker(config, kernel_cache):
+    # Runs in a forked process, where the tracker is inherited from the parent
+    _tracker_for_precompile._build_kernel(
+        compile=True, config=config, kernel_cache=kernel_cache)
+
+
+def _freeze_longitudinal_config():
+    return {f'FREEZE_VAR_{vv}': True
+            for vv in xt.Particles.part_energy_varnames() + ['zeta']}
+
+
+_PRECOMPILE_PRESETS = {
+    'backtrack': lambda: {'XSUITE_BACKTRACK': True},
+    'freeze_longitudinal': _freeze_longitudinal_config,
+}
+
+
 class TrackerConfig(UserDict):
 
     def __setitem__(self, idx, val):
@@ -1508,6 +2270,82 @@ class TrackerConfig(UserDict):
             del self[k]
 
 
+class _CollectiveTrackPlan:
+    """
+    Kernels and arguments used in collective tracking for the non-collective
+    parts and for the increment of `at_element` after the collective ones.
+    They are prepared once for a given tracker config and particles class,
+    so that each part is tracked with a bare kernel call instead of going
+    through `Tracker._track_no_collective`. The buffers and flags that can
+    change between two tracks (e.g. the io_buffer, which is reallocated
+    when it grows) are taken from the tracker at each call.
+    """
+
+    def __init__(self, tracker, particles):
+        self._is_cpu = isinstance(tracker._context, xo.ContextCpu)
+
+        tracker.local_particle_src = particles.gen_local_particle_api()
+        track_kernel, tracker_data = (
+            tracker.get_track_kernel_and_data_for_present_config())
+        if tracker.config.get('XTRACK_PROFILE_ELEMENTS', False):
+            tracker._get_element_profile()
+        self.track_kernel = track_kernel
+        self.tracker = tracker
+        self.tracker_data = tracker_data
+
+        common_kwargs = dict(
+            tracker_data=tracker_data._element_ref_data,
+            num_turns=1,
+            flag_end_turn_actions=False,
+            flag_monitor=0,
+            num_ele_line=len(tracker_data.element_names),
+            line_length=tracker_data.line_length,
+            offset_tbt_monitor=0,
+        )
+        self.part_kwargs = []
+        for pp in tracker._parts:
+            if isinstance(pp, TrackerPartNonCollective):
+                self.part_kwargs.append(dict(
+                    common_kwargs,
+                    ele_start=pp.ele_start_in_tracker,
+                    num_ele_track=(pp.ele_stop_in_tracker
+                                   - pp.ele_start_in_tracker)))
+            else:
+                self.part_kwargs.append(None)
+
+        # Only collective lines have collective parts
+        zerodrift = getattr(tracker, '_zerodrift', None)
+        if zerodrift is not None:
+            if zerodrift._track_kernel_name not in zerodrift._context.kernels:
+                zerodrift.compile_kernels()
+            self.zerodrift_kernel = zerodrift._context.kernels[
+                                                zerodrift._track_kernel_name]
+            self.zerodrift_kwargs = dict(
+                el=zerodrift._xobject,
+                flag_increment_at_element=True,
+                io_buffer=zerodrift._context.zeros(1, dtype=np.int8))  # dummy
+
+    def can_track(self, particles):
+        # The particles can be left unorganized by a collective element
+        return not self._is_cpu or particles._num_active_particles >= 0
+
+    def track_part(self, particles, ipp):
+        buffer = self.tracker_data._buffer.buffer
+        self.track_kernel.description.n_threads = particles._capacity
+        self.track_kernel(particles=particles._xobject,
+                          buffer=buffer,
+                          buffer_tbt_monitor=buffer,  # any valid buffer
+                          io_buffer=self.tracker.io_buffer.buffer,
+                          flag_reset_s_at_end_turn=(
+                              self.tracker.reset_s_at_end_turn),
+                          **self.part_kwargs[ipp])
+
+    def increment_at_element(self, particles):
+        self.zerodrift_kernel.description.n_threads = particles._capacity
+        self.zerodrift_kernel(particles=particles._xobject,
+                              **self.zerodrift_kwargs)
+
+
 class TrackerPartNonCollective:
     def __init__(self, tracker, ele_start_in_tracker, ele_stop_in_tracker):
         self.tracker = tracker
@@ -1570,6 +2408,57 @@ def _element_ref_data_class_from_element_classes(element_classes):
     return ElementRefData
 
 
+class _AdaptiveTurnBatches:
+    """
+    Iterate over the first turns of batches starting with a single turn and
+    doubling in size up to `max_batch_size`. If `max_time_s` is given, the
+    size is also limited to the number of turns expected to fit in the
+    remaining time, estimated from the previous batch.
+    """
+
+    def __init__(self, start, stop, max_batch_size, t_start, max_time_s=None):
+        self.start = start
+        self.stop = stop
+        self.max_batch_size = max_batch_size
+        self.t_start = t_start
+        self.max_time_s = max_time_s
+        self.batch_size = None
+
+    def __iter__(self):
+        ii = self.start
+        size = 1
+        time_per_turn = None
+        while ii < self.stop:
+            size = min(size, self.max_batch_size, self.stop - ii)
+            if self.max_time_s is not None and time_per_turn:
+                t_left = self.max_time_s - (perf_counter() - self.t_start)
+                size = max(1, min(size, int(t_left / time_per_turn)))
+            self.batch_size = size
+            t0 = perf_counter()
+            yield ii
+            time_per_turn = (perf_counter() - t0) / size
+            ii += size
+            size *= 2
+
+
+def _num_active_particles(particles):
+    if particles._num_active_particles >= 0:
+        return particles._num_active_particles
+    ctx2np = particles._buffer.context.nparray_from_context_array
+    return int(np.sum(ctx2np(particles.state) > 0))
+
+
+class TrackingStatus(dict):
+    """
+    Outcome of a tracking with early termination (see `stop_when_all_lost`
+    and `max_time_s` in `Line.track`).
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__ = self
+        self.update(kwargs)
+
+
 class Log(dict):
 
     def __init__(self, *args, **kwargs):
@@ -8,6 +8,9 @@ import logging
 import io
 import json
 from functools import partial
+import itertools
+from collections.abc import KeysView, ValuesView, ItemsView
+
 import numpy as np
 from scipy.constants import c as clight
 from scipy.constants import hbar
@@ -31,6 +34,15 @@ DEFAULT_STEPS_R_MATRIX = {
 }
 
 DEFAULT_CO_SEARCH_TOL = [1e-11, 1e-11, 1e-11, 1e-11, 1e-5, 1e-9]
+CO_SEARCH_MULTI_TOL = [1e-12, 1e-12, 1e-12, 1e-12, 1e-9, 1e-12]
+
+# Number of ranges for which the record of the last twiss is kept for
+# incremental twiss (each holds an element-by-element monitor)
+MAX_INCREMENTAL_TWISS_STATES = 4
+
+# Above this fraction of modified elements the closed orbit stored in the
+# closed orbit cache is not used as starting point of the search
+MAX_FRACTION_MODIFIED_ELEMENTS_CO_GUESS = 0.1
 
 DEFAULT_MATRIX_RESPONSIVENESS_TOL = 1e-15
 DEFAULT_MATRIX_STABILITY_TOL = 2e-3
@@ -47,6 +59,21 @@ VARS_FOR_TWISS_INIT_GENERATION = [
     'ddx', 'ddpx', 'ddy', 'ddpy',
 ]
 
+VARS_HIDE_THIN_GROUPS = [
+    'x', 'px', 'y', 'py', 'zeta', 'delta', 'ptau',
+    'betx', 'bety', 'alfx', 'alfy', 'gamx', 'gamy',
+    'betx1', 'bety1', 'betx2', 'bety2',
+    'dx', 'dpx', 'dy', 'dzeta', 'dpy',
+]
+
+# Columns computed from the W matrix by _compute_lattice_functions
+COLUMNS_LATTICE_FUNCTIONS = [
+    'betx', 'bety', 'alfx', 'alfy', 'gamx', 'gamy',
+    'dx', 'dpx', 'dy', 'dpy', 'dx_zeta', 'dpx_zeta', 'dy_zeta', 'dpy_zeta',
+    'betx1', 'bety1', 'betx2', 'bety2',
+    'mux', 'muy', 'muzeta', 'nux', 'nuy', 'nuzeta', 'W_matrix',
+]
+
 NORMAL_STRENGTHS_FROM_ATTR=['k0l', 'k1l', 'k2l', 'k3l', 'k4l', 'k5l']
 SKEW_STRENGTHS_FROM_ATTR=['k0sl', 'k1sl', 'k2sl', 'k3sl', 'k4sl', 'k5sl']
 OTHER_FIELDS_FROM_ATTR=['angle_rad', 'rot_s_rad', 'hkick', 'vkick', 'element_type', 'isthick', 'length', 'parent_name']
@@ -60,6 +87,7 @@ def twiss_line(line, particle_ref=None, method=None,
         delta_disp=None, delta_chrom=None, zeta_disp=None,
         co_guess=None, steps_r_matrix=None,
         co_search_settings=None, at_elements=None, at_s=None,
+        sparse_at_elements=None,
         continue_on_closed_orbit_error=None,
         freeze_longitudinal=None,
         freeze_energy=None,
@@ -96,6 +124,8 @@ def twiss_line(line, particle_ref=None, method=None,
         _keep_initial_particles=None,
         _initial_particles=None,
         _ebe_monitor=None,
+        _multi_delta=None,
+        _incremental=None,
         only_markers=None,
         ):
 
@@ -129,6 +159,13 @@ def twiss_line(line, particle_ref=None, method=None,
     at_s : list, optional
         List of positions in meters at which the Twiss parameters are computed.
         If not provided, the Twiss parameters are computed at all positions.
+    sparse_at_elements : bool, optional
+        If True, for a twiss with given initial conditions and `at_elements`,
+        the twiss particles are recorded only at the requested elements (and
+        at the start of the range) instead of at all the elements of the
+        range. The phase advances are then unwrapped between consecutive
+        recorded elements only, so their integer part is lost if these are
+        more than half a betatron period apart. Default is False.
     radiation_method : {'full', 'kick_as_co', 'scale_as_co'}, optional
         Method to be used for the computation of twiss parameters in the presence
         of radiation. If 'full' the method described in E. Forest, "From tracking
@@ -252,7 +289,14 @@ def twiss_line(line, particle_ref=None, method=None,
             Initial guess for the closed orbit. If not provided, zero is assumed.
         - co_search_settings : dict, optional
             Settings to be used for the closed orbit search.
-            If not provided, the default values are used.
+            If not provided, the default values are used. With
+            `{'solver': 'quasi_newton'}` a Newton-Broyden search is used and
+            the one-turn matrix found by the search is reused by the twiss.
+            The search stops when the change of the coordinates over one
+            turn is below `tol` (scalar or one value per coordinate, default
+            `xtrack.twiss.DEFAULT_CO_SEARCH_TOL`), also used to accept the
+            initial guess, or after `max_iterations` iterations (quasi-Newton
+            search only, default 50).
         - num_turns: int, optional
             If specified the periodic solution and the twiss table are computed
             on multiple turns.
@@ -284,6 +328,7 @@ def twiss_line(line, particle_ref=None, method=None,
     """
 
     input_kwargs = locals().copy()
+    input_kwargs.pop('_multi_delta')
 
     # defaults
     r_sigma=(r_sigma or 0.01)
@@ -497,6 +542,21 @@ def twiss_line(line, particle_ref=None, method=None,
         assert init is not None, (
             'init must be provided if start and end are used')
 
+    # On request, for an open twiss the twiss particles are recorded only at
+    # the requested elements (the periodic twiss needs the full record for the
+    # global quantities)
+    at_element_indices = None
+    if (sparse_at_elements and at_elements is not None
+            and not periodic and not reverse
+            and init.element_name == start
+            and compute_chromatic_properties is not True
+            and not only_markers and not _continue_if_lost
+            and not _keep_tracking_data and not _keep_initial_particles
+            and _ebe_monitor is None and _initial_particles is None
+            and not _incremental):
+        at_element_indices, at_elements_names = _sparse_twiss_at_elements(
+            line, at_elements, start, end)
+
     if matrix_responsiveness_tol is None:
         matrix_responsiveness_tol = line.matrix_responsiveness_tol
     if matrix_stability_tol is None:
@@ -535,7 +595,33 @@ def twiss_line(line, particle_ref=None, method=None,
             raise ValueError(f'init={init} not anymore supported')
         assert init == 'periodic'
 
-    if periodic:
+    # Periodic solutions computed together for several momentum offsets
+    # (used by `get_non_linear_chromaticity`)
+    if _multi_delta is not None and not (
+            periodic and delta0 is not None and zeta0 is None
+            and particle_on_co is None and co_guess is None
+            and R_matrix is None and W_matrix is None
+            and start is None and end is None and num_turns == 1
+            and co_search_at is None and not search_for_t_rev
+            and not compute_R_element_by_element and not only_orbit
+            and compute_lattice_functions and not _keep_tracking_data
+            and _initial_particles is None and _ebe_monitor is None
+            and line.energy_program is None):
+        _multi_delta = None
+
+    if periodic and _multi_delta is not None:
+
+        (init, R_matrix, steps_r_matrix, eigenvalues, Rot, RR_ebe
+            ) = _multi_delta.get_periodic_solution(
+                line=line, particle_ref=particle_ref, method=method,
+                delta0=delta0, delta_chrom=delta_chrom,
+                steps_r_matrix=steps_r_matrix,
+                symplectify=symplectify,
+                matrix_responsiveness_tol=matrix_responsiveness_tol,
+                matrix_stability_tol=matrix_stability_tol,
+                nemitt_x=nemitt_x, nemitt_y=nemitt_y)
+
+    elif periodic:
 
         assert not _keep_initial_particles
 
@@ -577,25 +663,49 @@ def twiss_line(line, particle_ref=None, method=None,
         raise NotImplementedError(
             '`only_markers` not implemented for `eneloss_and_damping`')
 
-    twiss_res = _twiss_open(
-        line=line,
-        init=init,
-        start=start, end=end,
-        nemitt_x=nemitt_x,
-        nemitt_y=nemitt_y,
-        r_sigma=r_sigma,
-        delta_disp=delta_disp,
-        zeta_disp=zeta_disp,
-        use_full_inverse=use_full_inverse,
-        hide_thin_groups=hide_thin_groups,
-        only_markers=only_markers,
-        only_orbit=only_orbit,
-        compute_lattice_functions=compute_lattice_functions,
-        _continue_if_lost=_continue_if_lost,
-        _keep_tracking_data=_keep_tracking_data,
-        _keep_initial_particles=_keep_initial_particles,
-        _initial_particles=_initial_particles,
-        _ebe_monitor=_ebe_monitor)
+    if _multi_delta is not None:
+        inits_chrom = [
+            _chromatic_init_periodic(init, sol[0].particle_on_co, sol[1],
+                        method=method,
+                        matrix_responsiveness_tol=matrix_responsiveness_tol,
+                        matrix_stability_tol=matrix_stability_tol,
+                        symplectify=symplectify)
+            for sol in _multi_delta.get_chromatic_solutions(delta_chrom)]
+        twiss_res = _multi_delta.get_twiss_open(
+            line=line,
+            delta0=delta0,
+            inits_chrom=inits_chrom,
+            nemitt_x=nemitt_x,
+            nemitt_y=nemitt_y,
+            r_sigma=r_sigma,
+            delta_disp=delta_disp,
+            zeta_disp=zeta_disp,
+            use_full_inverse=use_full_inverse,
+            hide_thin_groups=hide_thin_groups,
+            only_markers=only_markers,
+            _continue_if_lost=_continue_if_lost)
+    else:
+        twiss_res = _twiss_open(
+            line=line,
+            init=init,
+            start=start, end=end,
+            nemitt_x=nemitt_x,
+            nemitt_y=nemitt_y,
+            r_sigma=r_sigma,
+            delta_disp=delta_disp,
+            zeta_disp=zeta_disp,
+            use_full_inverse=use_full_inverse,
+            hide_thin_groups=hide_thin_groups,
+            only_markers=only_markers,
+            only_orbit=only_orbit,
+            compute_lattice_functions=compute_lattice_functions,
+            _continue_if_lost=_continue_if_lost,
+            _keep_tracking_data=_keep_tracking_data,
+            _keep_initial_particles=_keep_initial_particles,
+            _initial_particles=_initial_particles,
+            _ebe_monitor=_ebe_monitor,
+            _incremental=_incremental,
+            _at_element_indices=at_element_indices)
 
     if not skip_global_quantities and not only_orbit:
         twiss_res._data['R_matrix'] = R_matrix
@@ -604,6 +714,10 @@ def twiss_line(line, particle_ref=None, method=None,
 
         _compute_global_quantities(
                             line=line, twiss_res=twiss_res)
+        if hasattr(init.particle_on_co, '_fsolve_info'):
+            # The table holds a copy of the particle
+            twiss_res.particle_on_co._fsolve_info = (
+                                        init.particle_on_co._fsolve_info)
 
         twiss_res._data['eigenvalues'] = eigenvalues.copy()
         twiss_res._data['rotation_matrix'] = Rot.copy()
@@ -633,7 +747,8 @@ def twiss_line(line, particle_ref=None, method=None,
             num_turns=num_turns,
             hide_thin_groups=hide_thin_groups,
             only_markers=only_markers,
-            periodic=periodic)
+            periodic=periodic,
+            _multi_delta=_multi_delta)
         twiss_res._data.update(cols_chrom)
         twiss_res._data.update(scalars_chrom)
         twiss_res._col_names += list(cols_chrom.keys())
@@ -689,7 +804,9 @@ def twiss_line(line, particle_ref=None, method=None,
             twiss_res._data.update(eq_emitts)
 
     if method == '4d' and 'muzeta' in twiss_res._data:
-        twiss_res.muzeta[:] = 0
+        def _set_muzeta_to_zero(data):
+            data['muzeta'][:] = 0
+        _apply_to_columns(twiss_res, ['muzeta'], _set_muzeta_to_zero)
         if 'qs' in twiss_res._data:
             twiss_res._data['qs'] = 0
 
@@ -727,18 +844,19 @@ def twiss_line(line, particle_ref=None, method=None,
         # Start phase advance with provided init
         if ((twiss_res.orientation == 'forward' and not reverse)
                 or (twiss_res.orientation == 'backward' and reverse)):
-            twiss_res.muzeta += init.muzeta - twiss_res.muzeta[0]
-            twiss_res.dzeta += init.dzeta - twiss_res.dzeta[0]
-            if 'mux' in twiss_res._data:
-                twiss_res.mux += init.mux - twiss_res.mux[0]
-                twiss_res.muy += init.muy - twiss_res.muy[0]
+            i_init = 0
         elif ((twiss_res.orientation == 'forward' and reverse)
             or (twiss_res.orientation == 'backward' and not reverse)):
-            twiss_res.muzeta += init.muzeta - twiss_res.muzeta[-1]
-            twiss_res.dzeta += init.dzeta - twiss_res.dzeta[-1]
-            if 'mux' in twiss_res._data:
-                twiss_res.mux += init.mux - twiss_res.mux[-1]
-                twiss_res.muy += init.muy - twiss_res.muy[-1]
+            i_init = -1
+
+        def _shift_phase_advances(data):
+            data['muzeta'] += init.muzeta - data['muzeta'][i_init]
+            if 'mux' in data:
+                data['mux'] += init.mux - data['mux'][i_init]
+                data['muy'] += init.muy - data['muy'][i_init]
+        _apply_to_columns(twiss_res, ['muzeta', 'mux', 'muy'],
+                          _shift_phase_advances)
+        twiss_res.dzeta += init.dzeta - twiss_res.dzeta[i_init]
 
     if search_for_t_rev:
         twiss_res._data['T_rev'] = twiss_res.T_rev0 - (
@@ -757,8 +875,14 @@ def twiss_line(line, particle_ref=None, method=None,
         tw_mt._data['_tw0'] = twiss_res
         twiss_res = tw_mt
 
-    if at_elements is not None:
-        twiss_res = twiss_res[:, at_elements]
+    if at_element_indices is not None:
+        twiss_res = twiss_res.rows[at_elements_names]
+    elif at_elements is not None:
+        if isinstance(at_elements, str):
+            at_elements = [at_elements]
+        twiss_res = twiss_res.rows[[
+            ee if isinstance(ee, str) else twiss_res.name[ee]
+            for ee in at_elements]]
 
     return _add_action_in_res(twiss_res, input_kwargs)
 
@@ -775,14 +899,147 @@ def _twiss_open(line, init,
                       _keep_tracking_data=False,
                       _keep_initial_particles=False,
                       _initial_particles=None,
-                      _ebe_monitor=None):
+                      _ebe_monitor=None,
+                      _incremental=False,
+                      _at_element_indices=None):
+
+    init, start, end, twiss_orientation = _prepare_twiss_open_range(
+                                                        line, init, start, end)
+    particle_on_co = init.particle_on_co
+
+    if _initial_particles is not None: # used in match
+        part_for_twiss = _initial_particles.copy()
+        scale_eigen = _scale_eigen_for_twiss(particle_on_co, nemitt_x,
+                                             nemitt_y, r_sigma, delta_disp)
+    else:
+        part_for_twiss, scale_eigen = _build_particles_for_twiss(
+            line, init, start, end, twiss_orientation,
+            nemitt_x, nemitt_y, r_sigma, delta_disp)
+
+    part_for_twiss.at_turn = AT_TURN_FOR_TWISS # To avoid writing in monitors
+
+    if _keep_initial_particles:
+        part_for_twiss0 = part_for_twiss.copy()
+
+    name_co = None
+    if _at_element_indices is not None and twiss_orientation == 'forward':
+        i_start, i_stop, record, name_co = _track_particles_for_twiss_sparse(
+            line, part_for_twiss, start, end, _at_element_indices)
+    elif (_incremental and twiss_orientation == 'forward'
+            and not _continue_if_lost and not _keep_tracking_data
+            and _ebe_monitor is None and isinstance(line._context, xo.ContextCpu)):
+        i_start, i_stop, record = _track_particles_for_twiss_incremental(
+            line, part_for_twiss, start, end)
+    else:
+        if _ebe_monitor is not None:
+            _monitor = _ebe_monitor
+        elif hasattr(line.tracker._tracker_data_base, '_reusable_ebe_monitor_for_twiss'):
+            _monitor = line.tracker._tracker_data_base._reusable_ebe_monitor_for_twiss
+        else:
+            _monitor = 'ONE_TURN_EBE'
+
+        i_start, i_stop = _track_particles_for_twiss(
+            line, part_for_twiss, _monitor, start, end, twiss_orientation,
+            _continue_if_lost)
+
+        # We keep the monitor to speed up future calls (attached to tracker data
+        # so that it is trashed if number of elements changes)
+        line.tracker._tracker_data_base._reusable_ebe_monitor_for_twiss = line.record_last_track
+        record = line.record_last_track
+
+    twiss_res = _twiss_table_from_record(
+        line, record, i_part=0, i_start=i_start, i_stop=i_stop,
+        scale_eigen=scale_eigen, particle_on_co=particle_on_co,
+        twiss_orientation=twiss_orientation,
+        use_full_inverse=use_full_inverse,
+        hide_thin_groups=hide_thin_groups,
+        only_markers=only_markers,
+        only_orbit=only_orbit,
+        compute_lattice_functions=compute_lattice_functions,
+        _continue_if_lost=_continue_if_lost,
+        _keep_tracking_data=_keep_tracking_data,
+        name_co=name_co)
+
+    if _keep_initial_particles:
+        twiss_res._data['_initial_particles'] = part_for_twiss0.copy()
+
+    return twiss_res
+
+
+def _twiss_open_multi(line, inits,
+                      start, end,
+                      nemitt_x, nemitt_y, r_sigma,
+                      delta_disp, zeta_disp,
+                      use_full_inverse,
+                      hide_thin_groups=False,
+                      only_markers=False,
+                      only_orbit=False,
+                      compute_lattice_functions=True,
+                      _continue_if_lost=False):
+
+    """
+    Same as `_twiss_open` for several initial conditions (e.g. different
+    momentum offsets) over the same range. The probe particles of all initial
+    conditions are tracked together in a single pass and the result is split
+    into one TwissTable per initial condition.
+    """
+
+    parts = []
+    scales = []
+    orientations = []
+    for init in inits:
+        init, start_ii, end_ii, twiss_orientation = _prepare_twiss_open_range(
+                                                        line, init, start, end)
+        part, scale_eigen = _build_particles_for_twiss(
+            line, init, start_ii, end_ii, twiss_orientation,
+            nemitt_x, nemitt_y, r_sigma, delta_disp)
+        parts.append((part, init.particle_on_co))
+        scales.append(scale_eigen)
+        orientations.append(twiss_orientation)
+
+    assert len(set(orientations)) == 1, (
+        'All initial conditions must be at the same end of the range')
+
+    num_probes = parts[0][0]._capacity
+    part_for_twiss = xt.Particles.merge([pp for pp, _ in parts])
+    part_for_twiss.particle_id = np.arange(part_for_twiss._capacity)
+    part_for_twiss.at_turn = AT_TURN_FOR_TWISS # To avoid writing in monitors
+
+    # Reusable monitors are kept per number of particles
+    tracker_data = line.tracker._tracker_data_base
+    if not hasattr(tracker_data, '_reusable_ebe_monitors_for_twiss_multi'):
+        tracker_data._reusable_ebe_monitors_for_twiss_multi = {}
+    monitors = tracker_data._reusable_ebe_monitors_for_twiss_multi
+    _monitor = monitors.get(part_for_twiss._capacity, 'ONE_TURN_EBE')
+
+    i_start, i_stop = _track_particles_for_twiss(
+        line, part_for_twiss, _monitor, start_ii, end_ii, orientations[0],
+        _continue_if_lost)
+    monitors[part_for_twiss._capacity] = line.record_last_track
+
+    out = []
+    for ii, ((_, particle_on_co), scale_eigen) in enumerate(zip(parts, scales)):
+        out.append(_twiss_table_from_record(
+            line, line.record_last_track, i_part=ii * num_probes,
+            i_start=i_start, i_stop=i_stop,
+            scale_eigen=scale_eigen, particle_on_co=particle_on_co,
+            twiss_orientation=orientations[0],
+            use_full_inverse=use_full_inverse,
+            hide_thin_groups=hide_thin_groups,
+            only_markers=only_markers,
+            only_orbit=only_orbit,
+            compute_lattice_functions=compute_lattice_functions,
+            _continue_if_lost=_continue_if_lost,
+            _keep_tracking_data=False))
+
+    return out
+
+
+def _prepare_twiss_open_range(line, init, start, end):
 
     if init.reference_frame == 'reverse':
         init = init.reverse()
 
-    particle_on_co = init.particle_on_co
-    W_matrix = init.W_matrix
-
     if start is not None and end is None:
         raise ValueError('end must be specified if start is not None')
 
@@ -810,7 +1067,11 @@ def _twiss_open(line, init,
         raise ValueError(
             '`init` must be given at the start or end of the specified element range.')
 
-    ctx2np = line._context.nparray_from_context_array
+    return init, start, end, twiss_orientation
+
+
+def _scale_eigen_for_twiss(particle_on_co, nemitt_x, nemitt_y, r_sigma,
+                           delta_disp):
 
     gemitt_x = nemitt_x/particle_on_co._xobject.beta0[0]/particle_on_co._xobject.gamma0[0]
     gemitt_y = nemitt_y/particle_on_co._xobject.beta0[0]/particle_on_co._xobject.gamma0[0]
@@ -819,56 +1080,60 @@ def _twiss_open(line, init,
     scale_longitudinal = delta_disp
     scale_eigen = min(scale_transverse_x, scale_transverse_y, scale_longitudinal)
 
-    context = line._context
-    if _initial_particles is not None: # used in match
-        part_for_twiss = _initial_particles.copy()
-    else:
-        import xpart
-        part_for_twiss = xpart.build_particles(_context=context,
-            particle_ref=particle_on_co, mode='shift',
-            x     = [0] + list(W_matrix[0, :] * -scale_eigen) + list(W_matrix[0, :] * scale_eigen),
-            px    = [0] + list(W_matrix[1, :] * -scale_eigen) + list(W_matrix[1, :] * scale_eigen),
-            y     = [0] + list(W_matrix[2, :] * -scale_eigen) + list(W_matrix[2, :] * scale_eigen),
-            py    = [0] + list(W_matrix[3, :] * -scale_eigen) + list(W_matrix[3, :] * scale_eigen),
-            zeta  = [0] + list(W_matrix[4, :] * -scale_eigen) + list(W_matrix[4, :] * scale_eigen),
-            pzeta = [0] + list(W_matrix[5, :] * -scale_eigen) + list(W_matrix[5, :] * scale_eigen),
-            )
+    return scale_eigen
 
-        if twiss_orientation == 'forward':
-            part_for_twiss.at_element = start
-            part_for_twiss.s = line.tracker._tracker_data_base.element_s_locations[start]
-        elif twiss_orientation == 'backward':
-            part_for_twiss.at_element = end + 1 # to include the last element
-            part_for_twiss.s = line.tracker._tracker_data_base.element_s_locations[end]
-        else:
-            raise ValueError('Invalid twiss_orientation')
 
-    part_for_twiss.at_turn = AT_TURN_FOR_TWISS # To avoid writing in monitors
+def _build_particles_for_twiss(line, init, start, end, twiss_orientation,
+                               nemitt_x, nemitt_y, r_sigma, delta_disp):
 
-    if _keep_initial_particles:
-        part_for_twiss0 = part_for_twiss.copy()
+    particle_on_co = init.particle_on_co
+    W_matrix = init.W_matrix
 
-    if _ebe_monitor is not None:
-        _monitor = _ebe_monitor
-    elif hasattr(line.tracker._tracker_data_base, '_reusable_ebe_monitor_for_twiss'):
-        _monitor = line.tracker._tracker_data_base._reusable_ebe_monitor_for_twiss
+    scale_eigen = _scale_eigen_for_twiss(particle_on_co, nemitt_x, nemitt_y,
+                                         r_sigma, delta_disp)
+
+    import xpart
+    part_for_twiss = xpart.build_particles(_context=line._context,
+        particle_ref=particle_on_co, mode='shift',
+        x     = [0] + list(W_matrix[0, :] * -scale_eigen) + list(W_matrix[0, :] * scale_eigen),
+        px    = [0] + list(W_matrix[1, :] * -scale_eigen) + list(W_matrix[1, :] * scale_eigen),
+        y     = [0] + list(W_matrix[2, :] * -scale_eigen) + list(W_matrix[2, :] * scale_eigen),
+        py    = [0] + list(W_matrix[3, :] * -scale_eigen) + list(W_matrix[3, :] * scale_eigen),
+        zeta  = [0] + list(W_matrix[4, :] * -scale_eigen) + list(W_matrix[4, :] * scale_eigen),
+        pzeta = [0] + list(W_matrix[5, :] * -scale_eigen) + list(W_matrix[5, :] * scale_eigen),
+        )
+
+    if twiss_orientation == 'forward':
+        part_for_twiss.at_element = start
+        part_for_twiss.s = line.tracker._tracker_data_base.element_s_locations[start]
+    elif twiss_orientation == 'backward':
+        part_for_twiss.at_element = end + 1 # to include the last element
+        part_for_twiss.s = line.tracker._tracker_data_base.element_s_locations[end]
     else:
-        _monitor = 'ONE_TURN_EBE'
+        raise ValueError('Invalid twiss_orientation')
+
+    return part_for_twiss, scale_eigen
+
+
+def _track_particles_for_twiss(line, part_for_twiss, monitor, start, end,
+                               twiss_orientation, _continue_if_lost,
+                               ele_start_track=None):
+
+    ctx2np = line._context.nparray_from_context_array
+
+    if ele_start_track is None:
+        ele_start_track = start
 
     if end is None:
         ele_stop_track = None
     else:
         ele_stop_track = end + 1 # to include the last element
 
-    line.track(part_for_twiss, turn_by_turn_monitor=_monitor,
-                ele_start=start,
+    line.track(part_for_twiss, turn_by_turn_monitor=monitor,
+                ele_start=ele_start_track,
                 ele_stop=ele_stop_track,
                 backtrack=(twiss_orientation == 'backward'))
 
-    # We keep the monitor to speed up future calls (attached to tracker data
-    # so that it is trashed if number of elements changes)
-    line.tracker._tracker_data_base._reusable_ebe_monitor_for_twiss = line.record_last_track
-
     if not _continue_if_lost:
         assert np.all(ctx2np(part_for_twiss.state) == 1), (
             'Some test particles were lost during twiss! '
@@ -887,58 +1152,223 @@ def _twiss_open(line, init,
         else:
             i_stop = len(line.element_names) - 1
 
-    recorded_state = line.record_last_track.state[:, i_start:i_stop+1].copy()
+    if line.record_last_track.ebe_mode == 2:
+        # Sparse record (one column per recorded element)
+        recorded_state = line.record_last_track.state.copy()
+    else:
+        recorded_state = line.record_last_track.state[:, i_start:i_stop+1].copy()
     if not _continue_if_lost:
         assert np.all(recorded_state == 1), (
              'Some test particles were lost during twiss! '
           + f'(state {np.unique(recorded_state)}, '
           + f'at element {np.unique(line.record_last_track.at_element[:, i_start:i_stop+1].copy())})')
 
-    x_co = line.record_last_track.x[0, i_start:i_stop+1].copy()
-    y_co = line.record_last_track.y[0, i_start:i_stop+1].copy()
-    px_co = line.record_last_track.px[0, i_start:i_stop+1].copy()
-    py_co = line.record_last_track.py[0, i_start:i_stop+1].copy()
-    zeta_co = line.record_last_track.zeta[0, i_start:i_stop+1].copy()
-    delta_co = np.array(line.record_last_track.delta[0, i_start:i_stop+1].copy())
-    ptau_co = np.array(line.record_last_track.ptau[0, i_start:i_stop+1].copy())
-    s_co = line.record_last_track.s[0, i_start:i_stop+1].copy()
-    kin_px_co = line.record_last_track.kin_px[0, i_start:i_stop+1].copy()
-    kin_py_co = line.record_last_track.kin_py[0, i_start:i_stop+1].copy()
-    kin_ps_co = line.record_last_track.kin_ps[0, i_start:i_stop+1].copy()
-    kin_xprime_co = line.record_last_track.kin_xprime[0, i_start:i_stop+1].copy()
-    kin_yprime_co = line.record_last_track.kin_yprime[0, i_start:i_stop+1].copy()
+    return i_start, i_stop
 
-    Ws = np.zeros(shape=(len(s_co), 6, 6), dtype=np.float64)
-    Ws[:, 0, :] = 0.5 * (line.record_last_track.x[1:7, i_start:i_stop+1] - x_co).T / scale_eigen
-    Ws[:, 1, :] = 0.5 * (line.record_last_track.px[1:7, i_start:i_stop+1] - px_co).T / scale_eigen
-    Ws[:, 2, :] = 0.5 * (line.record_last_track.y[1:7, i_start:i_stop+1] - y_co).T / scale_eigen
-    Ws[:, 3, :] = 0.5 * (line.record_last_track.py[1:7, i_start:i_stop+1] - py_co).T / scale_eigen
-    Ws[:, 4, :] = 0.5 * (line.record_last_track.zeta[1:7, i_start:i_stop+1] - zeta_co).T / scale_eigen
-    Ws[:, 5, :] = 0.5 * (line.record_last_track.ptau[1:7, i_start:i_stop+1] - ptau_co).T / particle_on_co._xobject.beta0[0] / scale_eigen
-
-    Ws[:, 0, :] -= 0.5 * (line.record_last_track.x[7:13, i_start:i_stop+1] - x_co).T / scale_eigen
-    Ws[:, 1, :] -= 0.5 * (line.record_last_track.px[7:13, i_start:i_stop+1] - px_co).T / scale_eigen
-    Ws[:, 2, :] -= 0.5 * (line.record_last_track.y[7:13, i_start:i_stop+1] - y_co).T / scale_eigen
-    Ws[:, 3, :] -= 0.5 * (line.record_last_track.py[7:13, i_start:i_stop+1] - py_co).T / scale_eigen
-    Ws[:, 4, :] -= 0.5 * (line.record_last_track.zeta[7:13, i_start:i_stop+1] - zeta_co).T / scale_eigen
-    Ws[:, 5, :] -= 0.5 * (line.record_last_track.ptau[7:13, i_start:i_stop+1] - ptau_co).T / particle_on_co._xobject.beta0[0] / scale_eigen
-
-    dzeta = (((line.record_last_track.zeta[6, i_start:i_stop+1] - zeta_co).T
-            - (line.record_last_track.zeta[12, i_start:i_stop+1] - zeta_co).T )
-            / ((line.record_last_track.delta[6, i_start:i_stop+1] - delta_co).T
-            - (line.record_last_track.delta[12, i_start:i_stop+1] - delta_co).T))
 
-    dzeta = dzeta - dzeta[0]
+def _sparse_twiss_at_elements(line, at_elements, start, end):
 
-    name_co = np.array(line.element_names[i_start:i_stop] + ('_end_point',))
+    """
+    Indices in the line of the elements to be recorded by an open twiss from
+    `start` to `end` when only `at_elements` (names or indices in the twiss
+    table) are requested, and names of the requested elements. The start of
+    the range is always recorded as reference for the phase advances.
 
-    if only_markers:
-        raise NotImplementedError('only_markers not supported anymore')
+    Returns (None, None) if some of the requested elements are not in the
+    range, in which case the full range is recorded.
+    """
 
-    twiss_res_element_by_element = {}
+    if isinstance(at_elements, str):
+        at_elements = [at_elements]
+
+    i_start = 0 if start is None else _str_to_index(line, start)
+    i_end = (len(line.element_names) - 1 if end is None
+             else _str_to_index(line, end))
+    names_range = line.element_names[i_start:i_end + 1] + ('_end_point',)
+    index_in_range = {nn: ii for ii, nn in enumerate(names_range)}
+
+    names = []
+    for ee in at_elements:
+        if isinstance(ee, str):
+            if ee not in index_in_range:
+                return None, None
+            names.append(ee)
+        else:
+            if not -len(names_range) <= ee < len(names_range):
+                return None, None
+            names.append(names_range[ee])
 
-    twiss_res_element_by_element.update({
-        'name': name_co,
+    at_element_indices = np.unique(
+        [i_start] + [i_start + index_in_range[nn] for nn in names])
+
+    return at_element_indices, names
+
+
+def _track_particles_for_twiss_sparse(line, part_for_twiss, start, end,
+                                      at_element_indices):
+
+    """
+    Same as `_track_particles_for_twiss` (forward only), recording the twiss
+    particles only at the given elements (sparse element-by-element
+    monitor).
+
+    Returns i_start, i_stop (columns of the record), the monitor holding the
+    record and the names of the recorded elements.
+    """
+
+    tracker_data = line.tracker._tracker_data_base
+    monitor = getattr(tracker_data, '_reusable_sparse_ebe_monitor_for_twiss',
+                      None)
+    if (monitor is None
+            or monitor.part_id_end - monitor.part_id_start
+                != part_for_twiss._capacity
+            or not np.array_equal(monitor.ebe_at_elements.to_nplike(),
+                                  at_element_indices)):
+        monitor = line.tracker.particles_monitor_class(
+            _context=line._context, at_elements=at_element_indices,
+            num_particles=part_for_twiss._capacity)
+        # Attached to tracker data so that it is trashed if the line changes
+        tracker_data._reusable_sparse_ebe_monitor_for_twiss = monitor
+
+    _, i_stop = _track_particles_for_twiss(
+        line, part_for_twiss, monitor, start, end, 'forward',
+        _continue_if_lost=False)
+
+    # The end of the range is recorded at the index following the last element
+    name_co = np.array([
+        '_end_point' if ii == i_stop else line.element_names[ii]
+        for ii in at_element_indices])
+
+    return 0, len(at_element_indices) - 1, monitor, name_co
+
+
+class _IncrementalTwissState:
+
+    """
+    Element-by-element record of the last twiss over a given range, from
+    which the tracking of the next twiss is restarted at the first element
+    modified in the meantime.
+    """
+
+    def __init__(self, line):
+        from .linear_map_cache import ElementBufferSnapshot
+        self.monitor = None
+        self.i_stop = None
+        self.snapshot = ElementBufferSnapshot(line)
+        self.num_tracked_elements = 0
+        self.num_skipped_elements = 0
+
+
+def _track_particles_for_twiss_incremental(line, part_for_twiss, start, end):
+
+    """
+    Same as `_track_particles_for_twiss` (forward only), restarting from the
+    record of the previous call with the same range and initial particles at
+    the first element modified since then. Each range has its own monitor so
+    that the record upstream of that element is still valid.
+
+    Returns i_start, i_stop and the monitor holding the record.
+    """
+
+    tracker_data = line.tracker._tracker_data_base
+    if tracker_data.cache.get('incremental_twiss') is None:
+        tracker_data.cache['incremental_twiss'] = {}
+    states = tracker_data.cache['incremental_twiss']
+
+    key = (start, end, part_for_twiss._capacity,
+           line.tracker._hashable_config())
+    if key not in states:
+        if len(states) >= MAX_INCREMENTAL_TWISS_STATES:
+            states.pop(next(iter(states))) # Drop the oldest
+        states[key] = _IncrementalTwissState(line)
+    state = states[key]
+
+    i_restart = start
+    if (state.monitor is not None
+            and _same_initial_particles(state.monitor, part_for_twiss, start)):
+        i_end = len(line.element_names) - 1 if end is None else end
+        modified = state.snapshot.modified_elements()
+        modified = modified[(modified >= start) & (modified <= i_end)]
+        i_restart = int(modified[0]) if len(modified) > 0 else None
+
+    if i_restart is None:
+        # Nothing changed in the range since the previous call
+        i_stop = state.i_stop
+        state.num_skipped_elements += i_stop - start
+    else:
+        if i_restart > start:
+            # Restart from the state recorded at the entrance of the element
+            with part_for_twiss._bypass_linked_vars():
+                for _, nn in xt.Particles.per_particle_vars:
+                    getattr(part_for_twiss, nn)[:] = getattr(
+                                            state.monitor, nn)[:, i_restart]
+        _, i_stop = _track_particles_for_twiss(
+            line, part_for_twiss, state.monitor or 'ONE_TURN_EBE',
+            start, end, 'forward', _continue_if_lost=False,
+            ele_start_track=i_restart)
+        state.monitor = line.record_last_track
+        state.i_stop = i_stop
+        state.num_skipped_elements += i_restart - start
+        state.num_tracked_elements += i_stop - i_restart
+
+    state.snapshot.update()
+
+    return start, i_stop, state.monitor
+
+
+def _same_initial_particles(monitor, particles, i_start):
+    ctx2np = particles._context.nparray_from_context_array
+    for nn in ['x', 'px', 'y', 'py', 'zeta', 'ptau', 's', 'p0c']:
+        if not np.array_equal(getattr(monitor, nn)[:, i_start],
+                              ctx2np(getattr(particles, nn))):
+            return False
+    return True
+
+
+def _orbit_and_w_matrix_from_record(record, i_part, i_start, i_stop,
+                                    scale_eigen, beta0):
+
+    # Rows of the record: closed orbit (i0), -W columns (i0+1 to i0+6),
+    # +W columns (i0+7 to i0+12)
+    i0 = i_part
+    i_minus = slice(i0 + 1, i0 + 7)
+    i_plus = slice(i0 + 7, i0 + 13)
+
+    x_co = record.x[i0, i_start:i_stop+1].copy()
+    y_co = record.y[i0, i_start:i_stop+1].copy()
+    px_co = record.px[i0, i_start:i_stop+1].copy()
+    py_co = record.py[i0, i_start:i_stop+1].copy()
+    zeta_co = record.zeta[i0, i_start:i_stop+1].copy()
+    delta_co = np.array(record.delta[i0, i_start:i_stop+1].copy())
+    ptau_co = np.array(record.ptau[i0, i_start:i_stop+1].copy())
+    s_co = record.s[i0, i_start:i_stop+1].copy()
+    kin_px_co = record.kin_px[i0, i_start:i_stop+1].copy()
+    kin_py_co = record.kin_py[i0, i_start:i_stop+1].copy()
+    kin_ps_co = record.kin_ps[i0, i_start:i_stop+1].copy()
+    kin_xprime_co = record.kin_xprime[i0, i_start:i_stop+1].copy()
+    kin_yprime_co = record.kin_yprime[i0, i_start:i_stop+1].copy()
+
+    Ws = np.zeros(shape=(len(s_co), 6, 6), dtype=np.float64)
+    Ws[:, 0, :] = 0.5 * (record.x[i_minus, i_start:i_stop+1] - x_co).T / scale_eigen
+    Ws[:, 1, :] = 0.5 * (record.px[i_minus, i_start:i_stop+1] - px_co).T / scale_eigen
+    Ws[:, 2, :] = 0.5 * (record.y[i_minus, i_start:i_stop+1] - y_co).T / scale_eigen
+    Ws[:, 3, :] = 0.5 * (record.py[i_minus, i_start:i_stop+1] - py_co).T / scale_eigen
+    Ws[:, 4, :] = 0.5 * (record.zeta[i_minus, i_start:i_stop+1] - zeta_co).T / scale_eigen
+    Ws[:, 5, :] = 0.5 * (record.ptau[i_minus, i_start:i_stop+1] - ptau_co).T / beta0 / scale_eigen
+
+    Ws[:, 0, :] -= 0.5 * (record.x[i_plus, i_start:i_stop+1] - x_co).T / scale_eigen
+    Ws[:, 1, :] -= 0.5 * (record.px[i_plus, i_start:i_stop+1] - px_co).T / scale_eigen
+    Ws[:, 2, :] -= 0.5 * (record.y[i_plus, i_start:i_stop+1] - y_co).T / scale_eigen
+    Ws[:, 3, :] -= 0.5 * (record.py[i_plus, i_start:i_stop+1] - py_co).T / scale_eigen
+    Ws[:, 4, :] -= 0.5 * (record.zeta[i_plus, i_start:i_stop+1] - zeta_co).T / scale_eigen
+    Ws[:, 5, :] -= 0.5 * (record.ptau[i_plus, i_start:i_stop+1] - ptau_co).T / beta0 / scale_eigen
+
+    dzeta = (((record.zeta[i0 + 6, i_start:i_stop+1] - zeta_co).T
+            - (record.zeta[i0 + 12, i_start:i_stop+1] - zeta_co).T )
+            / ((record.delta[i0 + 6, i_start:i_stop+1] - delta_co).T
+            - (record.delta[i0 + 12, i_start:i_stop+1] - delta_co).T))
+
+    orbit = {
         's': s_co,
         'x': x_co,
         'px': px_co,
@@ -947,43 +1377,100 @@ def _twiss_open(line, init,
         'zeta': zeta_co,
         'delta': delta_co,
         'ptau': ptau_co,
-        'W_matrix': Ws,
         'kin_px': kin_px_co,
         'kin_py': kin_py_co,
         'kin_ps': kin_ps_co,
         'kin_xprime': kin_xprime_co,
         'kin_yprime': kin_yprime_co,
+    }
+
+    return orbit, Ws, dzeta
+
+
+def _twiss_table_from_record(line, record, i_part, i_start, i_stop,
+                             scale_eigen, particle_on_co, twiss_orientation,
+                             use_full_inverse, hide_thin_groups,
+                             only_markers, only_orbit,
+                             compute_lattice_functions,
+                             _continue_if_lost, _keep_tracking_data,
+                             name_co=None):
+
+    orbit, Ws, dzeta = _orbit_and_w_matrix_from_record(
+        record, i_part=i_part, i_start=i_start, i_stop=i_stop,
+        scale_eigen=scale_eigen, beta0=particle_on_co._xobject.beta0[0])
+    s_co = orbit['s']
+
+    dzeta = dzeta - dzeta[0]
+
+    if name_co is None:
+        name_co = np.array(
+            line.element_names[i_start:i_stop] + ('_end_point',))
+
+    if only_markers:
+        raise NotImplementedError('only_markers not supported anymore')
+
+    twiss_res_element_by_element = {}
+
+    twiss_res_element_by_element.update({
+        'name': name_co,
+        's': orbit['s'],
+        'x': orbit['x'],
+        'px': orbit['px'],
+        'y': orbit['y'],
+        'py': orbit['py'],
+        'zeta': orbit['zeta'],
+        'delta': orbit['delta'],
+        'ptau': orbit['ptau'],
+        'W_matrix': Ws,
+        'kin_px': orbit['kin_px'],
+        'kin_py': orbit['kin_py'],
+        'kin_ps': orbit['kin_ps'],
+        'kin_xprime': orbit['kin_xprime'],
+        'kin_yprime': orbit['kin_yprime'],
     })
 
+    lattice_functions_group = None
     if not only_orbit and compute_lattice_functions:
-        lattice_functions, i_replace = _compute_lattice_functions(Ws, use_full_inverse, s_co)
-        twiss_res_element_by_element.update(lattice_functions)
+        if hide_thin_groups:
+            lattice_functions, i_replace = _compute_lattice_functions(Ws, use_full_inverse, s_co)
+            twiss_res_element_by_element.update(lattice_functions)
+        else:
+            # Computed from the W matrix only when first accessed
+            # (Ws is rotated in place to the Courant-Snyder basis)
+            s_lattice = s_co.copy()
+            lattice_functions_group = _LazyColumnGroup(
+                lambda: _compute_lattice_functions(
+                            Ws, use_full_inverse, s_lattice)[0])
+            twiss_res_element_by_element.update(
+                dict.fromkeys(COLUMNS_LATTICE_FUNCTIONS))
 
     twiss_res_element_by_element['dzeta'] = dzeta
 
     extra_data = {}
     extra_data['only_markers'] = only_markers
     if _keep_tracking_data:
-        extra_data['tracking_data'] = line.record_last_track.copy()
-
-    if _keep_initial_particles:
-        extra_data['_initial_particles'] = part_for_twiss0.copy()
+        extra_data['tracking_data'] = record.copy()
 
     if hide_thin_groups:
-        _vars_hide_changes = [
-        'x', 'px', 'y', 'py', 'zeta', 'delta', 'ptau',
-        'betx', 'bety', 'alfx', 'alfy', 'gamx', 'gamy',
-        'betx1', 'bety1', 'betx2', 'bety2',
-        'dx', 'dpx', 'dy', 'dzeta', 'dpy',
-        ]
-
-        for key in _vars_hide_changes:
+        for key in VARS_HIDE_THIN_GROUPS:
             if key in twiss_res_element_by_element:
                 twiss_res_element_by_element[key][i_replace] = np.nan
 
     twiss_res_element_by_element['name'] = np.array(twiss_res_element_by_element['name'])
 
+    if lattice_functions_group is not None:
+        col_names = list(twiss_res_element_by_element.keys())
+        for kk in COLUMNS_LATTICE_FUNCTIONS:
+            twiss_res_element_by_element.pop(kk)
+
     twiss_res = TwissTable(data=twiss_res_element_by_element)
+
+    if lattice_functions_group is not None:
+        twiss_res._data = _LazyTwissData(twiss_res._data,
+            pending=dict.fromkeys(COLUMNS_LATTICE_FUNCTIONS,
+                                  lattice_functions_group))
+        twiss_res._col_names = col_names
+
     twiss_res._data.update(extra_data)
 
     twiss_res._data['particle_on_co'] = particle_on_co.copy(_context=xo.context_default)
@@ -1190,39 +1677,56 @@ def _compute_chromatic_functions(line, init, delta_chrom, steps_r_matrix,
                     start=None, end=None, num_turns=None,
                     hide_thin_groups=False,
                     only_markers=False,
-                    periodic=False):
+                    periodic=False,
+                    _multi_delta=None):
 
     if only_markers:
         raise NotImplementedError('only_markers not supported anymore')
 
-    tw_chrom_res = []
-    for dd in [-delta_chrom, delta_chrom]:
-        tw_init_chrom = init.copy()
-
-        if periodic:
-            import xpart
-            part_guess = xpart.build_particles(
+    if _multi_delta is not None:
+        # Already computed together with the on-momentum twiss
+        tw_chrom_res = _multi_delta.get_twiss_chrom()
+        inits_chrom = None
+    elif periodic:
+        import xpart
+        part_guesses = []
+        for dd in [-delta_chrom, delta_chrom]:
+            part_guesses.append(xpart.build_particles(
                 _context=line._context,
                 x_norm=0,
-                zeta=tw_init_chrom.zeta,
-                delta=tw_init_chrom.delta+ dd,
+                zeta=init.zeta,
+                delta=init.delta+ dd,
                 particle_on_co=on_momentum_twiss_res.particle_on_co.copy(),
                 nemitt_x=nemitt_x, nemitt_y=nemitt_y,
-                W_matrix=tw_init_chrom.W_matrix)
-            part_chrom = line.find_closed_orbit(delta0=dd, co_guess=part_guess,
+                W_matrix=init.W_matrix))
+        if line.energy_program is None:
+            # The two closed orbits and R matrices are computed together
+            parts_chrom, RRs_chrom = _find_closed_orbit_multi(line,
+                                    part_guesses,
+                                    delta0=[-delta_chrom, delta_chrom],
+                                    steps_r_matrix=steps_r_matrix,
                                     start=start, end=end, num_turns=num_turns)
-            tw_init_chrom.particle_on_co = part_chrom
-            RR_chrom = line.compute_one_turn_matrix_finite_differences(
-                                        particle_on_co=tw_init_chrom.particle_on_co.copy(),
-                                        start=start, end=end, num_turns=num_turns,
-                                        steps_r_matrix=steps_r_matrix)['R_matrix']
-            (WW_chrom, _, _, _) = lnf.compute_linear_normal_form(RR_chrom,
-                                    only_4d_block=method=='4d',
-                                    responsiveness_tol=matrix_responsiveness_tol,
-                                    stability_tol=matrix_stability_tol,
-                                    symplectify=symplectify)
-            tw_init_chrom.W_matrix = WW_chrom
         else:
+            parts_chrom = []
+            RRs_chrom = []
+            for dd, part_guess in zip([-delta_chrom, delta_chrom], part_guesses):
+                part_chrom = line.find_closed_orbit(delta0=dd, co_guess=part_guess,
+                                        start=start, end=end, num_turns=num_turns)
+                parts_chrom.append(part_chrom)
+                RRs_chrom.append(line.compute_one_turn_matrix_finite_differences(
+                                        particle_on_co=part_chrom.copy(),
+                                        start=start, end=end, num_turns=num_turns,
+                                        steps_r_matrix=steps_r_matrix)['R_matrix'])
+        inits_chrom = [
+            _chromatic_init_periodic(init, part_chrom, RR_chrom, method=method,
+                        matrix_responsiveness_tol=matrix_responsiveness_tol,
+                        matrix_stability_tol=matrix_stability_tol,
+                        symplectify=symplectify)
+            for part_chrom, RR_chrom in zip(parts_chrom, RRs_chrom)]
+    else:
+        inits_chrom = []
+        for dd in [-delta_chrom, delta_chrom]:
+            tw_init_chrom = init.copy()
             alfx = init.alfx
             betx = init.betx
             alfy = init.alfy
@@ -1263,10 +1767,13 @@ def _compute_chromatic_functions(line, init, delta_chrom, steps_r_matrix,
             twinit_aux._complete(line, element_name=init.element_name)
             tw_init_chrom.W_matrix = twinit_aux.W_matrix
 
-        tw_chrom_res.append(
-            _twiss_open(
+            inits_chrom.append(tw_init_chrom)
+
+    if inits_chrom is not None:
+        # The two off-momentum twiss are tracked together
+        tw_chrom_res = _twiss_open_multi(
                 line=line,
-                init=tw_init_chrom,
+                inits=inits_chrom,
                 start=start, end=end,
                 nemitt_x=nemitt_x,
                 nemitt_y=nemitt_y,
@@ -1276,11 +1783,7 @@ def _compute_chromatic_functions(line, init, delta_chrom, steps_r_matrix,
                 use_full_inverse=use_full_inverse,
                 hide_thin_groups=hide_thin_groups,
                 only_markers=only_markers,
-                _continue_if_lost=False,
-                _keep_tracking_data=False,
-                _keep_initial_particles=False,
-                _initial_particles=None,
-                _ebe_monitor=None))
+                _continue_if_lost=False)
 
     dmux = (tw_chrom_res[1].mux - tw_chrom_res[0].mux)/(2*delta_chrom)
     dmuy = (tw_chrom_res[1].muy - tw_chrom_res[0].muy)/(2*delta_chrom)
@@ -1340,6 +1843,20 @@ def _compute_chromatic_functions(line, init, delta_chrom, steps_r_matrix,
     return cols_chrom, scalars_chrom
 
 
+def _chromatic_init_periodic(init, part_chrom, RR_chrom, method,
+                             matrix_responsiveness_tol, matrix_stability_tol,
+                             symplectify):
+    tw_init_chrom = init.copy()
+    tw_init_chrom.particle_on_co = part_chrom
+    (WW_chrom, _, _, _) = lnf.compute_linear_normal_form(RR_chrom,
+                            only_4d_block=method=='4d',
+                            responsiveness_tol=matrix_responsiveness_tol,
+                            stability_tol=matrix_stability_tol,
+                            symplectify=symplectify)
+    tw_init_chrom.W_matrix = WW_chrom
+    return tw_init_chrom
+
+
 def _compute_eneloss_and_damping_rates(particle_on_co, R_matrix,
                                        px_co, py_co, ptau_co, W_matrix,
                                        T_rev0, line, radiation_method):
@@ -1672,6 +2189,80 @@ def _compute_equilibrium_emittance_full(px_co, py_co, ptau_co, R_matrix_ebe,
 class ClosedOrbitSearchError(Exception):
     pass
 
+
+class _ClosedOrbitCache:
+
+    """
+    Last closed orbit found for a given search configuration, used as
+    starting point of the next search (enabled with
+    `line.enable_closed_orbit_cache = True`). The stored orbit is not used
+    if the reference particle changed or if too many elements were modified
+    since it was found, and the search is repeated from the default guess
+    if it fails starting from the stored orbit.
+    """
+
+    def __init__(self, line):
+        from .linear_map_cache import ElementBufferSnapshot
+        self.line = line
+        self.particle_on_co = None
+        self.jacobian = None
+        self._reference = None
+        self._snapshot = ElementBufferSnapshot(line)
+
+        self.num_warm_starts = 0
+        self.num_cold_starts = 0
+        self.num_fallbacks = 0
+
+    def get_guess(self, particle_ref):
+        """
+        Return the stored closed orbit to be used as `co_guess`, or None if
+        it is missing or stale.
+        """
+        if (self.particle_on_co is None or particle_ref is None
+                or _reference_of(particle_ref) != self._reference):
+            self.num_cold_starts += 1
+            return None
+
+        num_elements = len(self.line.tracker._tracker_data_base.element_names)
+        num_modified = len(self._snapshot.modified_elements())
+        if num_modified > MAX_FRACTION_MODIFIED_ELEMENTS_CO_GUESS * num_elements:
+            self.num_cold_starts += 1
+            return None
+
+        self.num_warm_starts += 1
+        guess = self.particle_on_co.copy()
+        guess._co_search_jacobian = self.jacobian
+        return guess
+
+    def update(self, particle_on_co, particle_ref):
+        """
+        Store the closed orbit found with reference particle `particle_ref`.
+        """
+        self.particle_on_co = particle_on_co.copy()
+        self.jacobian = getattr(particle_on_co, '_co_search_jacobian', None)
+        self._reference = (_reference_of(particle_ref)
+                           if particle_ref is not None else None)
+        self._snapshot.update()
+
+
+def _reference_of(particle_ref):
+    return (float(particle_ref._xobject.p0c[0]),
+            float(particle_ref._xobject.mass0),
+            float(particle_ref._xobject.q0))
+
+
+def _get_closed_orbit_cache(line, method, delta0, zeta0, start, end,
+                            num_turns):
+    caches = line.tracker._tracker_data_base.cache
+    if caches.get('closed_orbit') is None:
+        caches['closed_orbit'] = {}
+    key = (method, delta0, zeta0, start, end, num_turns,
+           line.tracker._hashable_config())
+    if key not in caches['closed_orbit']:
+        caches['closed_orbit'][key] = _ClosedOrbitCache(line)
+    return caches['closed_orbit'][key]
+
+
 def _find_periodic_solution(line, particle_on_co, particle_ref, method,
                             co_search_settings, continue_on_closed_orbit_error,
                             delta0, zeta0, steps_r_matrix, W_matrix,
@@ -1708,8 +2299,13 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
     else:
         if search_for_t_rev:
             assert method == '6d', 'search_for_t_rev possible when `method` is "6d"'
-        part_on_co = line.find_closed_orbit(
-                                co_guess=co_guess,
+        if (co_search_settings is not None
+                and co_search_settings.get('solver', None) == 'quasi_newton'):
+            # The one-turn matrix found by the search is reused below
+            co_search_settings = co_search_settings.copy()
+            co_search_settings['steps_r_matrix'] = steps_r_matrix
+
+        co_search_kwargs = dict(
                                 particle_ref=particle_ref,
                                 co_search_settings=co_search_settings,
                                 continue_on_closed_orbit_error=continue_on_closed_orbit_error,
@@ -1722,6 +2318,30 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
                                 search_for_t_rev=search_for_t_rev,
                                 num_turns_search_t_rev=num_turns_search_t_rev,
                                 )
+
+        co_cache = None
+        if (line.enable_closed_orbit_cache and co_guess is None
+                and not search_for_t_rev and co_search_at is None
+                and not continue_on_closed_orbit_error):
+            co_cache = _get_closed_orbit_cache(line, method, delta0, zeta0,
+                                               start, end, num_turns)
+            if particle_ref is None:
+                particle_ref = line.particle_ref
+            co_guess = co_cache.get_guess(particle_ref)
+
+        try:
+            part_on_co = line.find_closed_orbit(co_guess=co_guess,
+                                                **co_search_kwargs)
+        except ClosedOrbitSearchError:
+            if co_cache is None or co_guess is None:
+                raise
+            # The cached orbit is too far from the present one
+            co_cache.num_fallbacks += 1
+            part_on_co = line.find_closed_orbit(co_guess=None,
+                                                **co_search_kwargs)
+
+        if co_cache is not None:
+            co_cache.update(part_on_co, particle_ref)
     if only_orbit:
         W_matrix = np.eye(6)
 
@@ -1741,15 +2361,21 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
         else:
             steps_r_matrix['adapted'] = False
             for iter in range(2):
-                RR_out = line.compute_one_turn_matrix_finite_differences(
-                    steps_r_matrix=steps_r_matrix,
-                    particle_on_co=part_on_co,
-                    start=start,
-                    end=end,
-                    num_turns=num_turns,
-                    element_by_element=compute_R_element_by_element,
-                    only_markers=only_markers,
-                    )
+                if (iter == 0 and not compute_R_element_by_element
+                        and _co_search_r_matrix_valid(part_on_co, steps_r_matrix,
+                                                      start)):
+                    RR_out = {'R_matrix': part_on_co._co_search_R_matrix,
+                              'R_matrix_ebe': None}
+                else:
+                    RR_out = line.compute_one_turn_matrix_finite_differences(
+                        steps_r_matrix=steps_r_matrix,
+                        particle_on_co=part_on_co,
+                        start=start,
+                        end=end,
+                        num_turns=num_turns,
+                        element_by_element=compute_R_element_by_element,
+                        only_markers=only_markers,
+                        )
                 RR = RR_out['R_matrix']
                 RR_ebe = RR_out['R_matrix_ebe']
                 if matrix_responsiveness_tol is not None:
@@ -1762,21 +2388,54 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
                             responsiveness_tol=None,
                             stability_tol=None)
 
-                # Estimate beam size (betatron part)
-                gemitt_x = nemitt_x/part_on_co._xobject.beta0[0]/part_on_co._xobject.gamma0[0]
-                gemitt_y = nemitt_y/part_on_co._xobject.beta0[0]/part_on_co._xobject.gamma0[0]
-                betx_at_start = W[0, 0]**2 + W[0, 1]**2
-                bety_at_start = W[2, 2]**2 + W[2, 3]**2
-                sigma_x_start = np.sqrt(betx_at_start * gemitt_x)
-                sigma_y_start = np.sqrt(bety_at_start * gemitt_y)
-
-                if ((steps_r_matrix['dx'] < 0.3 * sigma_x_start)
-                    and (steps_r_matrix['dy'] < 0.3 * sigma_y_start)):
+                if not _adapt_steps_r_matrix(steps_r_matrix, W, part_on_co,
+                                             nemitt_x, nemitt_y):
                     break # sufficient accuracy
-                else:
-                    steps_r_matrix['dx'] = 0.01 * sigma_x_start
-                    steps_r_matrix['dy'] = 0.01 * sigma_y_start
-                    steps_r_matrix['adapted'] = True
+
+    init, RR_ebe = _complete_periodic_solution(line, part_on_co, W, RR, RR_ebe,
+                                        method=method,
+                                        W_matrix_provided=(W_matrix is not None),
+                                        matrix_stability_tol=matrix_stability_tol,
+                                        start=start)
+
+    return init, RR, steps_r_matrix, eigenvalues, Rot, RR_ebe
+
+
+def _co_search_r_matrix_valid(part_on_co, steps_r_matrix, start):
+    # The one-turn matrix obtained by the quasi-Newton closed orbit search is
+    # the one computed by `compute_one_turn_matrix_finite_differences`
+    if getattr(part_on_co, '_co_search_R_matrix', None) is None:
+        return False
+    if start is None and part_on_co._xobject.at_element[0] != 0:
+        return False
+    steps_co = part_on_co._co_search_steps_r_matrix
+    return all(steps_co[nn] == steps_r_matrix[nn] for nn in
+               ['dx', 'dpx', 'dy', 'dpy', 'dzeta', 'ddelta'])
+
+
+def _adapt_steps_r_matrix(steps_r_matrix, W, part_on_co, nemitt_x, nemitt_y):
+
+    # Estimate beam size (betatron part)
+    gemitt_x = nemitt_x/part_on_co._xobject.beta0[0]/part_on_co._xobject.gamma0[0]
+    gemitt_y = nemitt_y/part_on_co._xobject.beta0[0]/part_on_co._xobject.gamma0[0]
+    betx_at_start = W[0, 0]**2 + W[0, 1]**2
+    bety_at_start = W[2, 2]**2 + W[2, 3]**2
+    sigma_x_start = np.sqrt(betx_at_start * gemitt_x)
+    sigma_y_start = np.sqrt(bety_at_start * gemitt_y)
+
+    if ((steps_r_matrix['dx'] < 0.3 * sigma_x_start)
+        and (steps_r_matrix['dy'] < 0.3 * sigma_y_start)):
+        return False # sufficient accuracy
+
+    steps_r_matrix['dx'] = 0.01 * sigma_x_start
+    steps_r_matrix['dy'] = 0.01 * sigma_y_start
+    steps_r_matrix['adapted'] = True
+    return True
+
+
+def _complete_periodic_solution(line, part_on_co, W, RR, RR_ebe, method,
+                                W_matrix_provided, matrix_stability_tol,
+                                start):
 
     # Check on R matrix
     if RR is not None and matrix_stability_tol is not None:
@@ -1789,7 +2448,7 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
         RR_ebe = None
 
 
-    if method == '4d' and W_matrix is None: # the matrix was not provided by the user
+    if method == '4d' and not W_matrix_provided:
 
         # Compute dispersion (MAD-8 manual eq. 6.13, but I needed to flip the sign ?!)
         A_disp = RR[:4, :4]
@@ -1833,7 +2492,7 @@ def _find_periodic_solution(line, particle_on_co, particle_ref, method,
                            ay_chrom=None, by_chrom=None,
                            reference_frame='proper')
 
-    return init, RR, steps_r_matrix, eigenvalues, Rot, RR_ebe
+    return init, RR_ebe
 
 def _handle_loop_around(kwargs):
 
@@ -2048,10 +2707,25 @@ def find_closed_orbit_line(line, co_guess=None, particle_ref=None,
     co_search_settings = co_search_settings.copy()
     if 'xtol' not in co_search_settings.keys():
         co_search_settings['xtol'] = 1e-6 # Relative error between calls
+    if 'tol' not in co_search_settings.keys():
+        co_search_settings['tol'] = DEFAULT_CO_SEARCH_TOL # Error after one turn
+    tol = np.broadcast_to(np.array(co_search_settings['tol'], dtype=float), 6)
+
+    jacobian_guess = getattr(co_guess, '_co_search_jacobian', None)
 
     co_guess = co_guess.copy(
                         _context=line._buffer.context)
 
+    if co_search_settings.get('solver', None) == 'quasi_newton':
+        return _find_closed_orbit_quasi_newton(line, co_guess,
+                    delta_zeta=delta_zeta, delta0=delta0, zeta0=zeta0,
+                    start=start, end=end, num_turns=num_turns,
+                    steps_r_matrix=co_search_settings.get('steps_r_matrix', None),
+                    jacobian=jacobian_guess,
+                    continue_on_closed_orbit_error=continue_on_closed_orbit_error,
+                    tol=tol,
+                    max_iterations=co_search_settings.get('max_iterations', 50))
+
     for shift_factor in [0, 1.]: # if not found at first attempt we shift slightly the starting point
         if shift_factor>0:
             _print('Warning! Need second attempt on closed orbit search')
@@ -2077,7 +2751,7 @@ def find_closed_orbit_line(line, co_guess=None, particle_ref=None,
         if np.all(np.abs(_error_for_co(
                 x0, co_guess, line, delta_zeta, delta0, zeta0,
                 start=start, end=end,
-                num_turns=num_turns)) < DEFAULT_CO_SEARCH_TOL):
+                num_turns=num_turns)) < tol):
             res = x0
             fsolve_info = 'taken_guess'
             ier = 1
@@ -2144,6 +2818,173 @@ def _one_turn_map(p, particle_ref, line, delta_zeta, start, end, num_turns):
            part._xobject.delta[0]])
     return p_res
 
+def _one_turn_map_with_probes(p, particle_ref, line, delta_zeta, start, end,
+                              num_turns, steps_r_matrix):
+
+    """
+    Same as `_one_turn_map`, tracking in the same batch the 12 probes used to
+    compute the one-turn matrix by finite differences. Returns the final
+    coordinates of the particle, the one-turn Jacobian in
+    (x, px, y, py, zeta, delta) and the R matrix in (x, px, y, py, zeta, pzeta).
+    """
+
+    context = line._buffer.context
+
+    part_orbit = particle_ref.copy()
+    part_orbit.x = p[0]
+    part_orbit.px = p[1]
+    part_orbit.y = p[2]
+    part_orbit.py = p[3]
+    part_orbit.zeta = p[4] + delta_zeta
+    part_orbit.delta = p[5]
+
+    part, dpzeta = _build_r_matrix_probes(part_orbit, steps_r_matrix,
+                                          include_orbit=True)
+    part.s[:] = part_orbit._xobject.s[0]
+    part.at_element[:] = part_orbit._xobject.at_element[0]
+    part.at_turn = AT_TURN_FOR_TWISS
+
+    if line.energy_program is not None:
+        dp0c = line.energy_program.get_p0c_increse_per_turn_at_t_s(
+                                                        line.vv['t_turn_s'])
+        part.update_p0c_and_energy_deviations(p0c = part._xobject.p0c[0] + dp0c)
+
+    line.track(part, ele_start=start, ele_stop=end, num_turns=num_turns)
+    state = context.nparray_from_context_array(part.state)
+    if np.any(state < 0):
+        raise ClosedOrbitSearchError(
+            f'Particle lost, p.state = {state[state < 0][0]}')
+
+    coords = np.array([context.nparray_from_context_array(getattr(part, nn))
+                       for nn in ['x', 'px', 'y', 'py', 'zeta', 'delta']])
+    steps = np.array([steps_r_matrix[nn] for nn in
+                      ['dx', 'dpx', 'dy', 'dpy', 'dzeta', 'ddelta']])
+    jacobian = (coords[:, 1:7] - coords[:, 7:13]) / (2 * steps)
+
+    coords_pzeta = coords.copy()
+    coords_pzeta[5, :] = context.nparray_from_context_array(
+                                part.ptau/part.beta0)
+    RR = _r_matrix_from_probes(coords_pzeta[:, 1:], steps_r_matrix, dpzeta)
+
+    return coords[:, 0], jacobian, RR
+
+
+def _find_closed_orbit_quasi_newton(line, co_guess, delta_zeta, delta0, zeta0,
+                                    start, end, num_turns, steps_r_matrix=None,
+                                    jacobian=None,
+                                    continue_on_closed_orbit_error=False,
+                                    tol=DEFAULT_CO_SEARCH_TOL,
+                                    max_iterations=50):
+
+    """
+    Closed orbit search with Newton steps. The Jacobian of the one-turn map
+    is obtained by finite differences, tracking the probes in the same batch
+    as the particle (or taken from `jacobian`, e.g. found by a previous
+    search), and is updated with Broyden's rule in the following iterations,
+    in which only the particle is tracked. New probes are tracked only if
+    the error stops decreasing. The search stops when the difference between
+    the coordinates after and before one turn is below `tol` (one value per
+    coordinate) or after `max_iterations` iterations.
+
+    The returned particle has the one-turn Jacobian at the closed orbit in
+    `_co_search_jacobian` and the one-turn matrix computed with
+    `steps_r_matrix` (as from `compute_one_turn_matrix_finite_differences`)
+    in `_co_search_R_matrix`. The number of tracked turns is given in
+    `_fsolve_info`.
+    """
+
+    steps_r_matrix = _complete_steps_r_matrix_with_default(
+                                                    steps_r_matrix or {})
+
+    pp = np.array([co_guess._xobject.x[0],
+                   co_guess._xobject.px[0],
+                   co_guess._xobject.y[0],
+                   co_guess._xobject.py[0],
+                   co_guess._xobject.zeta[0],
+                   co_guess._xobject.delta[0]])
+    if zeta0 is not None:
+        pp[4] = zeta0
+    if delta0 is not None:
+        pp[5] = delta0
+
+    # With fixed delta0 or zeta0 only the transverse coordinates are searched
+    if delta0 is None and zeta0 is None:
+        i_free = np.arange(6)
+    else:
+        i_free = np.arange(4)
+    tol = np.broadcast_to(np.array(tol, dtype=float), 6)[i_free]
+
+    def _error_jacobian(mm):
+        return (np.eye(6) - mm)[np.ix_(i_free, i_free)]
+
+    jj = None if jacobian is None else _error_jacobian(jacobian)
+    RR = None
+    num_tracks = 0
+    converged = False
+    ff_prev = None
+    dpp = None
+    for iteration in range(max_iterations):
+        if jj is None:
+            p_res, jacobian, RR = _one_turn_map_with_probes(
+                pp, co_guess, line, delta_zeta, start, end, num_turns,
+                steps_r_matrix)
+            jj = _error_jacobian(jacobian)
+        else:
+            p_res = _one_turn_map(pp, co_guess, line, delta_zeta, start, end,
+                                  num_turns)
+            RR = None
+        num_tracks += 1
+
+        ff = (pp - p_res)[i_free]
+        if not np.all(np.isfinite(ff)):
+            break
+
+        if np.all(np.abs(ff) < tol):
+            converged = True
+            break
+
+        if ff_prev is not None and RR is None:
+            if np.linalg.norm(ff) > 0.5 * np.linalg.norm(ff_prev):
+                # Not converging with the updated Jacobian, recompute it
+                jj = None
+                ff_prev = None
+                continue
+            # Broyden update
+            dff = ff - ff_prev
+            jj += np.outer(dff - jj @ dpp, dpp) / np.dot(dpp, dpp)
+
+        dpp = -np.linalg.solve(jj, ff)
+        pp[i_free] += dpp
+        ff_prev = ff
+
+    if not converged and not continue_on_closed_orbit_error:
+        raise ClosedOrbitSearchError
+
+    if converged and RR is None:
+        # One-turn matrix at the closed orbit
+        _, jacobian, RR = _one_turn_map_with_probes(
+            pp, co_guess, line, delta_zeta, start, end, num_turns,
+            steps_r_matrix)
+        num_tracks += 1
+
+    particle_on_co = co_guess.copy()
+    particle_on_co.x = pp[0]
+    particle_on_co.px = pp[1]
+    particle_on_co.y = pp[2]
+    particle_on_co.py = pp[3]
+    particle_on_co.zeta = pp[4]
+    particle_on_co.delta = pp[5]
+
+    particle_on_co._fsolve_info = {'solver': 'quasi_newton',
+                                   'num_iterations': iteration + 1,
+                                   'num_one_turn_tracks': num_tracks}
+    particle_on_co._co_search_jacobian = jacobian
+    if converged and delta_zeta == 0 and line.energy_program is None:
+        particle_on_co._co_search_R_matrix = RR
+        particle_on_co._co_search_steps_r_matrix = steps_r_matrix
+
+    return particle_on_co
+
 def _error_for_co_search_6d(p, co_guess, line, delta_zeta, delta0, zeta0, start, end, num_turns):
     return p - _one_turn_map(p, co_guess, line, delta_zeta, start, end, num_turns)
 
@@ -2184,7 +3025,6 @@ def compute_one_turn_matrix_finite_differences(
         num_turns=1,
         element_by_element=False,
         only_markers=False):
-    import xpart
 
     if steps_r_matrix is None:
         steps_r_matrix = {}
@@ -2209,23 +3049,16 @@ def compute_one_turn_matrix_finite_differences(
     particle_on_co = particle_on_co.copy(
                         _context=context)
 
-    dx = steps_r_matrix["dx"]
-    dpx = steps_r_matrix["dpx"]
-    dy = steps_r_matrix["dy"]
-    dpy = steps_r_matrix["dpy"]
-    dzeta = steps_r_matrix["dzeta"]
-    ddelta = steps_r_matrix["ddelta"]
-    part_temp = xpart.build_particles(_context=context,
-            particle_ref=particle_on_co, mode='shift',
-            x  =    [dx,  0., 0.,  0.,    0.,     0., -dx,   0.,  0.,   0.,     0.,      0.],
-            px =    [0., dpx, 0.,  0.,    0.,     0.,  0., -dpx,  0.,   0.,     0.,      0.],
-            y  =    [0.,  0., dy,  0.,    0.,     0.,  0.,   0., -dy,   0.,     0.,      0.],
-            py =    [0.,  0., 0., dpy,    0.,     0.,  0.,   0.,  0., -dpy,     0.,      0.],
-            zeta =  [0.,  0., 0.,  0., dzeta,     0.,  0.,   0.,  0.,   0., -dzeta,      0.],
-            delta = [0.,  0., 0.,  0.,    0., ddelta,  0.,   0.,  0.,   0.,     0., -ddelta],
-            )
-    dpzeta = float(context.nparray_from_context_array(
-        (part_temp.ptau[5] - part_temp.ptau[11])/2/part_temp.beta0[0]))
+    if (line.enable_linear_map_cache
+            and start is None and end is None and num_turns == 1
+            and particle_on_co._xobject.at_element[0] == 0
+            and isinstance(context, xo.ContextCpu)):
+        from .linear_map_cache import get_linear_map_cache
+        cache = get_linear_map_cache(line, steps_r_matrix)
+        return cache.compute_one_turn_matrix(particle_on_co,
+                                    element_by_element=element_by_element)
+
+    part_temp, dpzeta = _build_r_matrix_probes(particle_on_co, steps_r_matrix)
     if particle_on_co._xobject.at_element[0]>0:
         part_temp.s[:] = particle_on_co._xobject.s[0]
         part_temp.at_element[:] = particle_on_co._xobject.at_element[0]
@@ -2261,26 +3094,14 @@ def compute_one_turn_matrix_finite_differences(
     temp_mat[5, :] = context.nparray_from_context_array(
                                 part_temp.ptau/part_temp.beta0) # pzeta
 
-    RR = np.zeros(shape=(6, 6), dtype=np.float64)
-
-    for jj, dd in enumerate([dx, dpx, dy, dpy, dzeta, dpzeta]):
-        RR[:, jj] = (temp_mat[:, jj] - temp_mat[:, jj+6])/(2*dd)
+    RR = _r_matrix_from_probes(temp_mat, steps_r_matrix, dpzeta)
 
     out = {'R_matrix': RR}
 
     if element_by_element:
         mon = line.record_last_track
-        temp_mad_ebe = np.zeros(shape=(len(line.element_names) + 1, 6, 12), dtype=np.float64)
-        temp_mad_ebe[:, 0, :] = mon.x.T
-        temp_mad_ebe[:, 1, :] = mon.px.T
-        temp_mad_ebe[:, 2, :] = mon.y.T
-        temp_mad_ebe[:, 3, :] = mon.py.T
-        temp_mad_ebe[:, 4, :] = mon.zeta.T
-        temp_mad_ebe[:, 5, :] = mon.ptau.T/mon.beta0.T
-
-        RR_ebe = np.zeros(shape=(len(line.element_names) + 1, 6, 6), dtype=np.float64)
-        for jj, dd in enumerate([dx, dpx, dy, dpy, dzeta, dpzeta]):
-            RR_ebe[:, :, jj] = (temp_mad_ebe[:, :, jj] - temp_mad_ebe[:, :, jj+6])/(2*dd)
+        RR_ebe = _r_matrix_from_probes(_probe_coords_from_monitor(mon),
+                                       steps_r_matrix, dpzeta)
 
         if only_markers:
             mask_twiss = line.tracker._get_twiss_mask_markers()
@@ -2293,6 +3114,325 @@ def compute_one_turn_matrix_finite_differences(
     return out
 
 
+def _build_r_matrix_probes(particle_on_co, steps_r_matrix, include_orbit=False):
+
+    """
+    Build the 12 particles used to compute the R matrix by finite differences
+    around `particle_on_co` (shifted by +step and -step in each coordinate).
+    If `include_orbit` is True, the unshifted particle is added in first
+    position. Returns the particles and the step in pzeta.
+    """
+    import xpart
+
+    context = particle_on_co._buffer.context
+
+    shifts = _r_matrix_probe_shifts(steps_r_matrix, include_orbit)
+    i0 = 1 if include_orbit else 0
+
+    part_temp = xpart.build_particles(_context=context,
+            particle_ref=particle_on_co, mode='shift',
+            x=shifts[0], px=shifts[1], y=shifts[2], py=shifts[3],
+            zeta=shifts[4], delta=shifts[5])
+    dpzeta = float(context.nparray_from_context_array(
+        (part_temp.ptau[i0 + 5] - part_temp.ptau[i0 + 11])
+        / 2 / part_temp.beta0[i0]))
+
+    return part_temp, dpzeta
+
+
+def _r_matrix_probe_shifts(steps_r_matrix, include_orbit=False):
+    # Shifts in (x, px, y, py, zeta, delta) of the probes, shape (6, 12) or
+    # (6, 13) if the unshifted particle is included
+    shifts = np.zeros(shape=(6, 12), dtype=np.float64)
+    for jj, nn in enumerate(['dx', 'dpx', 'dy', 'dpy', 'dzeta', 'ddelta']):
+        shifts[jj, jj] = steps_r_matrix[nn]
+        shifts[jj, jj + 6] = -steps_r_matrix[nn]
+    if include_orbit:
+        shifts = np.concatenate([np.zeros(shape=(6, 1)), shifts], axis=1)
+    return shifts
+
+
+def _probe_coords_from_monitor(mon):
+    # Coordinates (x, px, y, py, zeta, pzeta) recorded by an element-by-element
+    # monitor, with shape (n_elements + 1, 6, n_particles)
+    coords = np.zeros(shape=(mon.x.shape[1], 6, mon.x.shape[0]),
+                      dtype=np.float64)
+    coords[:, 0, :] = mon.x.T
+    coords[:, 1, :] = mon.px.T
+    coords[:, 2, :] = mon.y.T
+    coords[:, 3, :] = mon.py.T
+    coords[:, 4, :] = mon.zeta.T
+    coords[:, 5, :] = mon.ptau.T/mon.beta0.T
+    return coords
+
+
+def _r_matrix_from_probes(coords, steps_r_matrix, dpzeta):
+    # coords has shape (..., 6, 12), the last axis running over the probes
+    # built by _build_r_matrix_probes
+    steps = [steps_r_matrix["dx"], steps_r_matrix["dpx"],
+             steps_r_matrix["dy"], steps_r_matrix["dpy"],
+             steps_r_matrix["dzeta"], dpzeta]
+    RR = np.zeros(shape=coords.shape[:-1] + (6,), dtype=np.float64)
+    for jj, dd in enumerate(steps):
+        RR[..., jj] = (coords[..., jj] - coords[..., jj + 6])/(2*dd)
+    return RR
+
+
+def _find_closed_orbit_multi(line, co_guesses, delta0=None, zeta0=None,
+                             steps_r_matrix=None, start=None, end=None,
+                             num_turns=1, max_iterations=20):
+
+    """
+    Find the closed orbit for several initial guesses (e.g. several momentum
+    offsets) together. At each Newton iteration, the closed orbit candidates
+    and the 12 finite-difference probes around each of them are tracked
+    together in a single call. The one-turn R matrices at the closed orbits
+    are obtained from the last iteration.
+
+    Returns the list of particles on closed orbit and the list of R matrices.
+    """
+    import xpart
+
+    if line.enable_time_dependent_vars:
+        raise RuntimeError(
+            'Time-dependent vars not supported in closed orbit search')
+
+    num_co = len(co_guesses)
+    if steps_r_matrix is None or isinstance(steps_r_matrix, dict):
+        steps_r_matrix = num_co * [steps_r_matrix]
+    steps_r_matrix = [_complete_steps_r_matrix_with_default(ss)
+                      for ss in steps_r_matrix]
+    delta0 = (num_co * [delta0] if np.isscalar(delta0) or delta0 is None
+              else list(delta0))
+    zeta0 = (num_co * [zeta0] if np.isscalar(zeta0) or zeta0 is None
+             else list(zeta0))
+
+    if isinstance(start, str):
+        start = line.element_names.index(start)
+    if isinstance(end, str):
+        end = line.element_names.index(end)
+
+    context = line._buffer.context
+    ctx2np = context.nparray_from_context_array
+    co_guesses = [cc.copy(_context=context) for cc in co_guesses]
+
+    # Coordinates are (x, px, y, py, zeta, delta)
+    coords = np.array([[cc._xobject.x[0], cc._xobject.px[0],
+                        cc._xobject.y[0], cc._xobject.py[0],
+                        cc._xobject.zeta[0], cc._xobject.delta[0]]
+                       for cc in co_guesses])
+    i_free = []
+    for ii in range(num_co):
+        if delta0[ii] is not None:
+            coords[ii, 5] = delta0[ii]
+        if zeta0[ii] is not None:
+            coords[ii, 4] = zeta0[ii]
+        if delta0[ii] is None and zeta0[ii] is None:
+            i_free.append(np.arange(6))
+        else:
+            i_free.append(np.arange(4))
+
+    steps = np.array([[ss['dx'], ss['dpx'], ss['dy'], ss['dpy'],
+                       ss['dzeta'], ss['ddelta']] for ss in steps_r_matrix])
+
+    at_element = co_guesses[0]._xobject.at_element[0]
+    assert all(cc._xobject.at_element[0] == at_element for cc in co_guesses)
+
+    for iteration in range(max_iterations + 1):
+
+        # Closed orbit candidate followed by +step and -step probes
+        parts = []
+        for ii, cc in enumerate(co_guesses):
+            pref = cc.copy()
+            pref.x, pref.px, pref.y, pref.py, pref.zeta, pref.delta = coords[ii]
+            shifts = np.zeros(shape=(6, 13), dtype=np.float64)
+            shifts[:, 1:7] = np.diag(steps[ii])
+            shifts[:, 7:13] = -np.diag(steps[ii])
+            parts.append(xpart.build_particles(_context=context,
+                particle_ref=pref, mode='shift',
+                x=shifts[0], px=shifts[1], y=shifts[2], py=shifts[3],
+                zeta=shifts[4], delta=shifts[5]))
+        part = xt.Particles.merge(parts)
+        part.particle_id = np.arange(part._capacity)
+        part.s = co_guesses[0]._xobject.s[0]
+        part.at_element = at_element
+        part.at_turn = AT_TURN_FOR_TWISS
+
+        ptau_in = ctx2np(part.ptau).reshape(num_co, 13)
+        beta0 = ctx2np(part.beta0).reshape(num_co, 13)[:, 0]
+        dpzeta = (ptau_in[:, 6] - ptau_in[:, 12]) / 2 / beta0
+
+        line.track(part, ele_start=start, ele_stop=end, num_turns=num_turns)
+        if np.any(ctx2np(part.state) < 0):
+            raise ClosedOrbitSearchError('Particle lost in closed orbit search')
+
+        out = np.array([ctx2np(part.x), ctx2np(part.px), ctx2np(part.y),
+                        ctx2np(part.py), ctx2np(part.zeta),
+                        ctx2np(part.delta)]).reshape(6, num_co, 13)
+        out_pzeta = ctx2np(part.ptau / part.beta0).reshape(num_co, 13)
+
+        error = coords - out[:, :, 0].T
+        converged = True
+        new_coords = coords.copy()
+        for ii in range(num_co):
+            ff = i_free[ii]
+            if np.all(np.abs(error[ii, ff]) < np.array(CO_SEARCH_MULTI_TOL)[ff]):
+                continue
+            converged = False
+            jac = (out[:, ii, 1:7] - out[:, ii, 7:13]) / (2 * steps[ii])
+            jac_err = np.eye(6) - jac
+            new_coords[ii, ff] -= np.linalg.solve(jac_err[np.ix_(ff, ff)],
+                                                  error[ii, ff])
+        if converged:
+            break
+        if iteration == max_iterations:
+            raise ClosedOrbitSearchError(
+                'Closed orbit search did not converge')
+        coords = new_coords
+
+    particles_on_co = []
+    R_matrices = []
+    for ii, cc in enumerate(co_guesses):
+        particle_on_co = cc.copy()
+        (particle_on_co.x, particle_on_co.px, particle_on_co.y,
+         particle_on_co.py, particle_on_co.zeta, particle_on_co.delta
+         ) = coords[ii]
+        particle_on_co._fsolve_info = 'multi'
+        particles_on_co.append(particle_on_co)
+
+        out_ii = out[:, ii, :].copy()
+        out_ii[5, :] = out_pzeta[ii]
+        den = steps[ii].copy()
+        den[5] = dpzeta[ii]
+        R_matrices.append((out_ii[:, 1:7] - out_ii[:, 7:13]) / (2 * den))
+
+    return particles_on_co, R_matrices
+
+
+def _find_periodic_solution_multi(line, co_guesses, method, delta0,
+                                  steps_r_matrix, symplectify,
+                                  matrix_responsiveness_tol,
+                                  matrix_stability_tol,
+                                  nemitt_x, nemitt_y):
+
+    """
+    Same as `_find_periodic_solution` (without user-provided closed orbit,
+    R or W matrices) for several momentum offsets, the closed orbits and
+    R matrices being computed together with `_find_closed_orbit_multi`.
+    """
+
+    num_co = len(co_guesses)
+    steps_r_matrix = [_complete_steps_r_matrix_with_default(steps_r_matrix)
+                      for _ in range(num_co)]
+    for ss in steps_r_matrix:
+        ss['adapted'] = False
+
+    parts_on_co, RRs = _find_closed_orbit_multi(line, co_guesses,
+                                    delta0=delta0, steps_r_matrix=steps_r_matrix)
+
+    out = num_co * [None]
+    to_compute = list(range(num_co))
+    for iter in range(2):
+        to_adapt = []
+        for ii in to_compute:
+            RR = RRs[ii]
+            if matrix_responsiveness_tol is not None:
+                lnf._assert_matrix_responsiveness(RR,
+                    matrix_responsiveness_tol, only_4d=(method == '4d'))
+            W, _, Rot, eigenvalues = lnf.compute_linear_normal_form(
+                        RR, only_4d_block=(method == '4d'),
+                        symplectify=symplectify,
+                        responsiveness_tol=None,
+                        stability_tol=None)
+            out[ii] = (W, RR, Rot, eigenvalues)
+            if iter == 0 and _adapt_steps_r_matrix(steps_r_matrix[ii], W,
+                                parts_on_co[ii], nemitt_x, nemitt_y):
+                to_adapt.append(ii)
+        if len(to_adapt) == 0:
+            break
+        # R matrices with adapted steps (the closed orbits are kept)
+        _, RRs_adapted = _find_closed_orbit_multi(line,
+                        [parts_on_co[ii] for ii in to_adapt],
+                        delta0=[parts_on_co[ii]._xobject.delta[0]
+                                for ii in to_adapt],
+                        steps_r_matrix=[steps_r_matrix[ii] for ii in to_adapt],
+                        max_iterations=0)
+        for ii, RR in zip(to_adapt, RRs_adapted):
+            RRs[ii] = RR
+        to_compute = to_adapt
+
+    solutions = []
+    for ii in range(num_co):
+        W, RR, Rot, eigenvalues = out[ii]
+        init, RR_ebe = _complete_periodic_solution(line, parts_on_co[ii],
+                                W, RR, None, method=method,
+                                W_matrix_provided=False,
+                                matrix_stability_tol=matrix_stability_tol,
+                                start=None)
+        solutions.append((init, RR, steps_r_matrix[ii], eigenvalues, Rot,
+                          RR_ebe))
+
+    return solutions
+
+
+class _TwissMultiDelta:
+
+    """
+    Periodic twiss computed together for several momentum offsets. It is
+    passed to `twiss_line` (as `_multi_delta`) for each of the offsets. On the
+    first call the closed orbits, one-turn matrices and twiss tables are
+    computed for all offsets (and for the offsets used for the chromatic
+    functions) with batched tracking, later calls only take the results.
+    """
+
+    def __init__(self, delta0):
+        self.delta0 = [float(dd) for dd in delta0]
+        self._solutions = None
+        self._twiss_open = None
+
+    def get_periodic_solution(self, line, particle_ref, method, delta0,
+                              delta_chrom, **kwargs):
+        if self._solutions is None:
+            deltas = list(dict.fromkeys(
+                self.delta0 + [-delta_chrom, delta_chrom]))
+            co_guesses = [_default_co_guess(particle_ref) for _ in deltas]
+            solutions = _find_periodic_solution_multi(line, co_guesses,
+                                    method=method, delta0=deltas, **kwargs)
+            self._solutions = dict(zip(deltas, solutions))
+            self._method = method
+        assert method == self._method
+        return self._solutions[float(delta0)]
+
+    def get_twiss_open(self, line, delta0, inits_chrom, **kwargs):
+        if self._twiss_open is None:
+            inits = [self._solutions[dd][0] for dd in self.delta0]
+            tables = _twiss_open_multi(line, inits + inits_chrom,
+                                       start=None, end=None, **kwargs)
+            self._twiss_open = dict(zip(self.delta0, tables))
+            self._twiss_chrom = tables[len(inits):]
+        return self._twiss_open[float(delta0)]
+
+    def get_chromatic_solutions(self, delta_chrom):
+        return [self._solutions[dd] for dd in [-delta_chrom, delta_chrom]]
+
+    def get_twiss_chrom(self):
+        return self._twiss_chrom
+
+
+def _default_co_guess(particle_ref):
+    co_guess = particle_ref.copy()
+    co_guess.x = 0
+    co_guess.px = 0
+    co_guess.y = 0
+    co_guess.py = 0
+    co_guess.zeta = 0
+    co_guess.delta = 0
+    co_guess.s = 0
+    co_guess.at_element = 0
+    co_guess.at_turn = 0
+    return co_guess
+
+
 def _updated_kwargs_from_locals(kwargs, loc):
 
     out = kwargs.copy()
@@ -2658,7 +3798,8 @@ class TwissInit:
     def __getattr__(self, name):
         if name in self.__dict__:
             return self.__dict__[name]
-        elif hasattr(self.__dict__['particle_on_co'], name):
+        elif ('particle_on_co' in self.__dict__ # not yet set when unpickling
+                and hasattr(self.__dict__['particle_on_co'], name)):
             # e.g. tw_init['x'] returns tw_init.particle_on_co.x
             out = getattr(self.__dict__['particle_on_co'], name)
             #always cpu
@@ -2723,6 +3864,110 @@ class TwissInit:
                 WW[5, 5] - WW[5, 4] * WW[4, 5] / WW[4, 4])
 
 
+class _LazyColumnGroup:
+    """
+    Columns of a TwissTable computed together by `func` (returning a dict of
+    columns). The result is computed at most once, after which `callbacks`
+    (functions modifying the columns in place) are applied to it.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.callbacks = []
+        self.result = None
+
+    def evaluate(self):
+        if self.result is None:
+            self.result = self.func()
+            self.func = None # release the raw data
+            for cc in self.callbacks:
+                cc(self.result)
+            self.callbacks = None
+        return self.result
+
+
+class _LazyTwissData(dict):
+    """
+    Data of a TwissTable in which some columns are computed only when first
+    accessed and then stored. `pending` maps the name of these columns to the
+    _LazyColumnGroup computing them.
+    """
+
+    def __init__(self, data, pending):
+        dict.__init__(self, data)
+        self._pending = pending
+
+    def _evaluate(self, key):
+        group = self._pending[key]
+        for kk, vv in group.evaluate().items():
+            if self._pending.get(kk, None) is group:
+                dict.__setitem__(self, kk, vv)
+                del self._pending[kk]
+
+    def apply_to_columns(self, columns, func):
+        """Apply `func` to the dict of `columns` now or when they are computed."""
+        groups = set(id(self._pending[kk]) for kk in columns
+                     if kk in self._pending)
+        if not groups:
+            func(self)
+            return
+        assert len(groups) == 1, 'Columns must be computed together'
+        self._pending[columns[0]].callbacks.append(func)
+
+    def __missing__(self, key):
+        if key not in self._pending:
+            raise KeyError(key)
+        self._evaluate(key)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._pending
+
+    def __iter__(self):
+        yield from dict.__iter__(self)
+        yield from list(self._pending)
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._pending)
+
+    def __setitem__(self, key, value):
+        self._pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if key in self._pending:
+            del self._pending[key]
+        else:
+            dict.__delitem__(self, key)
+
+    def __reduce__(self):
+        return dict, (dict(self.items()),)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def pop(self, key, *args):
+        if key in self._pending:
+            self._evaluate(key)
+        return dict.pop(self, key, *args)
+
+    def update(self, *args, **kwargs):
+        for kk, vv in dict(*args, **kwargs).items():
+            self[kk] = vv
+
+    def keys(self):
+        return KeysView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def copy(self):
+        return _LazyTwissData(dict(dict.items(self)), dict(self._pending))
+
+
 class TwissTable(Table):
 
     _error_on_row_not_found = True
@@ -3524,73 +4769,354 @@ def _build_sigma_table(Sigma, s=None, name=None):
 def compute_T_matrix_line(line, start, end, particle_on_co=None,
                             steps_t_matrix=None):
 
-    steps_t_matrix = _complete_steps_r_matrix_with_default(steps_t_matrix)
-
     if particle_on_co is None:
         tw = line.twiss(reverse=False)
         particle_on_co = tw.get_twiss_init(start).particle_on_co
 
-    R_plus = {}
-    R_minus = {}
-    p_plus = {}
-    p_minus = {}
+    _, TT = _compute_R_and_T_matrix(line, start=start, end=end,
+                                    particle_on_co=particle_on_co,
+                                    steps_t_matrix=steps_t_matrix)
+
+    return TT
+
 
-    for kk in ['x', 'px', 'y', 'py', 'zeta', 'delta']:
+def _compute_R_and_T_matrix(line, start, end, particle_on_co,
+                            steps_r_matrix=None, steps_t_matrix=None):
 
-        p_plus[kk] = particle_on_co.copy()
-        setattr(p_plus[kk], kk, getattr(particle_on_co, kk) + steps_t_matrix['d' + kk])
-        R_plus[kk] = line.compute_one_turn_matrix_finite_differences(
-                            start=start, end=end,
-                            particle_on_co=p_plus[kk])['R_matrix']
+    """
+    Compute the first and second order maps from `start` to `end` by finite
+    differences around `particle_on_co`. The second order map is obtained
+    from the R matrices around the 12 particles displaced by +/- the steps
+    of `steps_t_matrix`. The probes of the 13 R matrices (12 each) are
+    tracked together in a single batch.
+    """
+
+    steps_r_matrix = _complete_steps_r_matrix_with_default(steps_r_matrix)
+    steps_t_matrix = _complete_steps_r_matrix_with_default(steps_t_matrix)
+
+    if line.enable_time_dependent_vars:
+        raise RuntimeError(
+            'Time-dependent vars not supported in T matrix computation')
+
+    context = line._buffer.context
+
+    if isinstance(start, str):
+        start = line.element_names.index(start)
+    if isinstance(end, str):
+        end = line.element_names.index(end)
+
+    if start is not None and end is None:
+        raise ValueError('`end` must be given if `start` is given')
+
+    if start is not None and end is not None and start > end:
+        raise ValueError('start > end')
 
-        p_minus[kk] = particle_on_co.copy()
-        setattr(p_minus[kk], kk, getattr(particle_on_co, kk) - steps_t_matrix['d' + kk])
-        R_minus[kk] = line.compute_one_turn_matrix_finite_differences(
-                            start=start, end=end,
-                            particle_on_co=p_minus[kk])['R_matrix']
+    particle_on_co = particle_on_co.copy(_context=context)
+
+    # Centers of the R matrices (the particle on closed orbit first)
+    centers = [particle_on_co]
+    for sign in [1, -1]:
+        for kk in ['x', 'px', 'y', 'py', 'zeta', 'delta']:
+            pp = particle_on_co.copy()
+            setattr(pp, kk, getattr(particle_on_co, kk)
+                            + sign * steps_t_matrix['d' + kk])
+            centers.append(pp)
+
+    probes = []
+    dpzeta = np.zeros(shape=(13, 1), dtype=np.float64)
+    for ii, pp in enumerate(centers):
+        part_probes, dpzeta[ii, 0] = _build_r_matrix_probes(pp, steps_r_matrix)
+        probes.append(part_probes)
+    part = xt.Particles.merge(probes)
+    coords = _track_probes_from_particle_on_co(line, part, particle_on_co,
+                                               start, end)
+    coords = np.swapaxes(coords.reshape(6, 13, 12), 0, 1) # (13, 6, 12)
+
+    RRs = _r_matrix_from_probes(coords, steps_r_matrix, dpzeta)
+    RR = RRs[0]
+    R_plus = RRs[1:7]
+    R_minus = RRs[7:13]
 
     TT = np.zeros((6, 6, 6))
-    TT[:, :, 0] = 0.5 * (R_plus['x'] - R_minus['x']) / (
-        p_plus['x']._xobject.x[0] - p_minus['x']._xobject.x[0])
-    TT[:, :, 1] = 0.5 * (R_plus['px'] - R_minus['px']) / (
-        p_plus['px']._xobject.px[0] - p_minus['px']._xobject.px[0])
-    TT[:, :, 2] = 0.5 * (R_plus['y'] - R_minus['y']) / (
-        p_plus['y']._xobject.y[0] - p_minus['y']._xobject.y[0])
-    TT[:, :, 3] = 0.5 * (R_plus['py'] - R_minus['py']) / (
-        p_plus['py']._xobject.py[0] - p_minus['py']._xobject.py[0])
-    TT[:, :, 4] = 0.5 * (R_plus['zeta'] - R_minus['zeta']) / (
-        p_plus['zeta']._xobject.zeta[0] - p_minus['zeta']._xobject.zeta[0])
-    TT[:, :, 5] = 0.5 * (R_plus['delta'] - R_minus['delta']) / (
-        (p_plus['delta']._xobject.ptau[0] - p_minus['delta']._xobject.ptau[0])
-        / p_plus['delta']._xobject.beta0[0])
+    for jj, kk in enumerate(['x', 'px', 'y', 'py', 'zeta', 'ptau']):
+        dcenters = (getattr(centers[1 + jj]._xobject, kk)[0]
+                    - getattr(centers[7 + jj]._xobject, kk)[0])
+        if kk == 'ptau':
+            dcenters /= centers[1 + jj]._xobject.beta0[0]
+        TT[:, :, jj] = 0.5 * (R_plus[jj] - R_minus[jj]) / dcenters
 
-    return TT
+    return RR, TT
 
-def _multiturn_twiss(tw0, num_turns, kwargs):
-    tw_curr = tw0
-    twisses_to_merge = []
-    line = kwargs['line']
 
-    for i_turn in range(num_turns):
+def _track_probes_from_particle_on_co(line, part, particle_on_co, start, end):
+
+    """
+    Track the probes `part` built around `particle_on_co` from `start` to
+    `end` (or for one turn starting at the element of `particle_on_co`) and
+    return their final (x, px, y, py, zeta, pzeta), with shape (6, n_probes).
+    """
+
+    ctx2np = line._buffer.context.nparray_from_context_array
+
+    i_start = particle_on_co._xobject.at_element[0]
+    if i_start > 0:
+        part.s[:] = particle_on_co._xobject.s[0]
+        part.at_element[:] = i_start
+    part.at_turn = AT_TURN_FOR_TWISS
+
+    if start is not None:
+        line.track(part, ele_start=start, ele_stop=end)
+    elif i_start > 0:
+        line.track(part, ele_start=i_start)
+        line.track(part, num_elements=i_start)
+    else:
+        line.track(part)
+
+    coords = np.zeros(shape=(6, len(part.x)), dtype=np.float64)
+    coords[0, :] = ctx2np(part.x)
+    coords[1, :] = ctx2np(part.px)
+    coords[2, :] = ctx2np(part.y)
+    coords[3, :] = ctx2np(part.py)
+    coords[4, :] = ctx2np(part.zeta)
+    coords[5, :] = ctx2np(part.ptau / part.beta0)
+
+    return coords
+
+
+DEFAULT_TAYLOR_MAP_AMPLITUDES = {
+    'x': 1e-3, 'px': 1e-4, 'y': 1e-3, 'py': 1e-4, 'zeta': 1e-2, 'pzeta': 1e-3}
+
+
+def _taylor_map_exponents(order):
+    # Exponents of the monomials in (x, px, y, py, zeta, pzeta) up to `order`,
+    # sorted by degree, with shape (n_terms, 6)
+    exponents = []
+    for degree in range(order + 1):
+        for cc in itertools.combinations_with_replacement(range(6), degree):
+            exponents.append(np.bincount(np.array(cc, dtype=int),
+                                         minlength=6))
+    return np.array(exponents, dtype=np.int64)
+
+
+def _monomials(exponents, zz):
+    # Values of the monomials for the points zz of shape (6, n_points), with
+    # shape (n_points, n_terms)
+    out = np.ones(shape=(zz.shape[1], len(exponents)), dtype=np.float64)
+    for jj in range(6):
+        out *= zz[jj, :, None] ** exponents[None, :, jj]
+    return out
+
+
+def _taylor_map_grid(order):
+    # Points of the lattice of step 1/order in the normalized box with
+    # |u_1| + ... + |u_6| <= 1, with shape (6, n_points), the first one being
+    # the expansion point. The points with non-negative coordinates are
+    # unisolvent for the polynomials of degree `order` and the grid is
+    # symmetric under the change of sign of each coordinate.
+    order = max(order, 1)
+    points = []
+    for kk in _taylor_map_exponents(order):
+        nonzero = np.nonzero(kk)[0]
+        for signs in itertools.product([1, -1], repeat=len(nonzero)):
+            pp = kk.copy()
+            pp[nonzero] *= np.array(signs, dtype=np.int64)
+            points.append(pp)
+    return np.array(points, dtype=np.float64).T / order
+
+
+def _fit_taylor_map(line, start, end, particle_on_co, order,
+                    amplitudes=None):
+
+    """
+    Compute a truncated power series of order `order` of the map from
+    `start` to `end` (one turn if they are None) around `particle_on_co`.
+
+    The series is the least-squares fit of the final coordinates of
+    particles placed on a symmetric grid (see `_taylor_map_grid`) in the box
+    of half-widths `amplitudes` (dict with keys x, px, y, py, zeta, pzeta)
+    around `particle_on_co`, tracked together in a single batch through the
+    line. The coefficients are those of the polynomial approximating the map
+    on the grid, which tend to the Taylor coefficients as the box shrinks:
+    the box should cover the amplitudes at which the map is used, and be
+    small enough for the terms above `order` to be negligible.
+
+    Returns the exponents (n_terms, 6), the coefficients (6, n_terms) of the
+    series in (x, px, y, py, zeta, pzeta) - z_in and the expansion point
+    z_in.
+    """
+    import xpart
+
+    context = line._buffer.context
+
+    if isinstance(start, str):
+        start = line.element_names.index(start)
+    if isinstance(end, str):
+        end = line.element_names.index(end)
+
+    amplitudes_all = DEFAULT_TAYLOR_MAP_AMPLITUDES.copy()
+    amplitudes_all.update(amplitudes or {})
+    aa = np.array([amplitudes_all[nn] for nn in
+                   ['x', 'px', 'y', 'py', 'zeta', 'pzeta']])
+
+    exponents = _taylor_map_exponents(order)
 
-        tw_start_turn = tw_curr.rows[0]
-        tw_start_turn.name[0] = f'_turn_{i_turn}'
-        twisses_to_merge.append(tw_start_turn)
-        twisses_to_merge.append(tw_curr)
+    uu = _taylor_map_grid(order)
+    dz = uu * aa[:, None]
+
+    particle_on_co = particle_on_co.copy(_context=context)
+    z_in = np.array([particle_on_co._xobject.x[0],
+                     particle_on_co._xobject.px[0],
+                     particle_on_co._xobject.y[0],
+                     particle_on_co._xobject.py[0],
+                     particle_on_co._xobject.zeta[0],
+                     particle_on_co._xobject.ptau[0]
+                        / particle_on_co._xobject.beta0[0]])
+
+    part = xpart.build_particles(_context=context,
+            particle_ref=particle_on_co, mode='shift',
+            x=dz[0], px=dz[1], y=dz[2], py=dz[3], zeta=dz[4])
+    part.update_ptau((z_in[5] + dz[5]) * particle_on_co._xobject.beta0[0])
 
-        if i_turn == num_turns - 1:
-            break # need n-1 twisses
+    z_out = _track_probes_from_particle_on_co(line, part, particle_on_co,
+                                              start, end)
+    if np.any(context.nparray_from_context_array(part.state) <= 0):
+        raise RuntimeError('Particles lost in the Taylor map computation, '
+                           'reduce the amplitudes')
 
-        tini1 = tw_curr.get_twiss_init(-1)
-        tini1.element_name = tw_curr.name[0]
-        tw_curr = twiss_line(**kwargs,
-            init=tini1, start=tw_curr.name[0],
-            end=line.element_names[-1])
+    # Fit in the normalized coordinates for a better conditioning
+    VV = _monomials(exponents, uu)
+    coeffs_u, _, _, _ = np.linalg.lstsq(VV, z_out.T, rcond=None)
+    coefficients = coeffs_u.T / np.prod(aa[None, :] ** exponents, axis=1)
 
-    tw_mt = xt.TwissTable.concatenate(twisses_to_merge)
+    return exponents, coefficients, z_in
+
+
+def _multiturn_twiss(tw0, num_turns, kwargs):
+
+    """
+    Extends the twiss table of the first turn `tw0` to `num_turns` turns.
+
+    The twiss particles are built once at the end of `tw0` (periodic
+    solution) and a fresh copy of them is tracked for each turn, the
+    element-by-element data of each turn being written into preallocated
+    arrays. Phase advances and `dzeta` of each turn continue from the end of
+    the previous one. The result is a table with the same layout as the
+    concatenation of the single-turn tables (a `_turn_<n>` row at the start
+    of each turn and an `_end_point` row at the end).
+    """
+
+    line = kwargs['line']
+    tracker_data = line.tracker._tracker_data_base
+    num_elements = len(line.element_names)
+    num_points = num_elements + 1 # elements and end of turn
+    num_turns_track = num_turns - 1
+
+    init = tw0.get_twiss_init(-1)
+    init.element_name = line.element_names[0]
+    part_for_twiss_init, scale_eigen = _build_particles_for_twiss(
+        line, init, 0, num_elements - 1, 'forward',
+        kwargs['nemitt_x'], kwargs['nemitt_y'], kwargs['r_sigma'],
+        kwargs['delta_disp'])
+
+    compute_lattice_functions = (not kwargs['only_orbit']
+                                 and kwargs['compute_lattice_functions'])
+
+    data_turns = {}
+    s_turn_start = tw0.s[-1] - tw0.s[0]
+    for i_turn in range(num_turns_track):
+        # The probes are re-seeded from the periodic solution at each turn,
+        # as a single-turn twiss started at the end of the previous turn
+        part_for_twiss = part_for_twiss_init.copy()
+        part_for_twiss.at_turn = AT_TURN_FOR_TWISS # To avoid writing in monitors
+        _monitor = getattr(tracker_data, '_reusable_ebe_monitor_for_twiss',
+                           'ONE_TURN_EBE')
+        i_start, i_stop = _track_particles_for_twiss(
+            line, part_for_twiss, _monitor, start=0, end=None,
+            twiss_orientation='forward',
+            _continue_if_lost=kwargs['_continue_if_lost'])
+        tracker_data._reusable_ebe_monitor_for_twiss = line.record_last_track
+        assert i_stop - i_start + 1 == num_points
+
+        orbit, Ws, dzeta = _orbit_and_w_matrix_from_record(
+            line.record_last_track, i_part=0, i_start=i_start, i_stop=i_stop,
+            scale_eigen=scale_eigen,
+            beta0=init.particle_on_co._xobject.beta0[0])
+
+        # Path length from the start of the first turn
+        orbit['s'] += s_turn_start - orbit['s'][0]
+        s_turn_start = orbit['s'][-1]
+
+        data_turn = orbit
+        data_turn['W_matrix'] = Ws
+        if compute_lattice_functions:
+            lattice_functions, i_replace = _compute_lattice_functions(
+                Ws, kwargs['use_full_inverse'], orbit['s'])
+            data_turn.update(lattice_functions)
+        data_turn['dzeta'] = dzeta
+
+        if kwargs['hide_thin_groups']:
+            for key in VARS_HIDE_THIN_GROUPS:
+                if key in data_turn:
+                    data_turn[key][i_replace] = np.nan
+
+        # Phase advances continue from the end of the previous turn
+        for kk in ['mux', 'muy', 'muzeta', 'dzeta']:
+            if kk in data_turn:
+                mu_prev = (tw0[kk][-1] if i_turn == 0
+                           else data_turns[kk][i_turn * num_points - 1])
+                data_turn[kk] += mu_prev - data_turn[kk][0]
+        if kwargs['method'] == '4d' and 'muzeta' in data_turn:
+            data_turn['muzeta'][:] = 0
+
+        i_store = slice(i_turn * num_points, (i_turn + 1) * num_points)
+        for kk, vv in data_turn.items():
+            if kk not in data_turns:
+                data_turns[kk] = np.zeros(
+                    (num_turns_track * num_points,) + np.shape(vv)[1:])
+            data_turns[kk][i_store] = vv
+
+    # Each turn starts with a copy of its first row (named `_turn_<n>`), the
+    # end point is kept only for the last turn
+    i_turn_rows = np.concatenate([[0], np.arange(num_elements)])
+    i_take = np.concatenate(
+        [i_turn * num_points + i_turn_rows for i_turn in range(num_turns)]
+        + [[num_turns * num_points - 1]])
+
+    strengths_cols = (NORMAL_STRENGTHS_FROM_ATTR + SKEW_STRENGTHS_FROM_ATTR
+                      + OTHER_FIELDS_FROM_ATTR)
+    new_data = {}
+    for kk in tw0._col_names:
+        if kk == 'name':
+            continue
+        if kk in data_turns:
+            vv_turns = data_turns[kk]
+        elif kk in strengths_cols:
+            vv_turns = np.tile(tw0[kk], num_turns_track)
+        else:
+            # Not available beyond the first turn (e.g. chromatic functions)
+            vv_turns = np.full((num_turns_track * num_points,)
+                               + tw0[kk].shape[1:], np.nan)
+        new_data[kk] = np.concatenate([tw0[kk], vv_turns])[i_take]
+
+    new_data['name'] = np.array(list(itertools.chain.from_iterable(
+        [f'_turn_{i_turn}', *line.element_names]
+        for i_turn in range(num_turns))) + ['_end_point'])
+
+    tw_mt = TwissTable({kk: new_data[kk] for kk in tw0._col_names})
+    tw_mt._data['values_at'] = tw0.values_at
+    tw_mt._data['reference_frame'] = tw0.reference_frame
+    tw_mt._data['particle_on_co'] = tw0.particle_on_co
 
     return tw_mt
 
+def _apply_to_columns(twiss_res, columns, func):
+    # Applies func, modifying columns in place, without triggering the
+    # computation of lazy columns
+    if isinstance(twiss_res._data, _LazyTwissData):
+        twiss_res._data.apply_to_columns(columns, func)
+    else:
+        func(twiss_res._data)
+
 def _add_action_in_res(res, kwargs):
     if isinstance(res, xt.TwissInit):
         return res
@@ -3603,9 +5129,12 @@ def get_non_linear_chromaticity(line, delta0_range, num_delta, fit_order=3, **kw
 
     delta0 = np.linspace(delta0_range[0], delta0_range[1], num_delta)
 
+    # The closed orbits and twiss tables for all momentum offsets are computed
+    # together (at the first call of twiss)
+    multi_delta = _TwissMultiDelta(delta0)
     twiss = []
     for dd in delta0:
-        tw = line.twiss(delta0=dd, **kwargs)
+        tw = line.twiss(delta0=dd, _multi_delta=multi_delta, **kwargs)
         twiss.append(tw)
 
     qx = np.array([tw.mux[-1] for tw in twiss])